@@ -0,0 +1,227 @@
+"""Benchmark suite for the routing pipeline. Generates synthetic workloads
+(see lib/workload.py) at several sizes and times each stage: CSV loading,
+hash table inserts and lookups, plotting a truck's delivery route and the full
+simulation. Results are written as JSON so runs can be compared across
+commits.
+
+    python benchmark.py --sizes 27x40,100x1000 --output bench.json
+"""
+
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from lib.distance_matrix import DistanceMatrix
+from lib.hash_table import HASH_TABLES
+from lib.package import Package
+from lib.package_table import PackageTable
+from lib.truck import Truck
+from lib.workload import generate
+from main import Simulation
+
+
+DEFAULT_SIZES = "27x40,100x1000,300x5000"
+
+
+def best_time(function, repeat):
+    """Run the function repeat times; return the fastest time in seconds and
+    the last return value.
+    """
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, value
+
+
+def bench_load(packages_path, distances_path, repeat):
+
+    timings = {}
+    timings["load_distances"], distance_matrix = best_time(
+        lambda: DistanceMatrix.from_csv(distances_path), repeat)
+
+    # opening the compiled cache, once it has been built
+    DistanceMatrix.from_csv(distances_path, cache=True)
+    timings["load_distances_cached"], _ = best_time(
+        lambda: DistanceMatrix.from_csv(distances_path, cache=True), repeat)
+    timings["load_packages"], package_rows = best_time(
+        lambda: Simulation.read_package_rows(packages_path), repeat)
+    return timings, distance_matrix, package_rows
+
+
+def bench_hash_tables(package_rows, repeat):
+    """Time inserting every package one at a time, in one batch, and looking
+    every package up, for each hash table implementation.
+    """
+
+    packages = [Package(*row) for row in package_rows]
+    items = [(package.id, package) for package in packages]
+
+    def insert_each(table_class):
+        table = table_class()
+        for key, package in items:
+            table.insert(key, package)
+        return table
+
+    def bulk_insert(table_class):
+        table = table_class()
+        table.bulk_insert(items)
+        return table
+
+    def lookup_all(table):
+        for key, _ in items:
+            table.lookup(key)
+
+    timings = {}
+    for name, table_class in sorted(HASH_TABLES.items()):
+        timings[f"{name}_insert"], table = best_time(lambda: insert_each(table_class), repeat)
+        timings[f"{name}_bulk_insert"], _ = best_time(lambda: bulk_insert(table_class), repeat)
+        timings[f"{name}_lookup"], _ = best_time(lambda: lookup_all(table), repeat)
+    return timings
+
+
+def bench_plot_route(distance_matrix, package_rows, planner, repeat):
+    """Time plotting routes for full truckloads, taken in package id order."""
+
+    package_table = PackageTable(HASH_TABLES["chaining"]())
+    packages = [Package(*row) for row in package_rows]
+    package_table.bulk_insert((package.id, package) for package in packages)
+
+    truck = Truck(id=1, distance_matrix=distance_matrix, planner=planner)
+    package_ids = sorted(package.id for package in package_table.values())
+    loads = [
+        package_ids[start:start + truck.capacity]
+        for start in range(0, len(package_ids), truck.capacity)
+    ]
+
+    def plot_all():
+        for load in loads:
+            truck.packages = list(load)
+            truck.route = []
+            truck.plot_delivery_route(package_table)
+
+    elapsed, _ = best_time(plot_all, repeat)
+    return {"plot_delivery_route": elapsed, "plot_delivery_route_per_trip": elapsed / max(len(loads), 1)}
+
+
+def bench_simulation(distance_matrix, package_rows, planner, repeat):
+    """Time building the simulation (which plans the loads) and running it."""
+
+    def build():
+        return Simulation(distance_matrix=distance_matrix, package_rows=package_rows, planner=planner)
+
+    # every run needs a fresh simulation -- time building it and running it separately
+    timings = {}
+    for _ in range(repeat):
+        elapsed, simulation = best_time(build, 1)
+        timings["simulation_init"] = min(elapsed, timings.get("simulation_init", elapsed))
+        elapsed, result = best_time(simulation.run, 1)
+        timings["simulation_run"] = min(elapsed, timings.get("simulation_run", elapsed))
+
+    return timings, result
+
+
+def run_benchmarks(sizes, repeat=3, planner="nearest_neighbor", seed=0, workdir=None):
+    """Benchmark every (addresses, packages) size. Return a JSON-ready dictionary."""
+
+    runs = []
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        for num_addresses, num_packages in sizes:
+            packages_path, distances_path = generate(
+                os.path.join(directory, f"{num_addresses}x{num_packages}"),
+                num_addresses, num_packages, seed=seed,
+            )
+
+            timings, distance_matrix, package_rows = bench_load(packages_path, distances_path, repeat)
+            timings.update(bench_hash_tables(package_rows, repeat))
+            timings.update(bench_plot_route(distance_matrix, package_rows, planner, repeat))
+            simulation_timings, result = bench_simulation(distance_matrix, package_rows, planner, repeat)
+            timings.update(simulation_timings)
+
+            runs.append({
+                "addresses": num_addresses,
+                "packages": num_packages,
+                "total_distance": round(result.total_distance, 2),
+                "timings": {name: round(seconds, 6) for name, seconds in timings.items()},
+            })
+            print(f"{num_addresses:>6} addresses {num_packages:>7} packages  "
+                  f"run {timings['simulation_init'] + timings['simulation_run']:.3f} s", file=sys.stderr)
+
+    return {
+        "commit": _git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "planner": planner,
+        "repeat": repeat,
+        "seed": seed,
+        "runs": runs,
+    }
+
+
+def _git_commit():
+    """Return the current commit hash, or None outside a git checkout."""
+
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def _parse_sizes(text):
+    """Parse sizes like "27x40,100x1000" into (addresses, packages) pairs."""
+
+    sizes = []
+    for size in text.split(","):
+        num_addresses, num_packages = size.lower().split("x")
+        sizes.append((int(num_addresses), int(num_packages)))
+    return sizes
+
+
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark the routing pipeline on synthetic workloads.")
+    parser.add_argument("--sizes", type=_parse_sizes, default=_parse_sizes(DEFAULT_SIZES),
+                        help=f"ADDRESSESxPACKAGES sizes, comma separated (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per measurement; the fastest is kept")
+    parser.add_argument("--planner", default="nearest_neighbor",
+                        help="route planner to benchmark")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for the synthetic workloads")
+    parser.add_argument("--output",
+                        help="write the JSON results to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+
+    args = parse_args(argv)
+    results = run_benchmarks(args.sizes, repeat=args.repeat, planner=args.planner, seed=args.seed)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Helpers for converting between clock times and integer times of day. The
+simulation stores times as minutes or seconds since midnight and only formats
+them as clock times like "10:30 AM" for display.
+"""
+
+
+from datetime import datetime
+
+
+def parse_time(text):
+    """Convert a time like "10:30:00 AM", "9:05 am" or "10:20 AM" to minutes
+    since midnight. "EOD" (end of day) and empty values return None.
+    """
+
+    text = text.strip().upper()
+    if text in ("", "EOD"):
+        return None
+
+    for time_format in ("%I:%M:%S %p", "%I:%M %p", "%I:%M%p"):
+        try:
+            parsed = datetime.strptime(text, time_format)
+        except ValueError:
+            continue
+        return parsed.hour * 60 + parsed.minute
+
+    raise ValueError(f"Unrecognized time: {text!r}")
+
+
+def format_minutes(minutes):
+    """Format minutes since midnight as a clock time; None is "EOD"."""
+
+    if minutes is None:
+        return "EOD"
+
+    minutes = int(minutes)
+    hour, minute = divmod(minutes, 60)
+    return f"{(hour - 1) % 12 + 1:02}:{minute:02} {'AM' if hour % 24 < 12 else 'PM'}"
+
+
+def format_seconds(seconds):
+    """Format seconds since midnight as a clock time."""
+
+    return format_minutes(int(seconds) // 60)
@@ -0,0 +1,213 @@
+"""Class definition of a distance matrix. A distance matrix maps every known
+delivery address to an integer index and stores the distance between every
+pair of addresses as a float, so that a lookup is a simple O(1) list access.
+"""
+
+
+import csv
+import heapq
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the array view of the matrix
+    np = None
+
+
+def _row_views(array):
+    """Return a memoryview onto each row of a C-contiguous 2-D array. The
+    views read the array's own buffer -- memory-mapped or shared -- without
+    copying it, and indexing one gives a plain float, like a list would.
+    """
+
+    size = len(array)
+    if size == 0:
+        return []
+
+    flat = memoryview(array).cast("B").cast(array.dtype.char)
+    return [flat[start:start + size] for start in range(0, size * size, size)]
+
+
+class DistanceMatrix:
+
+    # initialize instance attributes
+    def __init__(self, addresses, rows):
+
+        self._set_addresses(addresses)
+
+        # the CSV only fills in the lower triangle of the table -- mirror it
+        #   into a full, symmetric matrix of floats so we never have to check
+        #   for empty cells or parse strings again
+        self.matrix = [[0.0] * self.size for _ in range(self.size)]
+        self._array = None
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row[:i + 1]):
+                if value == "":
+                    continue
+                distance = float(value)
+                self.matrix[i][j] = distance
+                self.matrix[j][i] = distance
+
+    def _set_addresses(self, addresses):
+
+        # full address names, as listed in the distance table's header row
+        # i.e. "Western Governors University|4001 South 700 East, Salt Lake City, UT 84107"
+        self.addresses = list(addresses)
+        self.size = len(self.addresses)
+
+        # address -> index map; filled with both the full names and the short
+        #   street forms used in packages.csv (the part after the "|")
+        self.index_map = {}
+        for index, address in enumerate(self.addresses):
+            self.index_map[address] = index
+            self.index_map.setdefault(self.street_address(address), index)
+
+        # k -> candidate lists built by nearest_neighbors()
+        self._neighbors = {}
+
+    def __repr__(self):
+
+        return f"<DistanceMatrix addresses={self.size}>"
+
+    def __len__(self):
+
+        return self.size
+
+    @classmethod
+    def from_csv(cls, filepath, cache=False, cache_path=None):
+        """Read the given distance table CSV and build a distance matrix. With
+        cache=True the matrix is memory-mapped from a compiled cache file next
+        to the CSV (or at cache_path), which is rebuilt whenever the CSV
+        changes; see lib/matrix_cache.py.
+        """
+
+        if cache:
+            from lib import matrix_cache
+            return matrix_cache.load(cls, filepath, cache_path)
+
+        with open(filepath, encoding="utf-8") as f:
+            reader = csv.reader(f)
+
+            # package addresses are taken from the CSV's first row, ignoring the first field
+            addresses = next(reader)[1:]
+
+            # every row after the header holds distances, excluding the first value (address)
+            rows = [row[1:] for row in reader]
+
+        return cls(addresses, rows)
+
+    @classmethod
+    def from_array(cls, addresses, array):
+        """Build a distance matrix from an already-parsed, full (symmetric)
+        NumPy array of distances, i.e. one held in shared memory or mapped
+        from a cache file. The array is used as-is by as_array(), and its rows
+        are read in place -- no list of lists is built.
+        """
+
+        array = np.ascontiguousarray(array)
+        distance_matrix = cls.__new__(cls)
+        distance_matrix._set_addresses(addresses)
+        distance_matrix.matrix = _row_views(array)
+        distance_matrix._array = array
+
+        return distance_matrix
+
+    @staticmethod
+    def street_address(address):
+        """Return the street portion of a full address name."""
+
+        # "Sugar House Park|1330 2100 S" -> "1330 2100 S"
+        return address.split("|")[-1].strip()
+
+    def index(self, address):
+        """Return the matrix index of the given address."""
+
+        try:
+            return self.index_map[address]
+        except KeyError:
+            pass
+
+        # not a known name -- fall back to a substring search over the full
+        #   address names, and remember the result for next time
+        for index, full_address in enumerate(self.addresses):
+            if address in full_address:
+                self.index_map[address] = index
+                return index
+
+        raise KeyError(f"Unknown address: {address!r}")
+
+    def distance(self, i, j):
+        """Return the distance between the addresses at indices i and j."""
+
+        return self.matrix[i][j]
+
+    def as_array(self):
+        """Return the matrix as a NumPy ndarray, built on first use."""
+
+        if np is None:
+            raise ImportError("DistanceMatrix.as_array requires numpy")
+
+        if self._array is None:
+            self._array = np.array(self.matrix, dtype=np.float64)
+
+        return self._array
+
+    def nearest_neighbors(self, k):
+        """Return, for every address index, the indices of the k closest
+        other addresses, nearest first. The lists are built once per k and
+        reused by the route planners and local search.
+        """
+
+        if k in self._neighbors:
+            return self._neighbors[k]
+
+        count = max(0, min(k, self.size - 1))
+        if np is not None and self.size > 0:
+            neighbors = self._nearest_neighbors_array(count)
+        else:
+            neighbors = []
+            for index in range(self.size):
+                row = self.matrix[index]
+                others = (other for other in range(self.size) if other != index)
+                neighbors.append(heapq.nsmallest(count, others, key=lambda other: (row[other], other)))
+
+        self._neighbors[k] = neighbors
+        return neighbors
+
+    def _nearest_neighbors_array(self, k, chunk_rows=1024):
+        """nearest_neighbors() with NumPy -- a partial sort of each row, a
+        block of rows at a time to bound the memory used.
+        """
+
+        array = self.as_array()
+        neighbors = []
+        for start in range(0, self.size, chunk_rows):
+            block = np.array(array[start:start + chunk_rows], dtype=np.float64)
+            rows = np.arange(start, start + len(block))
+
+            # an address is never its own neighbor
+            block[rows - start, rows] = np.inf
+
+            if k < self.size - 1:
+                closest = np.argpartition(block, k, axis=1)[:, :k]
+            else:
+                closest = np.tile(np.arange(self.size), (len(block), 1))
+            closest.sort(axis=1)
+            distances = np.take_along_axis(block, closest, axis=1)
+            ranked = np.take_along_axis(closest, np.argsort(distances, axis=1, kind="stable"), axis=1)
+
+            neighbors.extend(row[:k] for row in ranked.tolist())
+
+        return neighbors
+
+    def between(self, from_address, to_address):
+        """Return the distance between two addresses given by name."""
+
+        return self.matrix[self.index(from_address)][self.index(to_address)]
+
+
+# !---------------------------------------------------------------------------
+if __name__ == "__main__":
+
+    distances = DistanceMatrix.from_csv("./data/distances.csv")
+    print(distances)
+    print(distances.between("4001 South 700 East", "1330 2100 S"))
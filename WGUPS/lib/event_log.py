@@ -0,0 +1,209 @@
+"""Streaming event log. A simulation run can write every event it processes,
+and every package status change, to an append-only JSON Lines file as it goes
+-- one compact JSON array per line, behind a header line describing the run.
+replay() reads a log back into a SimulationResult and a StatusHistory, so a
+day can be audited (package states, per-truck miles, timelines, "status at
+time T") without planning or simulating it again.
+
+File layout, one JSON value per line (times in seconds since midnight):
+
+    {"format": "wgups-event-log", "version": 1, ...}   header -- the day, the
+                                                       start time, the trucks,
+                                                       the planner settings and
+                                                       every package's id,
+                                                       address and deadline
+    ["e", time, truck_id, distance, action, [package ids]]       an event
+    ["s", time, package_id, status, truck_id, trip, address]     a status change
+    ["p", package_id, address, deadline]              a package added mid-run
+    ["end", time, total distance]                     written when the run ends
+
+Lines are written through a large file buffer, so logging an event costs one
+json.dumps() and a memory copy. A log without its "end" line was cut short;
+replay() still reads everything written before that.
+"""
+
+
+import collections
+import json
+from datetime import date, datetime, timedelta
+
+from lib.package import Status
+from lib.results import PackageResult, SimulationResult
+from lib.status_history import StatusHistory, DELIVERED
+from lib.truck import Event
+
+
+FORMAT = "wgups-event-log"
+VERSION = 1
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+# a replayed log -- the run's header, its SimulationResult (trip_reports and
+#   stats are not logged), the StatusHistory and whether the log is complete
+Replay = collections.namedtuple("Replay", "header result history complete")
+
+_SEPARATORS = (",", ":")
+
+
+class EventLogWriter:
+    """Writes a run's events and status changes to an event log file. Use as
+    a context manager, or call close().
+    """
+
+    def __init__(self, filepath, buffer_size=DEFAULT_BUFFER_SIZE):
+
+        self.filepath = filepath
+        self._file = open(filepath, "w", encoding="utf-8", buffering=buffer_size)
+        self._dumps = json.JSONEncoder(separators=_SEPARATORS).encode
+
+    def __repr__(self):
+
+        return f"<EventLogWriter {self.filepath!r}>"
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+    def write_header(self, simulation):
+        """Write the header line describing a simulation's run."""
+
+        truck = next(iter(simulation.trucks.values()), None)
+        header = {
+            "format": FORMAT,
+            "version": VERSION,
+            "day": simulation.simulation_start_time.date().isoformat(),
+            "start_time": simulation._to_seconds(simulation.simulation_start_time),
+            "trucks": sorted(simulation.trucks),
+            "planner": None if truck is None else truck.planner,
+            "planner_settings": None if truck is None else truck.planner_settings(),
+            "packages": [
+                [package.id, package.address, package.deadline]
+                for package in sorted(simulation.packages.values(), key=lambda pkg: pkg.id)
+            ],
+        }
+        self._file.write(json.dumps(header, separators=_SEPARATORS) + "\n")
+
+    def write_event(self, event):
+
+        self._file.write(self._dumps(
+            ["e", event.time, event.truck_id, event.dist_travelled, event.action, list(event.package_ids)],
+        ) + "\n")
+
+    def write_status(self, package_id, time, status, truck_id=None, trip_number=None, address=None):
+
+        self._file.write(self._dumps(
+            ["s", time, package_id, int(status), truck_id, trip_number, address],
+        ) + "\n")
+
+    def write_package(self, package):
+        """Write a package added after the header, i.e. by Simulation.add_package."""
+
+        self._file.write(self._dumps(["p", package.id, package.address, package.deadline]) + "\n")
+
+    def write_end(self, time, total_distance):
+
+        self._file.write(self._dumps(["end", time, total_distance]) + "\n")
+
+    def close(self):
+
+        self._file.close()
+
+
+def read_log(filepath):
+    """Return the header of an event log and an iterator over its records."""
+
+    f = open(filepath, encoding="utf-8")
+    header = json.loads(f.readline() or "{}")
+    if header.get("format") != FORMAT:
+        f.close()
+        raise ValueError(f"{filepath} is not an event log")
+    if header.get("version") != VERSION:
+        f.close()
+        raise ValueError(f"Unsupported event log version: {header.get('version')!r}")
+
+    def records():
+        with f:
+            for line in f:
+                # a line cut off by a crash is ignored, like the rest of the run
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+
+    return header, records()
+
+
+def replay(filepath):
+    """Rebuild a run from its event log. Return a Replay."""
+
+    header, records = read_log(filepath)
+
+    day = datetime.combine(date.fromisoformat(header["day"]), datetime.min.time())
+    start_time = day + timedelta(seconds=header["start_time"])
+    history = StatusHistory(day)
+
+    deadlines = {}
+    for package_id, address, deadline in header["packages"]:
+        deadlines[package_id] = deadline
+
+    events = []
+    truck_miles = {truck_id: 0 for truck_id in header["trucks"]}
+    total_distance = 0
+    end_time = header["start_time"]
+    complete = False
+
+    for record in records:
+        kind = record[0]
+        if kind == "e":
+            _, time, truck_id, distance, action, package_ids = record
+            events.append(Event(day + timedelta(seconds=time), truck_id, distance, action, tuple(package_ids)))
+            if truck_id is not None:
+                truck_miles[truck_id] = truck_miles.get(truck_id, 0) + distance
+            total_distance += distance
+            end_time = max(end_time, time)
+        elif kind == "s":
+            _, time, package_id, status, truck_id, trip_number, address = record
+            history.record(package_id, time, Status(status), truck_id, trip_number, address)
+            deadlines.setdefault(package_id, None)
+        elif kind == "p":
+            _, package_id, address, deadline = record
+            deadlines[package_id] = deadline
+        elif kind == "end":
+            _, end_time, total_distance = record
+            complete = True
+
+    # each package's last recorded state -- a delivery is recorded when the
+    #   truck reaches the stop, like the package table does
+    packages = {}
+    for package_id, status in sorted(history.snapshot(float("inf")).items()):
+        if status is None:
+            continue
+        packages[package_id] = PackageResult(
+            package_id, status.address, deadlines[package_id], status.status,
+            status.truck_id, status.trip_number,
+            status.time if status.status == DELIVERED else None,
+        )
+
+    result = SimulationResult(
+        start_time=start_time,
+        end_time=day + timedelta(seconds=end_time),
+        total_distance=total_distance,
+        truck_miles=truck_miles,
+        packages=packages,
+        events=events,
+        trip_reports=[],
+    )
+    return Replay(header, result, history, complete)
+
+
+def timelines(result):
+    """Return each truck's events, in order: {truck id: [Event, ...]}."""
+
+    by_truck = collections.defaultdict(list)
+    for event in result.events:
+        by_truck[event.truck_id].append(event)
+    return dict(by_truck)
@@ -1,8 +1,16 @@
-"""An implementation of a hash table. This implementation uses chaining to
-handle collisions.
+"""Implementations of a hash table. HashTable uses chaining to handle
+collisions; OpenAddressingHashTable uses open addressing over parallel
+key/value arrays and a deterministic hash. Both share the same
+insert/lookup API.
 """
 
 
+# FNV-1a hash parameters (64-bit)
+_FNV_OFFSET = 0xcbf29ce484222325
+_FNV_PRIME = 0x100000001b3
+_MASK_64 = 0xffffffffffffffff
+
+
 class HashTable:
 
     # initialize instance attributes
@@ -17,6 +25,10 @@ class HashTable:
         self._resize_threshold = 0.7
         self._num_of_elements = 0
 
+        # optional RunStats that lookups, probes and resizes are counted in;
+        #   see lib/profiling.py
+        self.stats = None
+
     # provide a custom string representation for printing
     def __repr__(self):
         
@@ -30,6 +42,9 @@ class HashTable:
     # resize the hash table
     def _resize(self, new_size):
 
+        if self.stats is not None:
+            self.stats.counters["hash_resizes"] += 1
+
         stored_elements = []
         for bucket in self.table:
             for element in bucket:
@@ -55,18 +70,54 @@ class HashTable:
         if self._load_factor() >= self._resize_threshold:
             self._resize(self.size * 2)
 
+    def bulk_insert(self, items):
+        """Insert every (key, value) pair from the given iterable."""
+
+        for key, val in items:
+            self.insert(key, val)
+
     # lookup function -- takes a package id as input and returns the package
     def lookup(self, key):
         """Lookup the entry associated with the given key."""
 
         bucket_index = hash(key) % self.size
+        bucket = self.table[bucket_index]
+
         # run a linear search on the bucket's list
-        for package in self.table[bucket_index]:
+        for probes, package in enumerate(bucket, start=1):
             if package.id == key:
+                if self.stats is not None:
+                    self._count_lookup(probes)
                 return package
-        
+
+        if self.stats is not None:
+            self._count_lookup(len(bucket))
         return False  # not found
 
+    def delete(self, key):
+        """Remove the entry for the given key. Return False if the key is not
+        in the table.
+        """
+
+        bucket = self.table[hash(key) % self.size]
+        for position, package in enumerate(bucket):
+            if package.id == key:
+                del bucket[position]
+                self._num_of_elements -= 1
+                return True
+
+        return False
+
+    def _count_lookup(self, probes):
+
+        self.stats.counters["hash_lookups"] += 1
+        self.stats.counters["hash_probes"] += probes
+
+    def values(self):
+        """Return a list of all items stored in the hash table."""
+
+        return [element for bucket in self.table for element in bucket]
+
     def print_all(self):
         """Print all items stored in the hash table."""
 
@@ -77,15 +128,276 @@ class HashTable:
         print()
 
         # print package deadline & status for each package
-        packages = []
-        for bucket in self.table:
-            for element in bucket:
-                packages.append(element)
-
-        for package in sorted(packages, key=lambda pkg: int(pkg.id)):
+        for package in sorted(self.values(), key=lambda pkg: pkg.id):
             print(str(package))
 
 
+def stable_hash(key):
+    """Return a hash of the key which is the same on every run. Python's
+    built-in hash() of strings is salted per process.
+    """
+
+    if isinstance(key, int):
+        # splitmix64 finalizer -- spreads sequential ids across the table
+        x = (key + 0x9e3779b97f4a7c15) & _MASK_64
+        x = ((x ^ (x >> 30)) * 0xbf58476d1ce4e5b9) & _MASK_64
+        x = ((x ^ (x >> 27)) * 0x94d049bb133111eb) & _MASK_64
+        return x ^ (x >> 31)
+
+    # FNV-1a over the key's UTF-8 bytes
+    h = _FNV_OFFSET
+    for byte in str(key).encode("utf-8"):
+        h = ((h ^ byte) * _FNV_PRIME) & _MASK_64
+    return h
+
+
+class _Deleted:
+    """Marks a slot whose entry was deleted; probing continues past it. There
+    is a single instance, _DELETED, which copies and unpickles as itself so
+    it can still be compared with `is` in a copied table (see
+    Simulation.fork() and the sweep workers).
+    """
+
+    def __reduce__(self):
+
+        return "_DELETED"
+
+    def __repr__(self):
+
+        return "<deleted>"
+
+
+_DELETED = _Deleted()
+
+
+class OpenAddressingHashTable:
+
+    # initialize instance attributes
+    def __init__(self, initial_size=16):
+
+        # the number of slots is kept at a power of two so the probe start is
+        #   a bit mask instead of a modulo
+        self.size = self._slots_for(initial_size, 1.0)
+
+        # parallel arrays -- a slot holds a key, its hash and its value
+        self._keys = [None] * self.size
+        self._hashes = [0] * self.size
+        self._values = [None] * self.size
+
+        # resizing-related attributes; deleted slots count towards the load
+        self._resize_threshold = 0.7
+        self._num_of_elements = 0
+        self._num_of_deleted = 0
+
+        # optional RunStats that lookups, probes and resizes are counted in;
+        #   see lib/profiling.py
+        self.stats = None
+
+    # provide a custom string representation for printing
+    def __repr__(self):
+
+        return f"<OpenAddressingHashTable size={self.size} elements={self._num_of_elements}>"
+
+    def __len__(self):
+
+        return self._num_of_elements
+
+    def __iter__(self):
+        """Iterate over the stored keys."""
+
+        for key in self._keys:
+            if key is not None and key is not _DELETED:
+                yield key
+
+    def __contains__(self, key):
+
+        return self._find(key) is not None
+
+    @staticmethod
+    def _slots_for(count, threshold):
+        """Return the smallest power of two that holds count entries under the threshold."""
+
+        slots = 8
+        while slots * threshold < count:
+            slots *= 2
+        return slots
+
+    def _find(self, key):
+        """Return the slot holding the key, or None."""
+
+        return self._find_with_hash(key)[0]
+
+    def _find_with_hash(self, key):
+        """Return the slot holding the key (or None) and the key's hash, so
+        an insert can place a new key without hashing it again.
+        """
+
+        # Python's hash() of an int is the same in every process (only str
+        #   and bytes hashing is salted), and far cheaper than stable_hash()
+        key_hash = hash(key) & _MASK_64 if type(key) is int else stable_hash(key)
+        mask = self.size - 1
+        slot = key_hash & mask
+        perturb = key_hash
+        keys = self._keys
+
+        # probe like Python's dict: the high bits of the hash are shifted into
+        #   the sequence, so int keys that share their low bits (ids with a
+        #   stride, say) don't pile up in one run of slots. An empty slot ends
+        #   the search
+        probes = 1
+        while True:
+            stored = keys[slot]
+            if stored is None:
+                slot = None
+                break
+            if stored is not _DELETED and self._hashes[slot] == key_hash and stored == key:
+                break
+            perturb >>= 5
+            slot = (slot * 5 + perturb + 1) & mask
+            probes += 1
+
+        if self.stats is not None:
+            self.stats.counters["hash_lookups"] += 1
+            self.stats.counters["hash_probes"] += probes
+        return slot, key_hash
+
+    def _place(self, key, key_hash, val):
+        """Put a key known to be absent into the first free slot of its probe
+        sequence. No resize checks are made.
+        """
+
+        mask = self.size - 1
+        slot = key_hash & mask
+        perturb = key_hash
+        keys = self._keys
+        while keys[slot] is not None and keys[slot] is not _DELETED:
+            perturb >>= 5
+            slot = (slot * 5 + perturb + 1) & mask
+
+        if keys[slot] is _DELETED:
+            self._num_of_deleted -= 1
+        keys[slot] = key
+        self._hashes[slot] = key_hash
+        self._values[slot] = val
+        self._num_of_elements += 1
+
+    def _resize(self, new_size):
+        """Rebuild the table with the given number of slots. Entries are moved
+        straight into the new arrays using their stored hashes.
+        """
+
+        if self.stats is not None:
+            self.stats.counters["hash_resizes"] += 1
+
+        old_keys, old_hashes, old_values = self._keys, self._hashes, self._values
+
+        self.size = new_size
+        self._keys = [None] * new_size
+        self._hashes = [0] * new_size
+        self._values = [None] * new_size
+        self._num_of_elements = 0
+        self._num_of_deleted = 0
+
+        for slot, key in enumerate(old_keys):
+            if key is not None and key is not _DELETED:
+                self._place(key, old_hashes[slot], old_values[slot])
+
+    def presize(self, n):
+        """Make room for n entries so that inserting them never resizes."""
+
+        slots = self._slots_for(n, self._resize_threshold)
+        if slots > self.size:
+            self._resize(slots)
+
+    def insert(self, key, val):
+        """Insert the given key-value pair into the hash table. An existing
+        entry with the same key is replaced.
+        """
+
+        slot, key_hash = self._find_with_hash(key)
+        if slot is not None:
+            self._values[slot] = val
+            return
+
+        # hash table upkeep -- grow before the load (including deleted slots) gets too high
+        if (self._num_of_elements + self._num_of_deleted + 1) > self.size * self._resize_threshold:
+            self._resize(self._slots_for(self._num_of_elements + 1, self._resize_threshold / 2))
+
+        self._place(key, key_hash, val)
+
+    def bulk_insert(self, items):
+        """Insert every (key, value) pair from the given iterable, sizing the
+        table once up front.
+        """
+
+        items = list(items)
+        self.presize(self._num_of_elements + len(items))
+        for key, val in items:
+            self.insert(key, val)
+
+    def lookup(self, key):
+        """Lookup the entry associated with the given key."""
+
+        slot = self._find(key)
+        if slot is None:
+            return False  # not found
+
+        return self._values[slot]
+
+    def update(self, key, val):
+        """Replace the value stored for an existing key. Return False if the
+        key is not in the table.
+        """
+
+        slot = self._find(key)
+        if slot is None:
+            return False
+
+        self._values[slot] = val
+        return True
+
+    def delete(self, key):
+        """Remove the entry for the given key. Return False if the key is not
+        in the table.
+        """
+
+        slot = self._find(key)
+        if slot is None:
+            return False
+
+        # leave a marker so probe sequences passing through this slot still work
+        self._keys[slot] = _DELETED
+        self._values[slot] = None
+        self._num_of_elements -= 1
+        self._num_of_deleted += 1
+        return True
+
+    def items(self):
+        """Iterate over the stored (key, value) pairs."""
+
+        for slot, key in enumerate(self._keys):
+            if key is not None and key is not _DELETED:
+                yield key, self._values[slot]
+
+    def values(self):
+        """Return a list of all items stored in the hash table."""
+
+        return [val for _, val in self.items()]
+
+    def print_all(self):
+        """Print all items stored in the hash table."""
+
+        # the package table printout is the same for both implementations
+        HashTable.print_all(self)
+
+
+# hash table implementations selectable by name -- i.e. Simulation(hash_table="open_addressing")
+HASH_TABLES = {
+    "chaining": HashTable,
+    "open_addressing": OpenAddressingHashTable,
+}
+
+
 # !---------------------------------------------------------------------------
 if __name__ == "__main__":
 
@@ -93,3 +405,7 @@ if __name__ == "__main__":
     package_table = HashTable()
     print(package_table)
     print(package_table.table)
+
+    open_table = OpenAddressingHashTable()
+    open_table.bulk_insert((str(n), n) for n in range(100))
+    print(open_table, open_table.lookup("42"))
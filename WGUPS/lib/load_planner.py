@@ -0,0 +1,422 @@
+"""Automatic load planner. Reads each package's deadline and special notes and
+groups the packages into truck trips, replacing a hand-built load order.
+
+Special notes understood by the planner:
+
+    "Can only be on truck 2"                      -- truck restriction
+    "Delayed on flight---will not arrive to depot until 9:05 am"
+                                                  -- available at the hub later
+    "Must be delivered with 15, 19"               -- ride on the same trip
+    "Wrong address listed"                        -- held until the address
+                                                     correction is known
+
+Trips are built by simulating the dispatch of the trucks. Whenever a truck is
+free, a trip is seeded with its most urgent package and grown with the
+packages closest to the seed (a cluster on the distance matrix). Each
+candidate is first checked by inserting its stop into the trip's timed route;
+only one that fits there has the trip's route plotted again and every stop
+timed against the deadlines aboard.
+"""
+
+
+import collections
+import re
+
+from lib.clock import parse_time
+
+
+# a planned truck trip -- departure is in minutes since midnight
+Trip = collections.namedtuple("Trip", "truck_id departure package_ids")
+
+# constraints read from a package's special notes
+Constraints = collections.namedtuple("Constraints", "truck_id available_at delivered_with wrong_address")
+
+_TRUCK_NOTE = re.compile(r"can only be on truck\s+(\d+)", re.IGNORECASE)
+_DELAYED_NOTE = re.compile(r"until\s+(\d{1,2}:\d{2}\s*[ap]m)", re.IGNORECASE)
+_WITH_NOTE = re.compile(r"must be delivered with\s+([\d,\s]+)", re.IGNORECASE)
+_WRONG_ADDRESS_NOTE = re.compile(r"wrong address", re.IGNORECASE)
+
+
+def parse_special_note(note):
+    """Read a package's special note into a Constraints tuple."""
+
+    note = note or ""
+
+    truck_match = _TRUCK_NOTE.search(note)
+    delayed_match = _DELAYED_NOTE.search(note)
+    with_match = _WITH_NOTE.search(note)
+
+    return Constraints(
+        truck_id=int(truck_match.group(1)) if truck_match else None,
+        available_at=parse_time(delayed_match.group(1)) if delayed_match else None,
+        delivered_with=tuple(
+            int(pkg_id) for pkg_id in with_match.group(1).split(",") if pkg_id.strip()
+        ) if with_match else (),
+        wrong_address=bool(_WRONG_ADDRESS_NOTE.search(note)),
+    )
+
+
+class _Unit:
+    """A group of packages which must travel on the same trip."""
+
+    def __init__(self, packages):
+
+        self.package_ids = [pkg_id for pkg_id, _ in packages]
+        self.address_indices = [address_index for _, address_index in packages]
+        self.size = len(packages)
+
+        self.truck_id = None
+        self.available_at = 0
+        self.deadline = None
+        self.assigned = False
+
+    @property
+    def urgent(self):
+
+        return self.deadline is not None
+
+
+class _TimedRoute:
+    """A trip's stops in driving order, with the minute the truck reaches
+    each one and the latest minute it may (its earliest urgent deadline).
+    """
+
+    def __init__(self, departure, stops, arrivals, latest, return_time):
+
+        self.departure = departure
+        self.stops = stops
+        self.arrivals = arrivals
+        self.return_time = return_time
+        self._position = {address_index: position for position, address_index in enumerate(stops)}
+
+        # slack[p] -- how late the stops from position p on may run and
+        #   still meet every deadline
+        self._slack = [float("inf")] * (len(stops) + 1)
+        for position in range(len(stops) - 1, -1, -1):
+            self._slack[position] = min(self._slack[position + 1], latest[position] - arrivals[position])
+
+    def can_insert(self, unit, matrix, hub_index, minutes_per_mile):
+        """Return whether the unit's stop can be put somewhere on the route
+        without missing a deadline, keeping the other stops in order. Units
+        going to several addresses are left to a full replan.
+        """
+
+        if len(set(unit.address_indices)) > 1:
+            return True
+
+        address_index = unit.address_indices[0]
+        deadline = unit.deadline if unit.urgent else float("inf")
+
+        # a stop already on the route costs no extra driving
+        position = self._position.get(address_index)
+        if position is not None:
+            return self.arrivals[position] <= deadline
+
+        # otherwise try the stop between each pair of neighboring stops
+        to_stop = matrix[address_index]
+        previous, leave_time = hub_index, self.departure
+        for position, following in enumerate(self.stops + [hub_index]):
+            arrival = leave_time + to_stop[previous] * minutes_per_mile
+            detour = to_stop[previous] + to_stop[following] - matrix[previous][following]
+            if arrival <= deadline and detour * minutes_per_mile <= self._slack[position]:
+                return True
+            if position < len(self.stops):
+                previous, leave_time = following, self.arrivals[position]
+
+        return False
+
+
+class LoadPlanner:
+    """Builds truck trips from a package table's deadlines and special notes.
+    Run the planner by invoking the "plan" method.
+    """
+
+    def __init__(self, distance_matrix, plan_route, hub_index, capacity=16, speed=18,
+                 address_corrections=None, max_wait=120, max_departure_options=3, max_rejects=20):
+
+        self.distance_matrix = distance_matrix
+
+        # plan_route(start_index, stop_indices, end_index) -> (order, distance, ...)
+        # -- the same planner the trucks use, so predicted stop times match
+        self.plan_route = plan_route
+        self.hub_index = hub_index
+        self.capacity = capacity
+        self.speed = speed
+
+        # package id -> (minutes since midnight, corrected address)
+        self.address_corrections = address_corrections or {}
+
+        # how long (minutes) a truck may wait at the hub for urgent packages
+        #   that have not arrived yet, and how many departure times to try
+        self.max_wait = max_wait
+        self.max_departure_options = max_departure_options
+
+        # how many candidate units in a row may fail to fit before a trip
+        #   stops looking for more
+        self.max_rejects = max_rejects
+
+        # sorted neighbor lists, built on first use for each seed address
+        self._neighbors = {}
+
+    def plan(self, packages, truck_start_times):
+        """Plan the trips needed to deliver the given packages. packages is
+        an iterable of Package objects; truck_start_times maps each available
+        truck id to the minute it can first leave the hub. Return a list of
+        Trip tuples in dispatch order.
+        """
+
+        units = self._build_units(packages)
+
+        # units in seed order: most urgent first, then farthest from the hub
+        hub_row = self.distance_matrix.matrix[self.hub_index]
+        seed_order = sorted(
+            units,
+            key=lambda unit: (
+                unit.deadline if unit.urgent else float("inf"),
+                -max(hub_row[address_index] for address_index in unit.address_indices),
+            ),
+        )
+
+        # units waiting at each address, for growing trips around a seed
+        self._units_at = collections.defaultdict(list)
+        for unit in units:
+            for address_index in set(unit.address_indices):
+                self._units_at[address_index].append(unit)
+
+        # urgent units, by the time they arrive at the hub
+        urgent_by_arrival = sorted(
+            (unit for unit in units if unit.urgent and unit.available_at > 0),
+            key=lambda unit: unit.available_at,
+        )
+
+        trips = []
+        remaining = len(units)
+        truck_free = dict(truck_start_times)
+        while remaining and truck_free:
+
+            # the truck that is back at the hub first takes the next trip
+            truck_id = min(truck_free, key=lambda truck: (truck_free[truck], truck))
+            now = truck_free[truck_id]
+
+            trip = self._best_trip(truck_id, now, seed_order, urgent_by_arrival)
+            if trip is None:
+                # nothing left that this truck is allowed to carry
+                del truck_free[truck_id]
+                continue
+
+            departure, trip_units, return_time = trip
+            for unit in trip_units:
+                unit.assigned = True
+                for address_index in set(unit.address_indices):
+                    self._units_at[address_index].remove(unit)
+            remaining -= len(trip_units)
+
+            trips.append(Trip(
+                truck_id,
+                departure,
+                [pkg_id for unit in trip_units for pkg_id in unit.package_ids],
+            ))
+            truck_free[truck_id] = return_time
+
+        if remaining:
+            unplanned = [pkg_id for unit in units if not unit.assigned for pkg_id in unit.package_ids]
+            raise ValueError(f"Could not plan packages: {', '.join(map(str, unplanned))}")
+
+        return trips
+
+    def _build_units(self, packages):
+        """Group packages that must travel together and apply each package's
+        constraints to its group.
+        """
+
+        constraints = {}
+        addresses = {}
+        deadlines = {}
+        order = []
+        for package in packages:
+            notes = parse_special_note(package.notes)
+            address = package.address
+
+            # a package with a wrong address waits for its correction
+            if notes.wrong_address:
+                if package.id not in self.address_corrections:
+                    raise ValueError(f"Package {package.id} has a wrong address and no correction")
+                corrected_at, address = self.address_corrections[package.id]
+                notes = notes._replace(available_at=max(notes.available_at or 0, corrected_at))
+
+            constraints[package.id] = notes
+            addresses[package.id] = self.distance_matrix.index(address)
+            deadlines[package.id] = package.deadline
+            order.append(package.id)
+
+        # union-find over "must be delivered with" notes
+        parent = {pkg_id: pkg_id for pkg_id in order}
+
+        def find(pkg_id):
+            while parent[pkg_id] != pkg_id:
+                parent[pkg_id] = parent[parent[pkg_id]]
+                pkg_id = parent[pkg_id]
+            return pkg_id
+
+        for pkg_id in order:
+            for other_id in constraints[pkg_id].delivered_with:
+                if other_id in parent:
+                    parent[find(other_id)] = find(pkg_id)
+
+        # packages at the same address with identical constraints ride together too,
+        #   as long as the combined group still fits on a truck
+        size = collections.Counter(find(pkg_id) for pkg_id in order)
+        shared = {}
+        for pkg_id in order:
+            notes = constraints[pkg_id]
+            key = (addresses[pkg_id], notes.truck_id, notes.available_at, deadlines[pkg_id])
+            root = find(pkg_id)
+            other_root = find(shared[key]) if key in shared else None
+            if other_root is not None and other_root != root and size[root] + size[other_root] <= self.capacity:
+                parent[root] = other_root
+                size[other_root] += size[root]
+            else:
+                shared[key] = pkg_id
+
+        groups = collections.defaultdict(list)
+        for pkg_id in order:
+            groups[find(pkg_id)].append(pkg_id)
+
+        units = []
+        for members in groups.values():
+            unit = _Unit([(pkg_id, addresses[pkg_id]) for pkg_id in members])
+            if unit.size > self.capacity:
+                raise ValueError(f"Packages {', '.join(map(str, members))} do not fit on one truck")
+
+            for pkg_id in members:
+                notes = constraints[pkg_id]
+                if notes.truck_id is not None:
+                    if unit.truck_id not in (None, notes.truck_id):
+                        raise ValueError(f"Packages {', '.join(map(str, members))} are restricted to different trucks")
+                    unit.truck_id = notes.truck_id
+                unit.available_at = max(unit.available_at, notes.available_at or 0)
+                if deadlines[pkg_id] is not None and (unit.deadline is None or deadlines[pkg_id] < unit.deadline):
+                    unit.deadline = deadlines[pkg_id]
+
+            units.append(unit)
+
+        return units
+
+    def _best_trip(self, truck_id, now, seed_order, urgent_by_arrival):
+        """Choose when the truck should leave and what it should carry. Leaving
+        now is compared with waiting for urgent packages still in transit; the
+        option carrying the most urgent packages wins, earliest first.
+        """
+
+        allowed = [unit for unit in seed_order
+                   if not unit.assigned and unit.truck_id in (None, truck_id)]
+        if not allowed:
+            return None
+
+        departures = []
+        if any(unit.available_at <= now for unit in allowed):
+            departures.append(now)
+        else:
+            # nothing to carry yet -- wait for the next package to arrive
+            departures.append(min(unit.available_at for unit in allowed))
+
+        for unit in urgent_by_arrival:
+            if len(departures) >= self.max_departure_options:
+                break
+            if (not unit.assigned and unit.truck_id in (None, truck_id)
+                    and departures[0] < unit.available_at <= now + self.max_wait
+                    and unit.available_at not in departures):
+                departures.append(unit.available_at)
+
+        best = None
+        for departure in departures:
+            trip_units, return_time = self._build_trip(truck_id, departure, allowed)
+            urgent_aboard = sum(unit.size for unit in trip_units if unit.urgent)
+            if best is None or urgent_aboard > best[0]:
+                best = (urgent_aboard, departure, trip_units, return_time)
+
+        _, departure, trip_units, return_time = best
+        return departure, trip_units, return_time
+
+    def _build_trip(self, truck_id, departure, allowed):
+        """Seed a trip with the most urgent ready unit and grow it with the
+        ready units closest to the seed, urgent ones first. Each pass over the
+        candidates gives up after max_rejects units in a row do not fit.
+        """
+
+        ready = [unit for unit in allowed if unit.available_at <= departure]
+        seed = ready[0]
+        trip_units = [seed]
+        load = seed.size
+        route = self._check_trip(trip_units, departure)
+        if route is None:
+            # the seed cannot make its deadline at all -- deliver it as soon as possible
+            route = self._check_trip(trip_units, departure, ignore_deadlines=True)
+
+        for urgent_pass in (True, False):
+            rejects = 0
+            for unit in self._units_near(seed.address_indices[0]):
+                if load == self.capacity or rejects == self.max_rejects:
+                    break
+                if (unit.urgent != urgent_pass or unit is seed or unit in trip_units
+                        or unit.truck_id not in (None, truck_id) or unit.available_at > departure
+                        or load + unit.size > self.capacity):
+                    continue
+
+                # fast feasibility check: insert the unit's stop into the timed
+                #   route; only a unit that fits there is given a full replan
+                new_route = None
+                if route.can_insert(unit, self.distance_matrix.matrix, self.hub_index, 60 / self.speed):
+                    new_route = self._check_trip(trip_units + [unit], departure)
+                if new_route is None:
+                    rejects += 1
+                    continue
+
+                trip_units.append(unit)
+                load += unit.size
+                route = new_route
+                rejects = 0
+
+        return trip_units, route.return_time
+
+    def _units_near(self, address_index):
+        """Yield unassigned units by increasing distance from the address."""
+
+        if address_index not in self._neighbors:
+            row = self.distance_matrix.matrix[address_index]
+            self._neighbors[address_index] = sorted(range(len(row)), key=row.__getitem__)
+
+        # units are only removed once the trip is planned, after the scan
+        for neighbor in self._neighbors[address_index]:
+            yield from self._units_at.get(neighbor, ())
+
+    def _check_trip(self, trip_units, departure, ignore_deadlines=False):
+        """Plot the trip and time each stop. Return the timed route, or None
+        if a deadline aboard is missed.
+        """
+
+        # packages going to the same address share one stop
+        units_at = {}
+        for unit in trip_units:
+            for address_index in unit.address_indices:
+                units_at.setdefault(address_index, []).append(unit)
+        stop_indices = list(units_at)
+        order, distance, *_ = self.plan_route(self.hub_index, stop_indices, self.hub_index)
+
+        matrix = self.distance_matrix.matrix
+        minutes_per_mile = 60 / self.speed
+        stops = [stop_indices[position] for position in order]
+        arrivals = []
+        latest = []
+        time = departure
+        location = self.hub_index
+        for address_index in stops:
+            time += matrix[location][address_index] * minutes_per_mile
+            location = address_index
+            arrivals.append(time)
+            latest.append(min((unit.deadline for unit in units_at[address_index] if unit.urgent),
+                              default=float("inf")))
+            if not ignore_deadlines and time > latest[-1]:
+                return None
+
+        return _TimedRoute(departure, stops, arrivals, latest, departure + distance * minutes_per_mile)
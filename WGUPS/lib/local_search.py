@@ -0,0 +1,194 @@
+"""Local search improvement pass for plotted routes. A route produced by one of
+the planners in lib/route_planners.py is improved with two classic moves:
+
+    2-opt  -- reverse a section of the route, removing two crossing legs
+    Or-opt -- move a run of one to three stops to another place in the route
+
+Each candidate move is scored in O(1) by looking only at the legs it adds and
+removes, so no route is ever re-measured from scratch.
+"""
+
+
+import time
+
+
+# distances are floats -- ignore "improvements" smaller than this
+EPSILON = 1e-9
+
+# how many candidate moves are scored between looks at the clock
+CLOCK_CHECK_INTERVAL = 256
+
+
+def route_distance(distance_matrix, tour):
+    """Return the total distance of a tour given as a list of address indices."""
+
+    matrix = distance_matrix.matrix
+    return sum(matrix[tour[i]][tour[i + 1]] for i in range(len(tour) - 1))
+
+
+def improve_route(distance_matrix, start_index, stop_indices, end_index, order,
+                  max_iterations=None, time_limit=None, stats=None, candidates=None):
+    """Improve a planned route with 2-opt and Or-opt moves. The route is given
+    as an order of positions into stop_indices, like the planners return.
+    Stops after max_iterations improving moves or time_limit seconds, if set;
+    the time limit is also checked while scanning for a move.
+    With candidates=k, only moves which add a leg between an address and one
+    of its k nearest addresses are tried (see DistanceMatrix.nearest_neighbors),
+    instead of every pair of positions.
+    Passes and improving moves are counted in stats (a RunStats), if given.
+    Return the improved order and its total distance.
+    """
+
+    d = distance_matrix.matrix
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    # the tour holds positions into stop_indices, bracketed by the start and
+    #   end locations; "loc" translates a tour entry to its address index
+    tour = [None] + list(order) + [None]
+    n = len(tour)
+
+    def loc(entry, i):
+        if i == 0:
+            return start_index
+        if i == n - 1:
+            return end_index
+        return stop_indices[entry]
+
+    # candidate lists -- "where" holds the tour index of every stop, and
+    #   near() finds the tour indices of the stops at or next to addresses
+    if candidates is not None:
+        neighbors = distance_matrix.nearest_neighbors(candidates)
+        stops_at = {}
+        for position, address_index in enumerate(stop_indices):
+            stops_at.setdefault(address_index, []).append(position)
+        where = [0] * len(stop_indices)
+        for index in range(1, n - 1):
+            where[tour[index]] = index
+
+        def near(addresses):
+            return [
+                where[position]
+                for address in addresses
+                for near_address in (address, *neighbors[address])
+                for position in stops_at.get(near_address, ())
+            ]
+
+    iterations = 0
+    scanned = 0
+    improved = True
+    while improved:
+        improved = False
+        if stats is not None:
+            stats.counters["local_search_passes"] += 1
+
+        # 2-opt: reverse tour[i..j]; replaces legs (a, b) and (c, e) with (a, c) and (b, e)
+        for i in range(1, n - 2):
+            a = loc(tour[i - 1], i - 1)
+            b = loc(tour[i], i)
+            if candidates is None:
+                ends = range(i + 1, n - 1)
+            else:
+                # the new leg (a, c) goes to one of a's candidates
+                ends = sorted(j for j in near((a,)) if i < j < n - 1)
+            for j in ends:
+                scanned += 1
+                if _out_of_time(scanned, deadline):
+                    return _finish(distance_matrix, start_index, stop_indices, end_index, tour)
+                c = loc(tour[j], j)
+                e = loc(tour[j + 1], j + 1)
+                delta = d[a][c] + d[b][e] - d[a][b] - d[c][e]
+                if delta < -EPSILON:
+                    tour[i:j + 1] = reversed(tour[i:j + 1])
+                    if candidates is not None:
+                        for index in range(i, j + 1):
+                            where[tour[index]] = index
+                    b = loc(tour[i], i)
+                    improved = True
+                    iterations += 1
+                    if stats is not None:
+                        stats.counters["local_search_moves"] += 1
+                    if _out_of_budget(iterations, max_iterations, deadline):
+                        return _finish(distance_matrix, start_index, stop_indices, end_index, tour)
+
+        # Or-opt: move the run tour[i..i+length-1] between tour[k] and tour[k+1],
+        #   optionally reversing it
+        for length in (1, 2, 3):
+            i = 1
+            while i + length <= n - 1:
+                j = i + length - 1
+                p = loc(tour[i - 1], i - 1)
+                first = loc(tour[i], i)
+                last = loc(tour[j], j)
+                q = loc(tour[j + 1], j + 1)
+                removal_gain = d[p][first] + d[last][q] - d[p][q]
+
+                if candidates is None:
+                    slots = range(0, n - 1)
+                else:
+                    # the run is reattached next to one of its ends' candidates
+                    slots = sorted({k for index in near((first, last)) for k in (index - 1, index)} | {0, n - 2})
+
+                best = None
+                for k in slots:
+                    if i - 1 <= k <= j:
+                        continue
+                    scanned += 1
+                    if _out_of_time(scanned, deadline):
+                        return _finish(distance_matrix, start_index, stop_indices, end_index, tour)
+                    x = loc(tour[k], k)
+                    y = loc(tour[k + 1], k + 1)
+                    forward = d[x][first] + d[last][y] - d[x][y]
+                    backward = d[x][last] + d[first][y] - d[x][y]
+                    insert_cost, reverse = (backward, True) if backward < forward else (forward, False)
+                    delta = insert_cost - removal_gain
+                    if delta < -EPSILON and (best is None or delta < best[0]):
+                        best = (delta, k, reverse)
+
+                if best is None:
+                    i += 1
+                    continue
+
+                # apply the best move found for this run
+                _, k, reverse = best
+                segment = tour[i:j + 1]
+                if reverse:
+                    segment.reverse()
+                del tour[i:j + 1]
+                insert_at = k + 1 if k < i else k + 1 - length
+                tour[insert_at:insert_at] = segment
+                if candidates is not None:
+                    for index in range(min(i, insert_at), max(j, insert_at + length - 1) + 1):
+                        where[tour[index]] = index
+
+                improved = True
+                iterations += 1
+                if stats is not None:
+                    stats.counters["local_search_moves"] += 1
+                if _out_of_budget(iterations, max_iterations, deadline):
+                    return _finish(distance_matrix, start_index, stop_indices, end_index, tour)
+
+    return _finish(distance_matrix, start_index, stop_indices, end_index, tour)
+
+
+def _out_of_budget(iterations, max_iterations, deadline):
+    """Return True once the iteration or time budget has been used up."""
+
+    if max_iterations is not None and iterations >= max_iterations:
+        return True
+    return deadline is not None and time.perf_counter() >= deadline
+
+
+def _out_of_time(scanned, deadline):
+    """Return True once the time budget has been used up, looking at the
+    clock only every CLOCK_CHECK_INTERVAL candidate moves.
+    """
+
+    return deadline is not None and not scanned % CLOCK_CHECK_INTERVAL and time.perf_counter() >= deadline
+
+
+def _finish(distance_matrix, start_index, stop_indices, end_index, tour):
+    """Strip the start/end markers from a tour and measure the result."""
+
+    order = tour[1:-1]
+    path = [start_index] + [stop_indices[position] for position in order] + [end_index]
+    return order, route_distance(distance_matrix, path)
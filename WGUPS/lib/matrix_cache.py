@@ -0,0 +1,183 @@
+"""Compiled, memory-mapped distance matrix cache. Parsing a large distance
+table CSV dominates startup, so the parsed matrix is written once to a binary
+file next to the CSV and memory-mapped on later runs -- opening it costs the
+same for 27 addresses or 10,000, and every process mapping the file shares
+the same pages instead of holding its own copy.
+
+File layout (little endian):
+
+    magic           8 bytes   b"WGUPSDM1"
+    header          struct _HEADER -- the CSV's size, mtime and SHA-256, the
+                              number of addresses, the float type and the
+                              offsets of the sections below
+    address table   UTF-8 JSON list of the full address names
+    padding         up to a 64 byte boundary
+    matrix          n x n floats (float64 or float32), row major
+
+The cache is rebuilt when the CSV changes. A matching size and mtime is
+trusted as is; otherwise the CSV is hashed, so touching the file without
+changing it does not force a rebuild, and the header takes the new size and
+mtime so the next run does not hash it again.
+"""
+
+
+import hashlib
+import json
+import os
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # without numpy the CSV is parsed on every start
+    np = None
+
+
+MAGIC = b"WGUPSDM1"
+
+# source size, source mtime, source SHA-256, addresses, float type code,
+#   address table offset and length, matrix offset
+_HEADER = struct.Struct("<Qd32sQ1sxxxxxxxQQQ")
+
+_DTYPES = {"float64": b"d", "float32": b"f"}
+
+_ALIGNMENT = 64
+
+
+def cache_path_for(csv_path):
+    """Return the default cache file for a distance table CSV."""
+
+    return csv_path + ".cache"
+
+
+def _file_hash(filepath):
+
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def _read_header(cache_path):
+    """Return the cache file's header fields, or None if it is not a valid cache."""
+
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read(len(MAGIC) + _HEADER.size)
+    except OSError:
+        return None
+
+    if len(data) < len(MAGIC) + _HEADER.size or not data.startswith(MAGIC):
+        return None
+    return _HEADER.unpack_from(data, len(MAGIC))
+
+
+def _update_header(cache_path, header):
+    """Rewrite the cache file's header in place. A cache which cannot be
+    written to is left as it is.
+    """
+
+    try:
+        with open(cache_path, "r+b") as f:
+            f.seek(len(MAGIC))
+            f.write(_HEADER.pack(*header))
+    except OSError:
+        pass
+
+
+def write_cache(cache_path, csv_path, addresses, array, dtype="float64"):
+    """Write a cache file for the given addresses and full distance array.
+    The file is written to a temporary name and moved into place, so a
+    reader never sees a half-written cache.
+    """
+
+    stat = os.stat(csv_path)
+    address_table = json.dumps(list(addresses)).encode("utf-8")
+    table_offset = len(MAGIC) + _HEADER.size
+    matrix_offset = -(-(table_offset + len(address_table)) // _ALIGNMENT) * _ALIGNMENT
+
+    header = _HEADER.pack(
+        stat.st_size, stat.st_mtime, _file_hash(csv_path), len(addresses), _DTYPES[dtype],
+        table_offset, len(address_table), matrix_offset,
+    )
+
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(header)
+            f.write(address_table)
+            f.write(b"\0" * (matrix_offset - table_offset - len(address_table)))
+            f.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        os.replace(temporary_path, cache_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def open_cache(cache_path, csv_path):
+    """Memory-map a cache file. Return (addresses, array), or None if the
+    cache is missing, unreadable or out of date with the CSV.
+    """
+
+    header = _read_header(cache_path)
+    if header is None:
+        return None
+    size, mtime, source_hash, num_addresses, type_code, table_offset, table_length, matrix_offset = header
+
+    stat = os.stat(csv_path)
+    if (stat.st_size, stat.st_mtime) != (size, mtime):
+        # the CSV was touched -- only its contents decide
+        if stat.st_size != size or _file_hash(csv_path) != source_hash:
+            return None
+
+        # unchanged -- note the new mtime, so the next run need not hash it again
+        _update_header(cache_path, (stat.st_size, stat.st_mtime) + header[2:])
+
+    dtype = {code: name for name, code in _DTYPES.items()}.get(type_code)
+    if dtype is None:
+        return None
+
+    with open(cache_path, "rb") as f:
+        f.seek(table_offset)
+        addresses = json.loads(f.read(table_length).decode("utf-8"))
+
+    expected_size = matrix_offset + num_addresses * num_addresses * np.dtype(dtype).itemsize
+    if os.path.getsize(cache_path) != expected_size:
+        return None
+
+    if num_addresses == 0:
+        return addresses, np.zeros((0, 0), dtype=dtype)
+
+    array = np.memmap(cache_path, dtype=dtype, mode="r", offset=matrix_offset,
+                      shape=(num_addresses, num_addresses))
+    return addresses, array
+
+
+def load(distance_matrix_class, csv_path, cache_path=None, dtype="float64"):
+    """Return a DistanceMatrix for the CSV, memory-mapped from its cache file.
+    The cache is (re)built from the CSV when needed; if it cannot be written,
+    the parsed matrix is returned directly.
+    """
+
+    if np is None:
+        return distance_matrix_class.from_csv(csv_path)
+
+    if cache_path is None:
+        cache_path = cache_path_for(csv_path)
+
+    cached = open_cache(cache_path, csv_path)
+    if cached is None:
+        distance_matrix = distance_matrix_class.from_csv(csv_path)
+        try:
+            write_cache(cache_path, csv_path, distance_matrix.addresses, distance_matrix.as_array(), dtype)
+        except OSError:
+            # i.e. a read-only data directory
+            return distance_matrix
+
+        cached = open_cache(cache_path, csv_path)
+        if cached is None:
+            return distance_matrix
+
+    addresses, array = cached
+    return distance_matrix_class.from_array(addresses, array)
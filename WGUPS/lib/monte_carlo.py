@@ -0,0 +1,153 @@
+"""Monte Carlo on-time estimates. A simulation run drives one fixed timeline at
+the trucks' average speed; this module replays the routes it drove with
+random travel and service times, for thousands of trials at once, and reports
+how likely each package is to make its deadline.
+
+Every trip is a trials x legs matrix: the time of each leg is its distance
+over a sampled speed, plus a sampled service time at each stop. A cumulative
+sum along the legs gives every stop's arrival time in every trial, and a
+truck's next trip leaves at the later of its sampled return and the trip's
+earliest departure. Only the trips are looped over in Python -- never the
+trials.
+
+Speeds are drawn per leg from a normal distribution around the truck's speed
+(clipped to a minimum), and service times per stop from a gamma distribution
+with the given mean. With no spread and no service time every trial matches
+the simulated timeline to the second.
+"""
+
+
+import collections
+
+import numpy as np
+
+from lib.clock import format_minutes, format_seconds
+
+
+# on-time odds of one package -- deadline in minutes since midnight (None =
+#   EOD), arrival percentiles as {percentile: seconds since midnight}
+PackageOdds = collections.namedtuple("PackageOdds", "package_id deadline on_time_probability arrival_percentiles")
+
+# a driven trip -- when it left the hub in the simulation, the earliest time
+#   it could have left (None for a truck's first trip, which always leaves
+#   when it did), and the distance and packages of each leg; the last leg
+#   returns to the hub
+_Trip = collections.namedtuple("_Trip", "departure earliest_departure distances package_ids")
+
+DEFAULT_PERCENTILES = (50, 90, 95)
+
+
+def driven_trips(simulation):
+    """Return each truck's driven trips, in order, from a simulation's event
+    log: {truck id: [_Trip, ...]}.
+    """
+
+    trips = {truck_id: [] for truck_id in simulation.trucks}
+    current = {}
+    for event in simulation.event_log:
+        if event.action == "Leaving the HUB":
+            current[event.truck_id] = _Trip(event.time, None, [], [])
+        elif event.truck_id in current and (event.action == "Returned to the HUB"
+                                            or event.action.startswith(("Dropped off", "Arrived at"))):
+            trip = current[event.truck_id]
+            trip.distances.append(event.dist_travelled)
+            trip.package_ids.append(event.package_ids)
+            if event.action == "Returned to the HUB":
+                trips[event.truck_id].append(trip)
+                del current[event.truck_id]
+
+    # trips still out when the run ended -- closed with an empty last leg
+    for truck_id, trip in current.items():
+        trip.distances.append(0.0)
+        trip.package_ids.append(())
+        trips[truck_id].append(trip)
+
+    # a truck's later trips may leave as soon as it is back, but not before
+    #   the trip's packages are at the hub; trip numbers run in dispatch order
+    for truck_id, truck_trips in trips.items():
+        earliest = [
+            departure for _, (trip_truck_id, departure) in sorted(simulation.trip_departures.items())
+            if trip_truck_id == truck_id
+        ]
+        for index in range(1, len(truck_trips)):
+            truck_trips[index] = truck_trips[index]._replace(earliest_departure=earliest[index])
+
+    return trips
+
+
+def simulate_on_time(simulation, trials=10000, speed_sd=3.0, min_speed=5.0, service_minutes=1.0,
+                     percentiles=DEFAULT_PERCENTILES, seed=0):
+    """Estimate the on-time probability and arrival time percentiles of every
+    package delivered in a finished simulation run, over the given number of
+    trials. Speeds are in mph and service times in minutes. Return a dictionary
+    of PackageOdds by package id.
+    """
+
+    rng = np.random.default_rng(seed)
+    arrivals = {}
+
+    for truck_id, trips in driven_trips(simulation).items():
+        speed = simulation.trucks[truck_id].speed
+        ready = None
+        for trip in trips:
+            distances = np.array(trip.distances, dtype=np.float64)
+            legs = len(distances)
+
+            # travel seconds of every leg in every trial, rounded like the simulation
+            speeds = rng.normal(speed, speed_sd, (trials, legs)) if speed_sd > 0 else np.full((trials, legs), speed)
+            travel = np.rint(distances / np.maximum(speeds, min_speed) * 3600)
+
+            # service time at every stop -- none at the hub at the end
+            service = np.zeros((trials, legs))
+            if service_minutes > 0:
+                service[:, :-1] = rng.gamma(2.0, service_minutes * 60 / 2.0, (trials, legs - 1))
+
+            if ready is None:
+                departure = np.full(trials, float(trip.departure))
+            else:
+                departure = np.maximum(ready, trip.earliest_departure)
+
+            # arrival at each stop -- the legs driven so far plus the service
+            #   time of every earlier stop
+            elapsed = np.cumsum(travel, axis=1) + np.cumsum(service, axis=1) - service
+            arrival = departure[:, None] + elapsed
+
+            for leg, package_ids in enumerate(trip.package_ids[:-1]):
+                for package_id in package_ids:
+                    arrivals[package_id] = arrival[:, leg]
+            ready = arrival[:, -1]
+
+    odds = {}
+    for package_id in sorted(arrivals):
+        package = simulation.packages.lookup(package_id)
+        times = arrivals[package_id]
+        if package.deadline is None:
+            on_time = 1.0
+        else:
+            on_time = float(np.count_nonzero(times <= package.deadline * 60)) / trials
+        odds[package_id] = PackageOdds(
+            package_id, package.deadline, on_time,
+            {percentile: float(value) for percentile, value in zip(percentiles, np.percentile(times, percentiles))},
+        )
+    return odds
+
+
+def print_on_time_report(odds, file=None):
+    """Print each package's on-time probability and arrival percentiles."""
+
+    if not odds:
+        return
+    percentiles = list(next(iter(odds.values())).arrival_percentiles)
+
+    print("\nOn-time probability:", file=file)
+    header = "".join(f"{f'p{percentile}':>12}" for percentile in percentiles)
+    print(f"    {'Package':<10}{'Deadline':>12}{'On time':>10}{header}", file=file)
+    for package_odds in odds.values():
+        columns = "".join(
+            f"{format_seconds(round(seconds)):>12}" for seconds in package_odds.arrival_percentiles.values()
+        )
+        print(
+            f"    {package_odds.package_id:<10}{format_minutes(package_odds.deadline):>12}"
+            f"{package_odds.on_time_probability:>10.1%}{columns}",
+            file=file,
+        )
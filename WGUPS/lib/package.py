@@ -1,39 +1,104 @@
 """Class definition of a package. A package object contains fields relevent to
 the package delivery; i.e. delivery address, package weight, etc.
+
+Packages are kept compact: __slots__ instead of an instance dictionary, an
+integer ID, zip and weight, the deadline as minutes since midnight (None for
+EOD), the status as a Status code and the delivery time as seconds since
+midnight. Fields are only formatted as text for display.
 """
 
 
+from enum import IntEnum
+
+from lib.clock import format_minutes, format_seconds, parse_time
+
+
+class Status(IntEnum):
+    """Delivery status codes."""
+
+    AT_HUB = 0
+    EN_ROUTE = 1
+    DELIVERED = 2
+    CANCELLED = 3
+
+    @property
+    def label(self):
+
+        return _STATUS_LABELS[self]
+
+    @classmethod
+    def parse(cls, label):
+        """Return the status for a label like "EN ROUTE" or "DELIVERED 10:07 AM"."""
+
+        for status, status_label in _STATUS_LABELS.items():
+            if label.upper().startswith(status_label):
+                return status
+        raise ValueError(f"Unknown status: {label!r}")
+
+
+_STATUS_LABELS = {
+    Status.AT_HUB: "AT THE HUB",
+    Status.EN_ROUTE: "EN ROUTE",
+    Status.DELIVERED: "DELIVERED",
+    Status.CANCELLED: "CANCELLED",
+}
+
+
+def _to_number(value):
+    """Convert a weight like "21" or "2.5" to an int or float."""
+
+    if isinstance(value, str):
+        return float(value) if "." in value else int(value)
+    return value
+
+
 class Package:
 
+    __slots__ = (
+        "id", "address", "city", "zip", "weight", "deadline", "notes",
+        "status", "truck", "trip_number", "delivery_time",
+    )
+
     # initialize instance attributes
-    def __init__(self, package_id, address, city, zip, weight, deadline):
+    def __init__(self, package_id, address, city, zip, weight, deadline, notes=""):
 
-        self.id = package_id
+        self.id = int(package_id)
 
         # delivery location
         self.address = address
         self.city = city
-        self.zip = zip
+        self.zip = int(zip)
 
         # other delivery information
-        self.weight = weight
-        self.deadline = deadline
-        self.status = "AT THE HUB"
+        # deadline: minutes since midnight, None = end of day ("EOD")
+        self.weight = _to_number(weight)
+        self.deadline = parse_time(deadline) if isinstance(deadline, str) else deadline
+        self.notes = notes  # special notes; read by the load planner
+        self.status = Status.AT_HUB
         self.truck = None
         self.trip_number = None
+        self.delivery_time = None  # seconds since midnight
+
+    @property
+    def status_label(self):
+        """The status as displayed, i.e. "DELIVERED 10:07 AM"."""
+
+        if self.status == Status.DELIVERED and self.delivery_time is not None:
+            return f"{self.status.label} {format_seconds(self.delivery_time)}"
+        return self.status.label
 
     # custom string representation of a package instance
     def __repr__(self):
-        
-        return f"<Package {self.id:0>2}, status={self.status}>"
-    
+
+        return f"<Package {self.id:0>2}, status={self.status_label}>"
+
     def __str__(self):
 
-        return f"Package {self.id:0>2} {self.deadline:>15} {self.status:>20} {self.truck or 'N/A':>8} {self.trip_number or 'N/A':>8} {self.address:>40}"
+        return f"Package {self.id:0>2} {format_minutes(self.deadline):>15} {self.status_label:>20} {self.truck or 'N/A':>8} {self.trip_number or 'N/A':>8} {self.address:>40}"
+
 
-    
 # !---------------------------------------------------------------------------
 if __name__ == "__main__":
 
-    pkg = Package(1, "123 Sesame Street", "Eagle Mountain", 84005, "3lbs", "12:30")
+    pkg = Package(1, "123 Sesame Street", "Eagle Mountain", 84005, "3", "12:30 PM")
     print(pkg)
@@ -0,0 +1,219 @@
+"""Package table with secondary indexes. Wraps one of the hash tables in
+lib/hash_table.py (which finds packages by ID) and keeps indexes on the
+address, deadline, zip, weight, status and truck of every package, so a
+query like "everything due by 10:30 AM" or "what is on truck 2" costs time
+proportional to the number of results instead of a scan of every bucket.
+
+Package fields which are indexed must be changed through set_fields() so the
+indexes stay current.
+"""
+
+
+from bisect import bisect_left, bisect_right
+
+from lib.clock import parse_time
+from lib.package import Status
+
+
+# fields with an equality index -- value -> {package id: None}, an ordered set
+INDEXED_FIELDS = ("address", "deadline", "zip", "weight", "status", "truck")
+
+
+def _index_key(field, value):
+    """Return the index key for a field value. Statuses are indexed by their
+    Status code; labels like "EN ROUTE" are accepted in queries too.
+    """
+
+    if field == "status" and isinstance(value, str):
+        return Status.parse(value)
+    return value
+
+
+class PackageTable:
+
+    # initialize instance attributes
+    def __init__(self, table):
+
+        # the underlying hash table -- looks up packages by ID
+        self.table = table
+
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+
+        # deadlines in minutes since midnight, kept sorted for "due by" range
+        #   queries, with the matching package ids; EOD packages have no entry
+        self._deadline_times = []
+        self._deadline_ids = []
+
+        self._index_all(table.values())
+
+    def __repr__(self):
+
+        return f"<PackageTable {self.table!r}>"
+
+    def _add_to_indexes(self, package):
+
+        for field in INDEXED_FIELDS:
+            key = _index_key(field, getattr(package, field))
+            self._indexes[field].setdefault(key, {})[package.id] = None
+
+        self._add_deadline(package.id, package.deadline)
+
+    def _index_all(self, packages):
+        """Index many new packages at once, sorting the deadlines a single time."""
+
+        deadlines = list(zip(self._deadline_times, self._deadline_ids))
+        for package in packages:
+            for field in INDEXED_FIELDS:
+                key = _index_key(field, getattr(package, field))
+                self._indexes[field].setdefault(key, {})[package.id] = None
+
+            if package.deadline is not None:
+                deadlines.append((package.deadline, package.id))
+
+        # a stable sort on the time alone keeps ties in insertion order
+        deadlines.sort(key=lambda entry: entry[0])
+        self._deadline_times = [minutes for minutes, _ in deadlines]
+        self._deadline_ids = [package_id for _, package_id in deadlines]
+
+    def _add_deadline(self, package_id, minutes):
+
+        if minutes is not None:
+            position = bisect_right(self._deadline_times, minutes)
+            self._deadline_times.insert(position, minutes)
+            self._deadline_ids.insert(position, package_id)
+
+    def _remove_deadline(self, package_id, minutes):
+
+        if minutes is None:
+            return
+
+        # search only the entries sharing this deadline
+        start = bisect_left(self._deadline_times, minutes)
+        end = bisect_right(self._deadline_times, minutes)
+        for position in range(start, end):
+            if self._deadline_ids[position] == package_id:
+                del self._deadline_times[position]
+                del self._deadline_ids[position]
+                return
+
+    def _remove_from_index(self, field, package):
+
+        key = _index_key(field, getattr(package, field))
+        bucket = self._indexes[field].get(key)
+        if bucket is not None:
+            bucket.pop(package.id, None)
+            if not bucket:
+                del self._indexes[field][key]
+
+        if field == "deadline":
+            self._remove_deadline(package.id, package.deadline)
+
+    def insert(self, key, package):
+        """Insert a package into the table and its indexes."""
+
+        existing = self.table.lookup(key)
+        if existing:
+            for field in INDEXED_FIELDS:
+                self._remove_from_index(field, existing)
+
+        self.table.insert(key, package)
+        self._add_to_indexes(package)
+
+    def bulk_insert(self, items):
+        """Insert every (key, package) pair from the given iterable. The hash
+        table is loaded in one batch and the indexes are built afterwards.
+        """
+
+        items = list(items)
+        for key, _ in items:
+            existing = self.table.lookup(key)
+            if existing:
+                for field in INDEXED_FIELDS:
+                    self._remove_from_index(field, existing)
+
+        self.table.bulk_insert(items)
+        self._index_all(package for _, package in items)
+
+    def delete(self, key):
+        """Remove a package from the table and its indexes. Return the
+        package, or False if there is none with the given ID.
+        """
+
+        package = self.table.lookup(key)
+        if not package:
+            return False
+
+        for field in INDEXED_FIELDS:
+            self._remove_from_index(field, package)
+        self.table.delete(key)
+        return package
+
+    def lookup(self, key):
+        """Lookup the package associated with the given ID."""
+
+        return self.table.lookup(key)
+
+    def values(self):
+        """Return a list of all packages in the table."""
+
+        return self.table.values()
+
+    def print_all(self):
+        """Print all packages in the table."""
+
+        self.table.print_all()
+
+    def set_fields(self, package_id, **fields):
+        """Change fields of a package, keeping the indexes up to date.
+        i.e. set_fields(3, status=Status.EN_ROUTE, truck=2)
+        """
+
+        package = self.table.lookup(package_id)
+        for field, value in fields.items():
+            indexed = field in INDEXED_FIELDS
+            if indexed:
+                self._remove_from_index(field, package)
+
+            setattr(package, field, value)
+
+            if indexed:
+                key = _index_key(field, value)
+                self._indexes[field].setdefault(key, {})[package_id] = None
+                if field == "deadline":
+                    self._add_deadline(package_id, value)
+
+        return package
+
+    def find(self, **criteria):
+        """Return the packages matching every given field value, in the order
+        they were indexed. i.e. find(truck=2, status="EN ROUTE")
+        """
+
+        buckets = []
+        for field, value in criteria.items():
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"{field!r} is not an indexed field")
+            buckets.append(self._indexes[field].get(_index_key(field, value), {}))
+
+        if not buckets:
+            return self.values()
+
+        # walk the smallest matching set and check the others
+        buckets.sort(key=len)
+        smallest, others = buckets[0], buckets[1:]
+        return [
+            self.table.lookup(package_id)
+            for package_id in smallest
+            if all(package_id in bucket for bucket in others)
+        ]
+
+    def due_by(self, time):
+        """Return the packages with a deadline at or before the given time
+        (minutes since midnight or a time like "10:30 AM"), earliest first.
+        """
+
+        if isinstance(time, str):
+            time = parse_time(time)
+
+        end = bisect_right(self._deadline_times, time)
+        return [self.table.lookup(package_id) for package_id in self._deadline_ids[:end]]
@@ -0,0 +1,89 @@
+"""Optional run instrumentation. A RunStats object collects the wall time of
+each phase of a run (load, plan, simulate, report) and counters from the hot
+paths: distance lookups, hash table probes and resizes, events pushed and
+popped and route planning work.
+
+Instrumentation is off unless a RunStats object is handed out -- the hash
+tables and trucks keep a "stats" attribute which is None by default, so the
+only cost of a disabled counter is one "is not None" check.
+"""
+
+
+import collections
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class RunStats:
+
+    # initialize instance attributes
+    def __init__(self):
+
+        # phase name -> wall time in seconds, in the order the phases ran
+        self.phases = {}
+
+        # [name, start] of the phases under way, innermost last
+        self._running = []
+
+        # counter name -> count
+        self.counters = collections.Counter()
+
+    def __repr__(self):
+
+        return f"<RunStats phases={len(self.phases)} counters={len(self.counters)}>"
+
+    @contextmanager
+    def phase(self, name):
+        """Time the body of a with block as the named phase. Time spent in a
+        phase that runs more than once is added up. Phases are exclusive: a
+        phase started inside another (a streamed run loading and planning
+        while it simulates) pauses the outer one, so the phase times add up
+        to the run's wall time.
+        """
+
+        now = time.perf_counter()
+        self._add_running(now)
+        self._running.append([name, now])
+        try:
+            yield self
+        finally:
+            now = time.perf_counter()
+            self._add_running(now)
+            self._running.pop()
+            if self._running:
+                self._running[-1][1] = now  # the outer phase picks up again
+
+    def _add_running(self, now):
+        """Add the time since the innermost running phase last (re)started to it."""
+
+        if self._running:
+            name, start = self._running[-1]
+            self.phases[name] = self.phases.get(name, 0.0) + now - start
+
+    def as_dict(self):
+        """Return the stats as JSON-serializable values."""
+
+        return {
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def print_report(self, file=None):
+        """Print the phase times and counters."""
+
+        print("\nProfile:", file=file)
+        total = sum(self.phases.values())
+        for name, seconds in self.phases.items():
+            share = seconds / total * 100 if total else 0
+            print(f"    {name:<28} {seconds * 1000:>10.2f} ms {share:>6.1f}%", file=file)
+
+        for name, count in sorted(self.counters.items()):
+            print(f"    {name:<28} {count:>10}", file=file)
+
+
+def phase(stats, name):
+    """Time a with block as the named phase of the given RunStats; a no-op
+    when stats is None.
+    """
+
+    return nullcontext() if stats is None else stats.phase(name)
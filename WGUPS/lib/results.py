@@ -0,0 +1,91 @@
+"""Structured results of a simulation run. Simulation.run() returns a
+SimulationResult so the engine can be driven from scripts, tests or a
+scheduler; result_to_dict() converts one to plain JSON-ready data.
+"""
+
+
+import collections
+
+from lib.clock import format_minutes
+
+
+# final state of a single package -- deadline in minutes since midnight
+#   (None = EOD), status a lib/package.Status code
+PackageResult = collections.namedtuple(
+    "PackageResult", "package_id address deadline status truck_id trip_number delivery_time",
+)
+
+# everything a run produced -- per-package results, per-truck miles and the
+#   processed events (lib/truck.Event tuples) in the order they happened;
+#   stats is the run's lib/profiling.RunStats when profiling is on
+SimulationResult = collections.namedtuple(
+    "SimulationResult",
+    "start_time end_time total_distance truck_miles packages events trip_reports stats",
+    defaults=(None,),
+)
+
+
+def _format_time(time):
+
+    return None if time is None else time.isoformat(timespec="seconds")
+
+
+def package_to_dict(package):
+    """Convert a PackageResult to a dictionary of JSON-serializable values."""
+
+    return {
+        "package_id": package.package_id,
+        "address": package.address,
+        "deadline": format_minutes(package.deadline),
+        "status": package.status.label,
+        "truck_id": package.truck_id,
+        "trip_number": package.trip_number,
+        "delivery_time": _format_time(package.delivery_time),
+    }
+
+
+def format_package(package):
+    """Format a PackageResult as a line of the package table."""
+
+    label = package.status.label
+    if package.delivery_time is not None:
+        label = f"{label} {package.delivery_time.strftime('%I:%M %p')}"
+    return (f"Package {package.package_id:0>2} {format_minutes(package.deadline):>15} {label:>20} "
+            f"{package.truck_id or 'N/A':>8} {package.trip_number or 'N/A':>8} {package.address:>40}")
+
+
+def snapshot_to_dict(snapshot):
+    """Convert a StatusHistory snapshot (package id -> status, or None) to a
+    list of JSON-serializable package statuses.
+    """
+
+    return [
+        status._asdict() | {"status": status.status.label, "time": _format_time(status.time)}
+        for status in snapshot.values() if status is not None
+    ]
+
+
+def result_to_dict(result):
+    """Convert a SimulationResult to a dictionary of JSON-serializable values."""
+
+    return {
+        "start_time": _format_time(result.start_time),
+        "end_time": _format_time(result.end_time),
+        "total_distance": round(result.total_distance, 2),
+        "truck_miles": {
+            str(truck_id): round(miles, 2) for truck_id, miles in result.truck_miles.items()
+        },
+        "packages": [package_to_dict(package) for package in result.packages.values()],
+        "events": [
+            {
+                "time": _format_time(event.time),
+                "truck_id": event.truck_id,
+                "distance": event.dist_travelled,
+                "action": event.action,
+                "package_ids": list(event.package_ids),
+            }
+            for event in result.events
+        ],
+        "trips": [report._asdict() for report in result.trip_reports],
+        "stats": None if result.stats is None else result.stats.as_dict(),
+    }
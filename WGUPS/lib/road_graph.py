@@ -0,0 +1,311 @@
+"""Road graph distance backend. Instead of a full table of distances between
+every pair of addresses, a RoadGraph is loaded from a sparse edge list -- the
+road segments between addresses and junctions -- and distances are computed
+on demand with Dijkstra's algorithm. Storage is O(edges) instead of O(n^2),
+so networks with tens of thousands of addresses can be used.
+
+A RoadGraph plugs into the DistanceMatrix interface: index(), distance(),
+between() and matrix[i][j] work as before, so the trucks, the load planner
+and the route planners use it unchanged. matrix[i] is a single-source
+Dijkstra search from address i, run only as far as the lookups made on it
+need; the searches are kept in a least recently used cache bounded by a
+memory limit, so later lookups from the same address pick up where the
+last one stopped.
+
+Edge list CSV layout (roads are two-way):
+
+    from,to,distance
+    Western Governors University|4001 South 700 East,Junction 17,1.4
+    ...
+
+Every node is an address unless a list of addresses is given, in which case
+the other nodes are junctions -- driven through, but never a stop.
+"""
+
+
+import collections
+import csv
+import heapq
+from array import array
+
+from lib.distance_matrix import DistanceMatrix
+
+
+# default memory limit of the cached Dijkstra rows, in bytes
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+_INFINITY = float("inf")
+
+
+class _ShortestPaths:
+    """A single-source Dijkstra search from one address, run only as far as
+    the lookups need: row[j] continues the search until address j is settled
+    (its distance is final) and returns its distance, infinity if there is
+    no way there. Lookups of nearby addresses never touch the far side of
+    the network.
+    """
+
+    def __init__(self, graph, source):
+
+        self._graph = graph
+        self.size = graph.size
+        self.distances = array("d", [_INFINITY]) * graph.num_nodes
+        self.distances[source] = 0.0
+        self.settled = bytearray(graph.num_nodes)
+        self._heap = [(0.0, source)]
+
+    def __len__(self):
+
+        return self.size
+
+    def __getitem__(self, index):
+
+        if self.settled[index]:
+            return self.distances[index]
+        if index >= self.size:
+            raise IndexError(index)
+        return self._search(index)
+
+    @property
+    def complete(self):
+        """True once every node reachable from the source is settled."""
+
+        return not self._heap
+
+    def _search(self, target=None):
+        """Continue the search until the target node is settled, or to the
+        end. Return the target's distance.
+        """
+
+        graph = self._graph
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        distances, settled, heap = self.distances, self.settled, self._heap
+
+        while heap:
+            distance, u = heapq.heappop(heap)
+            if settled[u]:
+                continue
+            settled[u] = 1
+            for edge in range(offsets[u], offsets[u + 1]):
+                v = targets[edge]
+                new_distance = distance + weights[edge]
+                if new_distance < distances[v]:
+                    distances[v] = new_distance
+                    heapq.heappush(heap, (new_distance, v))
+            if u == target:
+                return distance
+
+        # every reachable node is settled -- anything left is cut off
+        return _INFINITY if target is None else distances[target]
+
+    def finish(self):
+        """Run the search to the end and return the distances to every
+        address, as a flat array.
+        """
+
+        self._search()
+        return self.distances[:self.size]
+
+
+class _GraphRows:
+    """matrix[i] for a RoadGraph -- the distances from address i to every
+    address, searched on demand and kept in an LRU cache of single-source
+    searches. A search that has run to the end is swapped for its flat array
+    of distances, which is quicker to read.
+    """
+
+    def __init__(self, graph, max_rows):
+
+        self._graph = graph
+        self._rows = collections.OrderedDict()
+        self.max_rows = max_rows
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+
+        return self._graph.size
+
+    def __getitem__(self, index):
+
+        row = self._rows.get(index)
+        if row is not None:
+            self._rows.move_to_end(index)
+            self.hits += 1
+            if type(row) is _ShortestPaths and row.complete:
+                row = self._rows[index] = row.distances[:self._graph.size]
+            return row
+
+        if not 0 <= index < self._graph.size:
+            raise IndexError(index)
+
+        self.misses += 1
+        row = self._rows[index] = _ShortestPaths(self._graph, index)
+        if len(self._rows) > self.max_rows:
+            self._rows.popitem(last=False)
+        return row
+
+    def cached(self, index):
+        """Return the row for index if it is cached, otherwise None."""
+
+        return self._rows.get(index)
+
+
+class _NeighborLists:
+    """nearest_neighbors(k) for a RoadGraph -- each address's list is found
+    with a Dijkstra search cut off after the k closest addresses, the first
+    time it is needed.
+    """
+
+    def __init__(self, graph, k):
+
+        self._graph = graph
+        self._k = k
+        self._lists = {}
+
+    def __len__(self):
+
+        return self._graph.size
+
+    def __getitem__(self, index):
+
+        neighbors = self._lists.get(index)
+        if neighbors is None:
+            neighbors = self._lists[index] = self._graph.closest(index, self._k)
+        return neighbors
+
+
+class RoadGraph(DistanceMatrix):
+
+    # initialize instance attributes
+    def __init__(self, nodes, edges, addresses=None, cache_bytes=DEFAULT_CACHE_BYTES):
+
+        # addresses come first, so their node numbers are also their matrix
+        #   indices; junctions follow
+        nodes = list(nodes)
+        if addresses is None:
+            addresses = nodes
+        else:
+            address_set = set(addresses)
+            nodes = list(addresses) + [node for node in nodes if node not in address_set]
+        self._set_addresses(addresses)
+        self.num_nodes = len(nodes)
+
+        # adjacency in compressed sparse row form -- node u's roads are
+        #   targets/weights[offsets[u]:offsets[u + 1]]
+        number = {node: position for position, node in enumerate(nodes)}
+        adjacent = [[] for _ in range(self.num_nodes)]
+        for from_node, to_node, distance in edges:
+            u, v = number[from_node], number[to_node]
+            adjacent[u].append((v, distance))
+            adjacent[v].append((u, distance))
+
+        self.offsets = array("l", [0])
+        self.targets = array("l")
+        self.weights = array("d")
+        for roads in adjacent:
+            for v, distance in roads:
+                self.targets.append(v)
+                self.weights.append(distance)
+            self.offsets.append(len(self.targets))
+
+        # a cached search holds a float and a flag per node
+        max_rows = max(2, cache_bytes // (9 * max(self.num_nodes, 1)))
+        self.matrix = _GraphRows(self, max_rows)
+        self._array = None
+
+    def __repr__(self):
+
+        return f"<RoadGraph addresses={self.size} nodes={self.num_nodes} roads={len(self.targets) // 2}>"
+
+    @classmethod
+    def from_csv(cls, filepath, addresses=None, cache_bytes=DEFAULT_CACHE_BYTES):
+        """Read a road graph from an edge list CSV (from, to, distance)."""
+
+        nodes = {}
+        edges = []
+        with open(filepath, encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader)  # header row
+            for from_node, to_node, distance in reader:
+                nodes.setdefault(from_node, None)
+                nodes.setdefault(to_node, None)
+                edges.append((from_node, to_node, float(distance)))
+
+        return cls(nodes, edges, addresses=addresses, cache_bytes=cache_bytes)
+
+    def distance(self, i, j):
+        """Return the distance between the addresses at indices i and j."""
+
+        # roads are two-way -- a search from either end will do
+        if self.matrix.cached(i) is None:
+            row = self.matrix.cached(j)
+            if row is not None:
+                return row[i]
+        return self.matrix[i][j]
+
+    def between(self, from_address, to_address):
+        """Return the distance between two addresses given by name."""
+
+        return self.distance(self.index(from_address), self.index(to_address))
+
+    def shortest_paths(self, source):
+        """Return the shortest distance from the address at index source to
+        every address (infinity if there is no way there), with Dijkstra's
+        algorithm.
+        """
+
+        return _ShortestPaths(self, source).finish()
+
+    def closest(self, source, k):
+        """Return the indices of the k addresses closest to the address at
+        index source, nearest first (ties by index), with a Dijkstra search
+        that stops once they are found.
+        """
+
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        best = {source: 0.0}
+        settled = set()
+        heap = [(0.0, source)]
+        found = []
+
+        while heap:
+            distance, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+
+            # keep going past the k-th address only for ties with it
+            if len(found) >= k and distance > found[-1][0]:
+                break
+            settled.add(u)
+            if u != source and u < self.size:
+                found.append((distance, u))
+
+            for edge in range(offsets[u], offsets[u + 1]):
+                v = targets[edge]
+                new_distance = distance + weights[edge]
+                if new_distance < best.get(v, _INFINITY):
+                    best[v] = new_distance
+                    heapq.heappush(heap, (new_distance, v))
+
+        found.sort()
+        return [u for _, u in found[:k]]
+
+    def nearest_neighbors(self, k):
+        """Return, for every address index, the indices of the k closest
+        other addresses, nearest first. Each list is found when it is first
+        used.
+        """
+
+        if k not in self._neighbors:
+            self._neighbors[k] = _NeighborLists(self, k)
+        return self._neighbors[k]
+
+    def as_array(self):
+        """A road graph has no full distance table -- building one is what it
+        avoids.
+        """
+
+        raise TypeError("A RoadGraph has no distance array; use a planner that reads matrix rows, "
+                        "i.e. nearest_neighbor or candidate_nearest_neighbor")
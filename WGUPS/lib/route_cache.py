@@ -0,0 +1,193 @@
+"""Route plan cache. Scenario sweeps and re-runs of a day plot routes for the
+same stops from the same place over and over; a RouteCache remembers each
+planned route, keyed by the start, the stops in the order they were given,
+the end and the planner settings, so a repeat costs a dictionary lookup
+instead of a planner run.
+
+Entries are evicted least recently used first once their estimated size goes
+over the memory limit. A cache can be saved to a JSON file and loaded again
+by a later run; the file records a fingerprint of the distance matrix and is
+ignored if the matrix has changed.
+
+The planners break ties by the order of the stops, so the same stops given
+in another order are a different entry; a route is always the same whether
+it was planned or found in the cache.
+"""
+
+
+import collections
+import hashlib
+import json
+import os
+import sys
+
+from lib.road_graph import RoadGraph
+
+try:
+    import numpy as np
+except ImportError:  # the matrix fingerprint falls back to the row lists
+    np = None
+
+
+# default memory limit, in bytes
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# file format version, bumped whenever the saved layout changes
+_FORMAT = 2
+
+
+def matrix_fingerprint(distance_matrix):
+    """Return a hex digest identifying a distance matrix's addresses and distances."""
+
+    digest = hashlib.sha256(json.dumps(distance_matrix.addresses).encode("utf-8"))
+
+    # a road graph has no full table -- its roads identify it instead
+    if isinstance(distance_matrix, RoadGraph):
+        for array in (distance_matrix.offsets, distance_matrix.targets, distance_matrix.weights):
+            digest.update(array.tobytes())
+    elif np is not None:
+        digest.update(np.ascontiguousarray(distance_matrix.as_array(), dtype=np.float64).tobytes())
+    else:
+        for row in distance_matrix.matrix:
+            digest.update(repr(row).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _freeze(value):
+    """Turn lists (i.e. read back from JSON) into tuples, so they can be hashed."""
+
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class RouteCache:
+
+    # initialize instance attributes
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, fingerprint=None):
+
+        self.max_bytes = max_bytes
+
+        # identifies the distance matrix the routes were planned on; saved
+        #   with the cache and checked by load()
+        self.fingerprint = fingerprint
+
+        # key -> (route as address indices, distance, distance before
+        #   improvement), least recently used first
+        self._entries = collections.OrderedDict()
+        self._sizes = {}
+        self.size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+
+        return f"<RouteCache entries={len(self._entries)} bytes={self.size_bytes} hits={self.hits} misses={self.misses}>"
+
+    def __len__(self):
+
+        return len(self._entries)
+
+    @staticmethod
+    def key(start_index, stop_indices, end_index, settings):
+        """Return the cache key for a route. settings is a hashable tuple of
+        everything besides the stops that the planned route depends on.
+        """
+
+        return (start_index, tuple(stop_indices), end_index, settings)
+
+    def get(self, key):
+        """Return the cached (order, distance, planned distance) for the key,
+        or None. order holds positions into the key's stops, like the
+        planners return.
+        """
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Cache an (order, distance, planned distance) entry, evicting the
+        least recently used entries to stay under the memory limit.
+        """
+
+        if key in self._entries:
+            self.size_bytes -= self._sizes[key]
+
+        size = self._estimate_size(key, entry)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self.size_bytes += size
+
+        while self.size_bytes > self.max_bytes and self._entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self.size_bytes -= self._sizes.pop(evicted)
+            self.evictions += 1
+
+    @staticmethod
+    def _estimate_size(key, entry):
+        """Estimate the memory held by an entry, in bytes."""
+
+        start_index, stops, end_index, settings = key
+        order, distance, planned_distance = entry
+        return (
+            sys.getsizeof(key) + sys.getsizeof(stops) + sys.getsizeof(settings)
+            + sys.getsizeof(entry) + sys.getsizeof(order) + sys.getsizeof(distance) * 2
+            # the index ints themselves; small ones are shared, but count them anyway
+            + 28 * (len(stops) + len(order) + 2)
+        )
+
+    def save(self, filepath):
+        """Write the cache to a JSON file, least recently used entry first.
+        The file is written to a temporary name and moved into place.
+        """
+
+        data = {
+            "format": _FORMAT,
+            "fingerprint": self.fingerprint,
+            "entries": [
+                [start_index, stops, end_index, settings, order, distance, planned_distance]
+                for (start_index, stops, end_index, settings), (order, distance, planned_distance)
+                in self._entries.items()
+            ],
+        }
+
+        temporary_path = f"{filepath}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temporary_path, filepath)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    @classmethod
+    def load(cls, filepath, max_bytes=DEFAULT_MAX_BYTES, fingerprint=None):
+        """Read a cache saved by save(). Return an empty cache if the file is
+        missing or unreadable, or was saved for a different distance matrix.
+        """
+
+        cache = cls(max_bytes=max_bytes, fingerprint=fingerprint)
+        try:
+            with open(filepath, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cache
+
+        if data.get("format") != _FORMAT or data.get("fingerprint") != fingerprint:
+            return cache
+
+        for start_index, stops, end_index, settings, order, distance, planned_distance in data["entries"]:
+            cache.put(
+                cls.key(start_index, stops, end_index, _freeze(settings)),
+                (tuple(order), distance, planned_distance),
+            )
+        return cache
@@ -0,0 +1,266 @@
+"""Route planners used by the trucks to order their delivery stops. Every
+planner takes the same arguments -- a DistanceMatrix, the index of the
+starting address, a list of stop address indices and the index of the address
+to return to -- and returns the order in which to visit the stops (as
+positions into the stop list) along with the total distance of the trip.
+
+Planners may also accept extra keyword options (see Truck.planner_options).
+"""
+
+
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed by the vectorized planner
+    np = None
+
+
+def nearest_neighbor_route(distance_matrix, start_index, stop_indices, end_index):
+    """Plot a route with the nearest neighbor algorithm. At each step the
+    closest unvisited stop is chosen; ties go to the stop listed first.
+    """
+
+    unvisited = list(range(len(stop_indices)))
+    order = []
+    distance_traveled = 0
+
+    # start at the given location; usually the HUB
+    location_index = start_index
+
+    # run as long as there are stops to visit
+    while unvisited:
+        next_position = None
+        min_distance = float("inf")
+
+        # check each unvisited stop for the closest one to the current location
+        row = distance_matrix.matrix[location_index]
+        for position, stop in enumerate(unvisited):
+            distance = row[stop_indices[stop]]
+            if distance < min_distance:
+                min_distance = distance
+                next_position = position
+
+        # travel to the closest stop and begin again
+        stop = unvisited.pop(next_position)
+        order.append(stop)
+        location_index = stop_indices[stop]
+        distance_traveled += min_distance
+
+    # return to the end location after all stops are visited
+    distance_traveled += distance_matrix.distance(location_index, end_index)
+
+    return order, distance_traveled
+
+
+def candidate_nearest_neighbor_route(distance_matrix, start_index, stop_indices, end_index, k=10):
+    """Plot a route with the nearest neighbor algorithm using candidate lists.
+    At each step the k addresses nearest the current location (see
+    DistanceMatrix.nearest_neighbors) are checked first; every unvisited stop
+    is scanned only when none of them is left to visit (or a tie may run past
+    the end of the list). Gives the same route as nearest_neighbor_route, with
+    stops at the same address visited back to back, in close to linear time
+    for large batches.
+    """
+
+    candidates = distance_matrix.nearest_neighbors(k)
+    matrix = distance_matrix.matrix
+
+    # unvisited stop positions by address -- in stop list order, so the
+    #   full scan breaks ties like nearest_neighbor_route
+    unvisited_at = {}
+    for position, address_index in enumerate(stop_indices):
+        unvisited_at.setdefault(address_index, []).append(position)
+
+    order = []
+    distance_traveled = 0
+    location_index = start_index
+    while unvisited_at:
+
+        # the current address (distance 0) and its candidates, nearest first --
+        #   among stops at the same distance the one listed first wins
+        row = matrix[location_index]
+        next_address = None
+        for address_index in (location_index, *candidates[location_index]):
+            if next_address is not None and row[address_index] > row[next_address]:
+                break
+            if address_index in unvisited_at and (
+                    next_address is None or unvisited_at[address_index][0] < unvisited_at[next_address][0]):
+                next_address = address_index
+        else:
+            # no candidate left to visit, or the closest distance may be shared
+            #   by addresses past the end of the list -- scan every unvisited stop
+            next_address = min(unvisited_at, key=row.__getitem__)
+
+        # every stop at the address is visited back to back
+        order.extend(unvisited_at.pop(next_address))
+        distance_traveled += matrix[location_index][next_address]
+        location_index = next_address
+
+    distance_traveled += distance_matrix.distance(location_index, end_index)
+
+    return order, distance_traveled
+
+
+def vectorized_nearest_neighbor_route(distance_matrix, start_index, stop_indices, end_index):
+    """Plot a route with the nearest neighbor algorithm using NumPy. Each
+    next stop is picked with a masked argmin over the current row of the
+    distance matrix, which gives the same route (and tie-breaking) as
+    nearest_neighbor_route while scaling to thousands of stops.
+    """
+
+    if np is None:
+        raise ImportError("The vectorized planner requires numpy")
+
+    matrix = distance_matrix.as_array()
+    stops = np.asarray(stop_indices, dtype=np.intp)
+
+    # visited stops are masked out by setting their distance to infinity
+    visited = np.zeros(len(stops), dtype=bool)
+    order = []
+    distance_traveled = 0.0
+
+    location_index = start_index
+    for _ in range(len(stops)):
+        row = matrix[location_index, stops]
+        row[visited] = np.inf
+
+        # argmin returns the first minimum, matching the greedy loop's tie-breaking
+        position = int(np.argmin(row))
+        visited[position] = True
+        order.append(position)
+
+        distance_traveled += float(row[position])
+        location_index = int(stops[position])
+
+    distance_traveled += distance_matrix.distance(location_index, end_index)
+
+    return order, distance_traveled
+
+
+class PlanningTimeout(Exception):
+    """Raised when an exact planner runs past its wall-clock limit."""
+
+
+def held_karp_route(distance_matrix, start_index, stop_indices, end_index,
+                    max_stops=13, time_limit=1.0, fallback="nearest_neighbor"):
+    """Plot an optimal route with the Held-Karp dynamic programming algorithm.
+    Stops at the same address are merged first. If more than max_stops
+    distinct addresses remain, or the solver runs past time_limit seconds,
+    the route is plotted with the fallback planner instead.
+    """
+
+    # merge stops at the same address -- they are delivered back to back
+    # positions_at holds the stop positions for each distinct address
+    addresses = []
+    positions_at = {}
+    for position, address_index in enumerate(stop_indices):
+        if address_index not in positions_at:
+            positions_at[address_index] = []
+            addresses.append(address_index)
+        positions_at[address_index].append(position)
+
+    if len(addresses) > max_stops:
+        return get_planner(fallback)(distance_matrix, start_index, stop_indices, end_index)
+
+    try:
+        address_order, distance_traveled = _held_karp(
+            distance_matrix, start_index, addresses, end_index, time_limit,
+        )
+    except PlanningTimeout:
+        return get_planner(fallback)(distance_matrix, start_index, stop_indices, end_index)
+
+    # expand each visited address back into its stop positions
+    order = []
+    for address_position in address_order:
+        order.extend(positions_at[addresses[address_position]])
+
+    return order, distance_traveled
+
+
+def _held_karp(distance_matrix, start_index, addresses, end_index, time_limit):
+    """Solve the shortest path from start through every address to end.
+    Return the visiting order (positions into addresses) and its distance.
+    """
+
+    d = distance_matrix.matrix
+    n = len(addresses)
+    if n == 0:
+        return [], d[start_index][end_index]
+
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    infinity = float("inf")
+
+    # distances between the addresses being solved, indexed by position
+    sub = [[d[a][b] for b in addresses] for a in addresses]
+
+    # the DP table is a flat array indexed by mask * n + last:
+    #   cost[mask * n + j] = shortest path from the start visiting exactly
+    #   the addresses in "mask" and ending at address j
+    # parent[...] holds the address visited just before j (-1 = the start)
+    full = (1 << n) - 1
+    cost = array("d", [infinity]) * ((full + 1) * n)
+    parent = array("b", [-1]) * ((full + 1) * n)
+
+    for j in range(n):
+        cost[(1 << j) * n + j] = d[start_index][addresses[j]]
+
+    # masks are processed in increasing order, so every subset is final
+    #   before it is extended
+    for mask in range(1, full + 1):
+        if deadline is not None and time.perf_counter() > deadline:
+            raise PlanningTimeout()
+
+        base = mask * n
+        for j in range(n):
+            path_cost = cost[base + j]
+            if path_cost == infinity:
+                continue
+            row = sub[j]
+            for k in range(n):
+                bit = 1 << k
+                if mask & bit:
+                    continue
+                slot = (mask | bit) * n + k
+                new_cost = path_cost + row[k]
+                if new_cost < cost[slot]:
+                    cost[slot] = new_cost
+                    parent[slot] = j
+
+    # close the path at the end location
+    base = full * n
+    last = min(range(n), key=lambda j: cost[base + j] + d[addresses[j]][end_index])
+    distance_traveled = cost[base + last] + d[addresses[last]][end_index]
+
+    # walk the parent pointers back to the start
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last)
+        previous = parent[mask * n + last]
+        mask &= ~(1 << last)
+        last = previous
+    order.reverse()
+
+    return order, distance_traveled
+
+
+# route planners selectable by name -- i.e. Simulation(planner="vectorized")
+PLANNERS = {
+    "nearest_neighbor": nearest_neighbor_route,
+    "candidate_nearest_neighbor": candidate_nearest_neighbor_route,
+    "vectorized": vectorized_nearest_neighbor_route,
+    "held_karp": held_karp_route,
+}
+
+
+def get_planner(name):
+    """Return the route planner function registered under the given name."""
+
+    try:
+        return PLANNERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown route planner {name!r}; choose from {', '.join(PLANNERS)}"
+        ) from None
@@ -0,0 +1,72 @@
+"""Incremental route repair. When a package's address changes, or a package is
+added or cancelled while a truck is out on its route, only the rest of that
+route is touched. A changed stop is put back with cheapest insertion (the
+place where it adds the fewest miles), and a bounded local search pass (see
+lib/local_search.py) fixes up a window of stops around it, with the stops on
+either side of the window held in place. A change costs one O(n) insertion
+scan for n remaining stops plus a fix-up whose size does not depend on n,
+instead of planning the whole trip again.
+"""
+
+
+import collections
+
+from lib.local_search import improve_route
+
+
+# a change to the day's plan, applied at its time (seconds since midnight)
+#   kind is "address" (package_id, address), "add" (package_row, see
+#   Simulation.read_package_rows) or "cancel" (package_id)
+RouteChange = collections.namedtuple("RouteChange", "time kind package_id address package_row", defaults=(None, None))
+
+# the local fix after a change -- stops on each side of the change that may
+#   be reordered, and the most improving moves made
+REPAIR_WINDOW = 6
+REPAIR_MAX_MOVES = 10
+
+
+def cheapest_insertion(distance_matrix, start_index, stops, end_index, address_index):
+    """Find where a new stop adds the fewest miles to the route start_index ->
+    stops -> end_index (all distance matrix indices). Return the position to
+    insert it at in stops, and the miles it adds.
+    """
+
+    d = distance_matrix.matrix
+    path = [start_index, *stops, end_index]
+
+    best_position, best_cost = 0, None
+    for position in range(len(path) - 1):
+        a, b = path[position], path[position + 1]
+        cost = d[a][address_index] + d[address_index][b] - d[a][b]
+        if best_cost is None or cost < best_cost:
+            best_position, best_cost = position, cost
+
+    return best_position, best_cost
+
+
+def repair_route(distance_matrix, start_index, stops, end_index, position, window=REPAIR_WINDOW,
+                 max_iterations=REPAIR_MAX_MOVES, stats=None):
+    """Fix up the route start_index -> stops -> end_index after a change at
+    the given position in stops, with 2-opt / Or-opt moves among the window
+    stops on either side of it. Return the stops (distance matrix indices) in
+    their new order.
+    """
+
+    if stats is not None:
+        stats.counters["route_repairs"] += 1
+
+    low = max(0, position - window)
+    high = min(len(stops), position + window + 1)
+    if high - low < 2:
+        return list(stops)
+
+    # the window is a route of its own between the stops just outside it
+    window_start = start_index if low == 0 else stops[low - 1]
+    window_end = end_index if high == len(stops) else stops[high]
+    window_stops = stops[low:high]
+
+    order, _ = improve_route(
+        distance_matrix, window_start, window_stops, window_end, list(range(len(window_stops))),
+        max_iterations=max_iterations, stats=stats,
+    )
+    return stops[:low] + [window_stops[index] for index in order] + stops[high:]
@@ -0,0 +1,142 @@
+"""Time-indexed package status history. Each package's status changes (at the
+hub, en route on a truck, delivered) are recorded once during a full run in a
+sorted per-package timeline, so the status of any package at any time of day
+can be answered with a binary search instead of re-running the simulation.
+"""
+
+
+import collections
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from lib.package import Status
+
+
+AT_HUB = Status.AT_HUB
+EN_ROUTE = Status.EN_ROUTE
+DELIVERED = Status.DELIVERED
+CANCELLED = Status.CANCELLED
+
+# a package's status as of a point in time -- "time" is when it took effect
+PackageStatus = collections.namedtuple("PackageStatus", "package_id status truck_id trip_number address time")
+
+
+class StatusHistory:
+
+    # initialize instance attributes
+    def __init__(self, day):
+
+        # times are stored as seconds since midnight of the simulated day
+        self.midnight = day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # package id -> sorted array of transition times, and the matching
+        #   (status, truck_id, trip_number, address) tuples
+        self._times = {}
+        self._states = {}
+
+        # optional EventLogWriter that every recorded change is also written
+        #   to; see lib/event_log.py
+        self.log = None
+
+    def __repr__(self):
+
+        return f"<StatusHistory packages={len(self._times)}>"
+
+    def _seconds(self, time):
+        """Convert a datetime, a clock time like "10:15 AM" or a number of
+        seconds since midnight to seconds since midnight.
+        """
+
+        if isinstance(time, (int, float)):
+            return time
+
+        if not isinstance(time, datetime):
+            clock_time = datetime.strptime(time.strip().upper(), "%I:%M %p")
+            time = self.midnight.replace(hour=clock_time.hour, minute=clock_time.minute)
+
+        return (time - self.midnight).total_seconds()
+
+    def record(self, package_id, time, status, truck_id=None, trip_number=None, address=None):
+        """Record that a package's status changed at the given time."""
+
+        if package_id not in self._times:
+            self._times[package_id] = array("d")
+            self._states[package_id] = []
+
+        times = self._times[package_id]
+        seconds = self._seconds(time)
+        state = (status, truck_id, trip_number, address)
+        if self.log is not None:
+            self.log.write_status(package_id, seconds, status, truck_id, trip_number, address)
+
+        # transitions almost always arrive in order -- append, otherwise insert in place
+        if not times or seconds >= times[-1]:
+            times.append(seconds)
+            self._states[package_id].append(state)
+        else:
+            position = bisect_right(times, seconds)
+            times.insert(position, seconds)
+            self._states[package_id].insert(position, state)
+
+    def forget(self, package_id):
+        """Drop a package's timeline, i.e. once its final state was handed
+        off by a streamed run.
+        """
+
+        self._times.pop(package_id, None)
+        self._states.pop(package_id, None)
+
+    def status_at(self, package_id, time):
+        """Return the package's status at the given time, or None if nothing
+        was recorded for it by then.
+        """
+
+        return self._status_at_seconds(package_id, self._seconds(time))
+
+    def _status_at_seconds(self, package_id, seconds):
+
+        times = self._times.get(package_id)
+        if not times:
+            return None
+
+        # the last transition at or before the given time is the current status
+        position = bisect_right(times, seconds) - 1
+        if position < 0:
+            return None
+
+        status, truck_id, trip_number, address = self._states[package_id][position]
+        return PackageStatus(
+            package_id, status, truck_id, trip_number, address,
+            self.midnight + timedelta(seconds=times[position]),
+        )
+
+    def snapshot(self, time):
+        """Return the status of every package at the given time, by package id."""
+
+        seconds = self._seconds(time)
+        return {
+            package_id: self._status_at_seconds(package_id, seconds)
+            for package_id in self._times
+        }
+
+    def print_snapshot(self, time):
+        """Print the status of every package at the given time."""
+
+        snapshot = self.snapshot(time)
+
+        # print header row
+        print()
+        print(f"PACKAGE ID                  STATUS    TRUCK     TRIP                                 ADDRESS")
+        print("=============================================================================================== ")
+        print()
+
+        for package_id in sorted(snapshot):
+            status = snapshot[package_id]
+            if status is None:
+                continue
+            label = status.status.label
+            if status.status == DELIVERED:
+                label = f"{label} {status.time.strftime('%I:%M %p')}"
+            print(f"Package {package_id:0>2} {label:>26} {status.truck_id or 'N/A':>8} "
+                  f"{status.trip_number or 'N/A':>8} {status.address:>40}")
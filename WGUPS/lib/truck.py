@@ -5,15 +5,36 @@ neighbor algorithm.
 
 
 import collections
-from datetime import datetime, timedelta
 
+from lib.route_planners import get_planner
+from lib.local_search import improve_route
+from lib.route_repair import cheapest_insertion, repair_route
+from lib.package import Status
 
-Event = collections.namedtuple("Event", "time truck_id dist_travelled action")
+
+# a simulation event -- time is in whole seconds since midnight; package_ids
+#   lists the packages dropped off at a stop
+Event = collections.namedtuple("Event", "time truck_id dist_travelled action package_ids", defaults=((),))
+
+# summary of a plotted trip -- the planner's distance and the distance after
+#   the optional local search improvement pass
+TripReport = collections.namedtuple("TripReport", "trip_number truck_id planned_miles improved_miles")
+
+# everything about a truck that changes during a day, including where its
+#   deliver_packages() coroutine is -- delivery_phase is None (no delivery),
+#   "leaving" (waiting at the hub to leave), "driving" (on the way to
+#   route[next_stop - 1]) or "returning" (on the way back to the hub)
+# see Truck.save_state() and Truck.restore_state()
+TruckState = collections.namedtuple(
+    "TruckState", "location packages route next_stop delivery_phase speed capacity",
+)
 
 
 class Truck:
 
-    def __init__(self, id, address_list, distance_matrix):
+    def __init__(self, id, distance_matrix, planner="nearest_neighbor", planner_options=None,
+                 improve_routes=False, improvement_max_iterations=None, improvement_time_limit=None,
+                 improvement_candidates=None):
 
         self.id = id
 
@@ -27,28 +48,90 @@ class Truck:
         self.packages = []
         self.route = []
 
-        self.address_list = address_list
+        # index of the next stop in route to drive to -- stops before it have
+        #   been driven to (or are being driven to) by deliver_packages()
+        self.next_stop = 0
+
+        # where the deliver_packages() coroutine is; see TruckState
+        self.delivery_phase = None
+
+        # optional StatusHistory that deliveries are recorded in; see lib/status_history.py
+        self.status_history = None
+
+        # optional RunStats that distance lookups and route planning work are
+        #   counted in; see lib/profiling.py
+        self.stats = None
+
+        # optional RouteCache shared by the trucks (and simulations) that plan
+        #   on the same distance matrix; see lib/route_cache.py
+        self.route_cache = None
+
+        # shared DistanceMatrix instance -- built once by the Simulation
         self.distance_matrix = distance_matrix
 
+        # name of the route planner used by plot_delivery_route()
+        # see lib/route_planners.py for the available planners
+        self.planner = planner
+
+        # extra keyword options for the planner, i.e. {"max_stops": 13} for "held_karp"
+        self.planner_options = planner_options or {}
+
+        # optional 2-opt / Or-opt pass run on every plotted route, bounded by
+        #   a number of improving moves and/or a time limit in seconds
+        # see lib/local_search.py
+        self.improve_routes = improve_routes
+        self.improvement_max_iterations = improvement_max_iterations
+        self.improvement_time_limit = improvement_time_limit
+
+        # with a number k, local search only tries moves towards each address's
+        #   k nearest neighbors; see DistanceMatrix.nearest_neighbors
+        self.improvement_candidates = improvement_candidates
+        self.planned_distance = 0
+
     def __repr__(self):
 
         return f"<Truck {self.id}, load={len(self.packages)}, cap={self.capacity}>"
 
+    @property
+    def waiting_to_leave(self):
+        """True while the truck is loaded and waiting at the hub to leave."""
+
+        return self.delivery_phase == "leaving"
+
+    def save_state(self):
+        """Return a TruckState copy of the truck's changing state."""
+
+        return TruckState(
+            self.location,
+            list(self.packages),
+            [(address, distance, list(pkg_ids)) for address, distance, pkg_ids in self.route],
+            self.next_stop,
+            self.delivery_phase,
+            self.speed,
+            self.capacity,
+        )
+
+    def restore_state(self, state):
+        """Put the truck back in a state saved by save_state(). A delivery in
+        progress is picked up again with deliver_packages(..., resume=True).
+        """
+
+        self.location = state.location
+        self.packages = list(state.packages)
+        self.route = [(address, distance, list(pkg_ids)) for address, distance, pkg_ids in state.route]
+        self.next_stop = state.next_stop
+        self.delivery_phase = state.delivery_phase
+        self.speed = state.speed
+        self.capacity = state.capacity
+
     def load_package(self, package_id, package_table, trip_num):
         """Load a package onto the truck for delivery."""
 
         if len(self.packages) <= self.capacity and package_id is not None:
             self.packages.append(package_id)
             
-            # update package status
-            package = package_table.lookup(package_id)
-            package.status = f"EN ROUTE"
-            package.truck = self.id
-            package.trip_number = trip_num
-
-            # package #9 (incorrect address) -- update to correct address when loaded
-            if package_id == "9":
-                package.address = "410 S State St"
+            # update package status -- through the package table, so its indexes stay current
+            package_table.set_fields(package_id, status=Status.EN_ROUTE, truck=self.id, trip_number=trip_num)
         else:
             # truck is full; cannot load another package
             return False
@@ -56,77 +139,293 @@ class Truck:
     def lookup_distance(self, from_address, to_address):
         """Lookup the distance between the two addresses."""
 
-        # fetch the full addresses from our address list
-        from_address_full = [addr for addr in self.address_list
-                             if from_address in addr][0]
-        to_address_full = [addr for addr in self.address_list
-                           if to_address in addr][0]
+        if self.stats is not None:
+            self.stats.counters["lookup_distance"] += 1
 
-        # get the index of each address
-        from_address_index = self.address_list.index(from_address_full)
-        to_address_index = self.address_list.index(to_address_full)
+        # the distance matrix resolves both addresses to indices and returns
+        #   the pre-parsed distance between them
+        return self.distance_matrix.between(from_address, to_address)
 
-        # lookup the distance between the two addresses in our distance matrix
-        distance = self.distance_matrix[from_address_index][to_address_index]
-        if distance == "":
-            distance = self.distance_matrix[to_address_index][from_address_index]
+    def plan_route(self, start_index, stop_indices, end_index):
+        """Order the given stops (distance matrix indices) with this truck's
+        route planner and optional improvement pass. Return the order, the
+        final distance and the distance before improvement.
+        """
+
+        # with a route cache, stops planned before (in the same order -- the
+        #   planners break ties by it) are looked up instead of planned again
+        cache = self.route_cache
+        if cache is None:
+            return self._plan_route(start_index, stop_indices, end_index)
+
+        key = cache.key(start_index, stop_indices, end_index, self.planner_settings())
+        entry = cache.get(key)
+        if entry is None:
+            order, distance_traveled, planned_distance = self._plan_route(start_index, stop_indices, end_index)
+            cache.put(key, (tuple(order), distance_traveled, planned_distance))
+            return order, distance_traveled, planned_distance
+
+        if self.stats is not None:
+            self.stats.counters["route_cache_hits"] += 1
+        order, distance_traveled, planned_distance = entry
+        return list(order), distance_traveled, planned_distance
+
+    def planner_settings(self):
+        """Return the settings the planned route depends on, as a hashable tuple."""
+
+        return (
+            self.planner,
+            tuple(sorted(self.planner_options.items())),
+            self.improve_routes,
+            self.improvement_max_iterations,
+            self.improvement_time_limit,
+            self.improvement_candidates,
+        )
 
-        return float(distance)
+    def _plan_route(self, start_index, stop_indices, end_index):
+
+        # plot the route with the selected route planner (nearest neighbor by default)
+        plan = get_planner(self.planner)
+        order, distance_traveled = plan(
+            self.distance_matrix, start_index, stop_indices, end_index, **self.planner_options,
+        )
+        planned_distance = distance_traveled
+
+        # each stop placed is one iteration of the route planner
+        if self.stats is not None:
+            self.stats.counters["route_plans"] += 1
+            self.stats.counters["route_planning_iterations"] += len(stop_indices)
+
+        # improve the planned route with local search, if enabled
+        if self.improve_routes and len(order) > 1:
+            order, distance_traveled = improve_route(
+                self.distance_matrix, start_index, stop_indices, end_index, order,
+                max_iterations=self.improvement_max_iterations,
+                time_limit=self.improvement_time_limit,
+                stats=self.stats,
+                candidates=self.improvement_candidates,
+            )
+
+        return order, distance_traveled, planned_distance
 
     def plot_delivery_route(self, package_table):
-        """Plot a delivery route to deliver all loaded packages."""
+        """Plot a delivery route to deliver all loaded packages. Packages
+        going to the same address share one stop.
+        """
 
         # load addresses which we'll deliver to
-        unvisited_addr = []
+        # each address is resolved to its distance matrix index once, up front,
+        #   and the packages are grouped by it -- in loading order
+        distances = self.distance_matrix
+        packages_at = {}
+        addresses = {}
         for pkg_id in self.packages:
             package = package_table.lookup(pkg_id)
-            unvisited_addr.append((pkg_id, package.address))
-
-        # we'll use this to calculate a running total of miles traveled
-        distance_traveled = 0
+            address_index = distances.index(package.address)
+            if address_index not in packages_at:
+                packages_at[address_index] = []
+                addresses[address_index] = package.address
+            packages_at[address_index].append(pkg_id)
+        stop_indices = list(packages_at)
+        self.next_stop = 0
 
         # start at the current location; usually the HUB
-        location = self.location
-
-        # run as long as there are addresses to visit
-        while len(unvisited_addr) > 0:
-            next_address = None
-            min_distance = float("inf")
-            next_pkg_id = None
-
-            # check each unvisited address for the closest one to the current location
-            for pkg_id, address in unvisited_addr:
-                distance = self.lookup_distance(location, address)
-                if distance < min_distance:
-                    min_distance = distance
-                    next_address = address
-                    next_pkg_id = pkg_id
-            
-            # add the closest address to the route
-            self.route.append((next_address, min_distance, next_pkg_id))
-            unvisited_addr.pop(
-                unvisited_addr.index((next_pkg_id, next_address))
-            )
-
-            # travel to the closest address and begin again
-            location = next_address
-            distance_traveled += min_distance
+        location_index = distances.index(self.location)
+        hub_index = distances.index(self.hub_address)
 
-        # return to hub after packages are delivered
-        dist_to_hub = self.lookup_distance(
-            location,
-            self.hub_address,
+        # order the stops with the selected route planner
+        order, distance_traveled, self.planned_distance = self.plan_route(
+            location_index, stop_indices, hub_index,
         )
-        distance_traveled += dist_to_hub
+
+        # add each stop to the route, along with the distance driven to reach it
+        #   and the packages to drop off there
+        for position in order:
+            address_index = stop_indices[position]
+            self.route.append((
+                addresses[address_index],
+                distances.distance(location_index, address_index),
+                packages_at[address_index],
+            ))
+            location_index = address_index
 
         # return the calculated distance traveled
         # the truck hasn't actually dropped off any packages, this is just a prediction for testing purposes
         return distance_traveled
 
-    def deliver_packages(self, package_table, start_time=datetime.now().replace(hour=8, minute=0)):
+    def reroute_package(self, pkg_id, package_table):
+        """Move a loaded package to its (changed) address on the rest of the
+        route. Return False if the package is not on the rest of the route.
+        """
+
+        if pkg_id not in self.packages:
+            return False
+
+        # still at the hub -- plot the whole route again
+        if self.waiting_to_leave:
+            self._replot(package_table)
+            return True
+
+        removed_at = self._take_off_route(pkg_id)
+        if removed_at is None:
+            return False
+
+        address = package_table.lookup(pkg_id).address
+        stops = self._remaining_stops()
+        address_index = self.distance_matrix.index(address)
+        changed = [removed_at] if removed_at >= 0 else []
+
+        # join the stop for the new address if there is one, otherwise put a
+        #   new stop where it adds the fewest miles
+        for stop in stops:
+            if stop[0] == address_index:
+                stop[2].append(pkg_id)
+                break
+        else:
+            position, _ = cheapest_insertion(
+                self.distance_matrix, self.distance_matrix.index(self.location),
+                [stop[0] for stop in stops], self.distance_matrix.index(self.hub_address), address_index,
+            )
+            stops.insert(position, (address_index, address, [pkg_id]))
+            changed = [removed_at + (position <= removed_at), position] if removed_at >= 0 else [position]
+
+        self._repair(stops, changed)
+        return True
+
+    def add_package(self, pkg_id, package_table, trip_num):
+        """Load another package before the truck leaves the hub and plot the
+        route again. Return False if the truck has left or is full.
+        """
+
+        if not self.waiting_to_leave or len(self.packages) >= self.capacity:
+            return False
+
+        self.load_package(pkg_id, package_table, trip_num)
+        self._replot(package_table)
+        return True
+
+    def remove_package(self, pkg_id, package_table):
+        """Take a package off the truck and the rest of the route, i.e. when
+        its delivery is cancelled. Return False if the package is not on the
+        rest of the route.
+        """
+
+        if pkg_id not in self.packages:
+            return False
+
+        if self.waiting_to_leave:
+            self.packages.remove(pkg_id)
+            self._replot(package_table)
+            return True
+
+        removed_at = self._take_off_route(pkg_id)
+        if removed_at is None:
+            return False
+
+        self.packages.remove(pkg_id)
+        if removed_at >= 0:
+            self._repair(self._remaining_stops(), [removed_at])
+        return True
+
+    def _replot(self, package_table):
+        """Plot the route for the loaded packages from scratch."""
+
+        self.route = []
+        self.plot_delivery_route(package_table)
+
+    def _take_off_route(self, pkg_id):
+        """Remove a package from its stop on the rest of the route, dropping
+        the stop if no packages are left for it. Return the stop's position in
+        the rest of the route, or None if the package is not on it.
+        """
+
+        # the stop being driven to (position -1) is still reached, even if
+        #   nothing is left to drop off there
+        for index in range(self._first_open_stop(), len(self.route)):
+            pkg_ids = self.route[index][2]
+            if pkg_id in pkg_ids:
+                pkg_ids.remove(pkg_id)
+                if not pkg_ids and index >= self.next_stop:
+                    del self.route[index]
+                return index - self.next_stop
+        return None
+
+    def _first_open_stop(self):
+        """Return the index of the first stop whose packages have not been
+        dropped off yet -- the one being driven to, if any.
+        """
+
+        if self.delivery_phase == "driving" and self.next_stop > 0:
+            return self.next_stop - 1
+        return self.next_stop
+
+    def _remaining_stops(self):
+        """Return the rest of the route as (address index, address, package
+        ids) stops.
+        """
+
+        return [
+            (self.distance_matrix.index(address), address, pkg_ids)
+            for address, _, pkg_ids in self.route[self.next_stop:]
+        ]
+
+    def _repair(self, stops, changed):
+        """Fix up the rest of the route around the changed positions with a
+        few local search moves and write it back, with the distance to each
+        stop.
+        """
+
+        distances = self.distance_matrix
+        location_index = distances.index(self.location)
+        hub_index = distances.index(self.hub_address)
+        stop_at = {stop[0]: stop for stop in stops}
+
+        order = [stop[0] for stop in stops]
+        for position in changed:
+            order = repair_route(distances, location_index, order, hub_index, position, stats=self.stats)
+
+        route = []
+        for address_index in order:
+            _, address, pkg_ids = stop_at[address_index]
+            route.append((address, distances.distance(location_index, address_index), pkg_ids))
+            location_index = address_index
+        self.route[self.next_stop:] = route
+
+    def drop_off_event(self, time):
+        """Return the Event for reaching the stop being driven to at the given
+        time, listing the packages to drop off there.
+        """
+
+        address, distance, pkg_ids = self.route[self.next_stop - 1]
+        if not pkg_ids:
+            action = f"Arrived at {address}, nothing left to drop off"
+        elif len(pkg_ids) == 1:
+            action = f"Dropped off package {pkg_ids[0]} at {address}"
+        else:
+            action = f"Dropped off packages {', '.join(map(str, pkg_ids))} at {address}"
+        return Event(time, self.id, distance, action, tuple(pkg_ids))
+
+    def _drop_off(self, package_table, time):
+        """Drop off every package for the stop just reached -- update each
+        package's status and remove it from the truck's list of loaded packages.
+        """
+
+        for pkg_id in self.route[self.next_stop - 1][2]:
+            pkg = package_table.set_fields(pkg_id, status=Status.DELIVERED, delivery_time=time)
+            if self.status_history is not None:
+                self.status_history.record(pkg_id, time, Status.DELIVERED, self.id, pkg.trip_number, pkg.address)
+
+            self.packages.remove(pkg_id)
+
+    def deliver_packages(self, package_table, start_time=8 * 3600, resume=False):
         """Deliver packages by visiting each address in the plotted route.
         Yield to the simulator issuing events to allow other trucks to deliver
         packages as well.
+
+        With resume=True the coroutine picks up a delivery where the truck's
+        delivery_phase and next_stop left it, i.e. after restore_state(). The
+        event the truck was waiting on is already queued, so priming it with
+        next() yields None instead of a new event.
         """
 
         # this function is a coroutine; it pauses and resumes to allow other processes
@@ -134,49 +433,72 @@ class Truck:
 
         # each time execution pauses, we send out a new Event (i.e. delivering a package at a certain time).
         # we get back the current simulation time when execution resumes.
+        # times are whole seconds since midnight.
 
-        # first event: starting our route by leaving the HUB once packages are loaded
-        time = yield Event(start_time, self.id, 0, "Leaving the HUB")
+        # all of the coroutine's state lives on the truck (delivery_phase,
+        #   next_stop, location, route), so it can be saved and rebuilt
+        if resume:
+            time = yield None
+        else:
+            # first event: starting our route by leaving the HUB once packages are loaded
+            self.delivery_phase = "leaving"
+            time = yield Event(start_time, self.id, 0, "Leaving the HUB")
+
+        if self.delivery_phase == "leaving":
+            self.delivery_phase = "driving"
+
+        if self.delivery_phase == "driving":
+            time = yield from self._drive_route(package_table, time)
+
+        # back at the HUB -- this delivery is done
+        self.delivery_phase = None
+
+    def _drive_route(self, package_table, time):
+        """Drive the rest of the route and back to the hub; part of
+        deliver_packages(). Return the time sent in after the last event.
+        """
+
+        # resumed on the way to a stop (see restore_state) -- the event for
+        #   reaching it is already queued, and time is when it was reached
+        if self._first_open_stop() < self.next_stop:
+            self._drop_off(package_table, time)
 
         # follow the route plotted by the plot_delivery_route() method
-        for address, distance, pkg_id in self.route:
+        # the rest of the route may be changed between stops (see reroute_package
+        #   and remove_package), so it is read one stop at a time
+        while self.next_stop < len(self.route):
+            _, distance, _ = self.route[self.next_stop]
+            self.next_stop += 1
 
             # calculate the time it takes to drive to the next address
-            time_to_address =  timedelta(minutes=(distance / self.speed * 60))
-            
-            # advance simulation time to when we reach the new address
-            new_sim_time = time + time_to_address
-            self.location = address
-
-            # if we're dropping off a package at this new address...
-            if pkg_id is not None:
-
-                # handle package delivery by updating the package status and removing it
-                #   from the truck's list of loaded packages
-                pkg = package_table.lookup(pkg_id)
-                pkg.status = f"DELIVERED {datetime.strftime(new_sim_time, '%H:%M %p')}"
-                
-                self.packages.pop(
-                    self.packages.index(pkg_id)
-                )
-            
-            # yield a new Event representing the truck dropping off a package
-            time = yield Event(new_sim_time, self.id, distance, f"Dropped off package {pkg_id} at {address}")
+            time_to_address = round(distance / self.speed * 3600)
+
+            # yield a single Event for reaching the stop; the packages are
+            #   dropped off once it has happened, so a change made while the
+            #   truck is on the way still applies to them
+            self.location = self.route[self.next_stop - 1][0]
+            time = yield self.drop_off_event(time + time_to_address)
+            self._drop_off(package_table, time)
 
         # return to the HUB
         dist_to_hub = self.lookup_distance(self.location, self.hub_address)
-        time_to_hub = timedelta(minutes=(dist_to_hub / self.speed * 60))
+        time_to_hub = round(dist_to_hub / self.speed * 3600)
         self.location = self.hub_address
         
         # yield a new Event representing returning to the HUB
+        self.delivery_phase = "returning"
         time = yield Event(time + time_to_hub, self.id, dist_to_hub, "Returned to the HUB")
+        return time
 
 
 # !---------------------------------------------------------------------------
 if __name__ == "__main__":
 
-    truck = Truck(id=1)
-    another_truck = Truck(id=2)
+    from lib.distance_matrix import DistanceMatrix
+
+    distances = DistanceMatrix.from_csv("./data/distances.csv")
+    truck = Truck(id=1, distance_matrix=distances)
+    another_truck = Truck(id=2, distance_matrix=distances)
 
     print(truck)
     print(another_truck)
@@ -0,0 +1,262 @@
+"""Synthetic workload generator. Writes distance table and package CSVs in the
+same format as data/distances.csv and data/packages.csv, for any number of
+addresses and packages, so the routing pipeline can be run and timed at
+sizes well beyond the 27 address / 40 package dataset.
+
+Addresses are random points around the hub; the distance between two
+addresses is their straight-line distance stretched by a road factor and
+rounded to a tenth of a mile, like the real table. Alternatively the addresses
+can be joined by a sparse road network -- each to its few closest neighbors
+-- and written as an edge list for lib/road_graph.py. Packages get a mix of
+deadlines and the special notes the load planner understands (truck
+restrictions, delayed arrivals and "must be delivered with" groups).
+"""
+
+
+import csv
+import math
+import os
+import random
+
+
+# the hub -- the same name as in data/distances.csv, so the trucks find it
+HUB_ADDRESS = "Western Governors University|4001 South 700 East, Salt Lake City, UT 84107"
+
+PACKAGE_HEADER = [
+    "Package ID", "Address", "City", "State", "Zip", "Delivery Deadline",
+    "Weight KILO", "Special Notes", "Trip",
+]
+
+_STREETS = ("Main St", "State St", "Oak Ave", "Canyon Rd", "Parkway Blvd", "Lester St", "Dalton Ave")
+_DIRECTIONS = ("N", "S", "E", "W")
+
+# share of packages with each deadline; the rest are due by the end of day
+_DEADLINES = (("9:00:00 AM", 0.03), ("10:30:00 AM", 0.25))
+
+
+def _street_names(count, rng):
+    """Return the given number of unique street addresses."""
+
+    names = []
+    used = set()
+    while len(names) < count:
+        name = f"{rng.randint(100, 9999)} {rng.choice(_DIRECTIONS)} {rng.choice(_STREETS)}"
+        if name not in used:
+            used.add(name)
+            names.append(name)
+    return names
+
+
+def generate_distances(num_addresses, rng, radius=10.0, road_factor=1.3):
+    """Return the addresses (hub first) and a full, symmetric matrix of
+    distances between them, in miles.
+    """
+
+    addresses = [HUB_ADDRESS] + [
+        f"Location {number}|{street}"
+        for number, street in enumerate(_street_names(num_addresses - 1, rng), start=1)
+    ]
+
+    points = _random_points(num_addresses, rng, radius)
+
+    matrix = [[0.0] * num_addresses for _ in range(num_addresses)]
+    for i in range(num_addresses):
+        for j in range(i):
+            distance = round(math.dist(points[i], points[j]) * road_factor, 1)
+            matrix[i][j] = matrix[j][i] = max(distance, 0.1)
+
+    return addresses, matrix
+
+
+def _random_points(count, rng, radius):
+    """Return the hub at (0, 0) and count - 1 points spread evenly over a
+    disc around it.
+    """
+
+    points = [(0.0, 0.0)]
+    for _ in range(count - 1):
+        distance = radius * math.sqrt(rng.random())
+        angle = rng.uniform(0, 2 * math.pi)
+        points.append((distance * math.cos(angle), distance * math.sin(angle)))
+    return points
+
+
+def generate_road_graph(num_addresses, rng, radius=10.0, road_factor=1.3, roads_per_address=4):
+    """Return the addresses (hub first) and a list of (from, to, distance)
+    roads joining each address to its closest neighbors, in miles. Every
+    address can be reached from the hub.
+    """
+
+    addresses = [HUB_ADDRESS] + [
+        f"Location {number}|{street}"
+        for number, street in enumerate(_street_names(num_addresses - 1, rng), start=1)
+    ]
+    points = _random_points(num_addresses, rng, radius)
+
+    def road_length(i, j):
+        return max(round(math.dist(points[i], points[j]) * road_factor, 1), 0.1)
+
+    # bucket the points into a grid about roads_per_address points per cell,
+    #   so each one's neighbors are found among the cells around it
+    cell_size = max(2 * radius * math.sqrt(roads_per_address / num_addresses), 1e-9)
+    grid = {}
+    for index, (x, y) in enumerate(points):
+        grid.setdefault((int(x // cell_size), int(y // cell_size)), []).append(index)
+
+    roads = {}
+    for index, (x, y) in enumerate(points):
+        cell_x, cell_y = int(x // cell_size), int(y // cell_size)
+        nearby = []
+        ring = 1
+        while len(nearby) <= roads_per_address and ring <= 2 * radius / cell_size + 1:
+            nearby = [
+                other
+                for dx in range(-ring, ring + 1) for dy in range(-ring, ring + 1)
+                for other in grid.get((cell_x + dx, cell_y + dy), ())
+                if other != index
+            ]
+            ring += 1
+        nearby.sort(key=lambda other: (math.dist(points[index], points[other]), other))
+        for other in nearby[:roads_per_address]:
+            roads[min(index, other), max(index, other)] = road_length(index, other)
+
+    # join any address cut off from the hub to the closest one that is not
+    adjacent = [[] for _ in range(num_addresses)]
+    for i, j in roads:
+        adjacent[i].append(j)
+        adjacent[j].append(i)
+    reached = {0}
+    stack = [0]
+    while stack:
+        for other in adjacent[stack.pop()]:
+            if other not in reached:
+                reached.add(other)
+                stack.append(other)
+    for index in sorted(set(range(num_addresses)) - reached, key=lambda i: math.dist(points[0], points[i])):
+        closest = min(reached, key=lambda other: math.dist(points[index], points[other]))
+        roads[min(index, closest), max(index, closest)] = road_length(index, closest)
+        reached.add(index)
+
+    return addresses, [(addresses[i], addresses[j], distance) for (i, j), distance in sorted(roads.items())]
+
+
+def generate_packages(num_packages, addresses, rng, num_trucks=2):
+    """Return a row (dictionary of PACKAGE_HEADER fields) for every package."""
+
+    street_addresses = [address.split("|")[-1] for address in addresses[1:]]
+    rows = []
+    for package_id in range(1, num_packages + 1):
+        deadline = "EOD"
+        roll = rng.random()
+        for clock_time, share in _DEADLINES:
+            if roll < share:
+                deadline = clock_time
+                break
+            roll -= share
+
+        rows.append({
+            "Package ID": package_id,
+            "Address": rng.choice(street_addresses),
+            "City": "Salt Lake City",
+            "State": "UT",
+            "Zip": rng.randint(84100, 84199),
+            "Delivery Deadline": deadline,
+            "Weight KILO": rng.randint(1, 88),
+            "Special Notes": "",
+            "Trip": "",
+        })
+
+    # special notes -- each package gets at most one, and never one that
+    #   makes its deadline impossible
+    free = [row for row in rows if row["Delivery Deadline"] != "9:00:00 AM"]
+    rng.shuffle(free)
+    share = max(1, num_packages // 20)
+
+    for row in free[:share]:
+        row["Special Notes"] = f"Can only be on truck {rng.randint(1, num_trucks)}"
+
+    for row in free[share:2 * share]:
+        row["Special Notes"] = "Delayed on flight---will not arrive to depot until 9:05 am"
+
+    # "must be delivered with" groups of 2 to 4 packages, well under a truck's capacity
+    position = 2 * share
+    end = min(len(free), 3 * share)
+    while position < end:
+        group = free[position:position + rng.randint(2, 4)]
+        if len(group) > 1:
+            others = [row["Package ID"] for row in group[1:]]
+            group[0]["Special Notes"] = f"Must be delivered with {', '.join(map(str, others))}"
+        position += len(group)
+
+    return rows
+
+
+def write_distances(filepath, addresses, matrix):
+    """Write a distance table CSV -- lower triangle only, like the original."""
+
+    with open(filepath, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["DISTANCE BETWEEN HUBS IN MILES"] + addresses)
+        for i, address in enumerate(addresses):
+            cells = [f"{matrix[i][j]:g}" if j <= i else "" for j in range(len(addresses))]
+            writer.writerow([address] + cells)
+
+
+def write_road_graph(filepath, roads):
+    """Write a road graph edge list CSV, one road per row."""
+
+    with open(filepath, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["from", "to", "distance"])
+        for from_address, to_address, distance in roads:
+            writer.writerow([from_address, to_address, f"{distance:g}"])
+
+
+def write_packages(filepath, rows):
+    """Write a packages CSV."""
+
+    with open(filepath, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PACKAGE_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def generate(directory, num_addresses, num_packages, seed=0, num_trucks=2, road_graph=False):
+    """Write distances.csv and packages.csv for a synthetic workload into the
+    given directory. Return the paths of the (packages, distances) files.
+    With road_graph=True a sparse road network is written to roads.csv
+    instead of the distance table, and its path is returned in its place.
+    """
+
+    if num_addresses < 2:
+        raise ValueError("A workload needs the hub and at least one delivery address")
+
+    rng = random.Random(seed)
+    if road_graph:
+        addresses, roads = generate_road_graph(num_addresses, rng)
+    else:
+        addresses, matrix = generate_distances(num_addresses, rng)
+    rows = generate_packages(num_packages, addresses, rng, num_trucks=num_trucks)
+
+    os.makedirs(directory, exist_ok=True)
+    packages_path = os.path.join(directory, "packages.csv")
+    if road_graph:
+        distances_path = os.path.join(directory, "roads.csv")
+        write_road_graph(distances_path, roads)
+    else:
+        distances_path = os.path.join(directory, "distances.csv")
+        write_distances(distances_path, addresses, matrix)
+    write_packages(packages_path, rows)
+
+    return packages_path, distances_path
+
+
+# !---------------------------------------------------------------------------
+if __name__ == "__main__":
+
+    import sys
+
+    # python -m lib.workload DIRECTORY ADDRESSES PACKAGES [SEED]
+    directory, num_addresses, num_packages = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    print(*generate(directory, num_addresses, num_packages, seed), sep="\n")
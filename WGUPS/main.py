@@ -12,97 +12,351 @@ Student ID: 011441603
 """
 
 
+import argparse
+import collections
+import copy
+import cProfile
 import csv
-import queue
+import json
+import os
+import heapq
+import itertools
+import operator
+import sys
 from datetime import datetime, timedelta
 
-from lib.truck import Truck
+from lib.truck import Event, Truck, TripReport
 from lib.package import Package
-from lib.hash_table import HashTable
+from lib.distance_matrix import DistanceMatrix
+from lib.road_graph import DEFAULT_CACHE_BYTES, RoadGraph
+from lib.hash_table import HASH_TABLES
+from lib.package_table import PackageTable
+from lib.load_planner import LoadPlanner, Trip
+from lib.clock import parse_time
+from lib.results import (PackageResult, SimulationResult, format_package, package_to_dict, result_to_dict,
+                         snapshot_to_dict)
+from lib.status_history import StatusHistory, AT_HUB, CANCELLED, DELIVERED, EN_ROUTE
+from lib.route_repair import RouteChange
+from lib.route_cache import DEFAULT_MAX_BYTES, RouteCache, matrix_fingerprint
+from lib.event_log import EventLogWriter
+from lib.profiling import RunStats, phase
+
+
+# default data files, next to this script
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# the sample package file, and the address corrections that go with it --
+#   package #9's address is wrong and WGUPS learns the correct one at 10:20 AM
+SAMPLE_PACKAGES = os.path.join(DATA_DIR, "packages.csv")
+SAMPLE_ADDRESS_CORRECTIONS = os.path.join(DATA_DIR, "address_corrections.csv")
+
+
+# the complete state of a run at an event boundary -- see Simulation.checkpoint()
+SimulationCheckpoint = collections.namedtuple(
+    "SimulationCheckpoint",
+    "started clock total_distance truck_miles events route_changes next_sequence trucks packages "
+    "package_load_order trip_number trip_departures trip_reports event_log history",
+)
+
+
+# packages.csv columns holding the Package constructor arguments, in order
+#   (the state is always "UT")
+PACKAGE_COLUMNS = ("Package ID", "Address", "Zip", "Weight KILO", "Delivery Deadline", "Special Notes")
+
 
 
 class Simulation:
     """Creates and manages the simulation of a package delivery routing
-    program. Run the simulation by invoking the "run" method.
+    program. Run the simulation by invoking the "run" method, which returns a
+    SimulationResult; print_report() shows it on the console.
+
+    The start and end times may be datetimes or clock times like "10:35 AM".
+    The simulation starts at 8:00 AM today by default and runs until every
+    package is delivered when no end time is given.
+
+    Changes to the plan during the day -- a package's address changing, a
+    package arriving late or a delivery being cancelled -- are queued with
+    change_address(), add_package() and cancel_package() before the run and
+    applied at their time; trucks out on the road only repair the rest of
+    their route (see lib/route_repair.py).
+
+    A run can be stopped at any time with advance_to(), checkpointed, and
+    forked into branches which each finish the day their own way:
+
+        simulation.advance_to("11:00 AM")
+        branch = simulation.fork()
+        branch.cancel_package(5, "11:00 AM")
+        what_if = branch.run()
+        as_planned = simulation.run()
+
+    A very large manifest can be streamed instead of loaded up front: with
+    chunk_size set, packages are read chunk_size at a time. Up to read_ahead
+    chunks of packages are kept waiting at the hub: whenever a truck gets back
+    and fewer are waiting, the next chunks are read and planned together with
+    the trips not yet under way, so urgent packages in a new chunk go out
+    ahead of the backlog. The trucks set off once the first chunks are in.
+    With a result_sink as well, each delivered (or cancelled)
+    package is handed to result_sink(PackageResult) when its truck is back at
+    the hub and dropped from the package table and status history, and the
+    events and trip reports are not kept in memory (use event_log_path to
+    record the events), so memory stays bounded by the packages in play. A streamed run cannot be
+    checkpointed or forked, and "must be delivered with" groups are only
+    kept together while they wait at the hub at the same time.
     """
 
-    def __init__(self, packages_path=None, distances_path=None):
+    def __init__(self, packages_path=None, distances_path=None, planner="nearest_neighbor", planner_options=None,
+                 improve_routes=False, improvement_max_iterations=None, improvement_time_limit=0.05,
+                 improvement_candidates=None,
+                 address_corrections=None, start_time=None, end_time=None, hash_table="chaining",
+                 fleet_size=2, departure_offsets=None, truck_speed=None, truck_capacity=None,
+                 load_order=None, distance_matrix=None, package_rows=None, profile=False,
+                 distance_cache=False, route_cache=None, event_log_path=None, chunk_size=None,
+                 read_ahead=2, result_sink=None):
+
+        # optional instrumentation -- phase times and hot path counters, see
+        #   lib/profiling.py; None (the default) turns it off
+        self.stats = RunStats() if profile else None
     
-        # load data files
-        self.addresses = []
-        self.distance_matrix = self._load_distance_matrix(distances_path)
-        self.packages = self._load_packages(packages_path)
-
-        # trucks -- three available in this project; only two will be used in the simulation
-        self.truck1 = Truck(id=1, address_list=self.addresses, distance_matrix=self.distance_matrix)
-        self.truck2 = Truck(id=2, address_list=self.addresses, distance_matrix=self.distance_matrix)
-        self.truck3 = Truck(id=3, address_list=self.addresses, distance_matrix=self.distance_matrix)
-
-        # package load order -- hardcoded for this project
-        # first 16 is picked up by the first truck; second 16 by
-        #   the second truck, etc.
-        self.package_load_order = [
-            '1', '6', '11', '14', '15', '16', '17', '19', '20', '21', '22', '24', '26', '31', '34', '40',  # trip 1
-            '2', '3', '5', '7', '8', '10', '13', '18', '27', '29', '30', '35', '36', '37', '38', '39',     # trip 2
-            '4', '12', '23', '25', '28', '32', '33', None, None, None, None, None, None, None, None, None, # trip 3
-            '9',                                                                                           # trip 4
-        ]
+        # load data files -- or use a DistanceMatrix and package rows (see
+        #   read_package_rows) which were already parsed, i.e. by a scenario sweep
+        # a streamed manifest starts out with an empty package table, and is
+        #   read chunk by chunk as the day goes (see _read_ahead)
+        # with distance_cache on, the distance table is memory-mapped from a
+        #   compiled cache file next to the CSV, written there on the first
+        #   run; see lib/matrix_cache.py
+        # the package table is one of the hash tables in lib/hash_table.py, by name:
+        #   "chaining" (default) or "open_addressing"
+        with phase(self.stats, "load"):
+            if distance_matrix is None:
+                distance_matrix = DistanceMatrix.from_csv(distances_path, cache=distance_cache)
+            self.distance_matrix = distance_matrix
+            self.addresses = distance_matrix.addresses
+            self._package_chunks = None
+            self._chunk_size = chunk_size
+            self._read_ahead_chunks = read_ahead
+            if chunk_size is not None:
+                if package_rows is None:
+                    self._package_chunks = self.read_package_chunks(packages_path, chunk_size)
+                else:
+                    self._package_chunks = (
+                        package_rows[start:start + chunk_size] for start in range(0, len(package_rows), chunk_size)
+                    )
+                package_rows = []
+            elif package_rows is None:
+                package_rows = self.read_package_rows(packages_path)
+            self.packages = self._load_packages(package_rows, HASH_TABLES[hash_table])
+
+        # trucks -- three available in this project, but only two drivers, so the
+        #   fleet in service defaults to two trucks; any fleet size is supported
+        # the route planner is selectable by name, i.e. "nearest_neighbor",
+        #   "candidate_nearest_neighbor" (k-nearest candidate lists, for large
+        #   batches), "vectorized" (NumPy) or "held_karp" (exact, for small loads),
+        #   and takes extra options through planner_options; see lib/route_planners.py
+        # routes can optionally be improved with 2-opt / Or-opt local search
+        #   within an iteration and time (seconds) budget, optionally limited to
+        #   moves between k-nearest candidates; see lib/local_search.py
+        truck_options = dict(
+            distance_matrix=self.distance_matrix,
+            planner=planner,
+            planner_options=planner_options,
+            improve_routes=improve_routes,
+            improvement_max_iterations=improvement_max_iterations,
+            improvement_time_limit=improvement_time_limit,
+            improvement_candidates=improvement_candidates,
+        )
+        self.trucks = {
+            truck_id: Truck(id=truck_id, **truck_options)
+            for truck_id in range(1, fleet_size + 1)
+        }
+
+        # truck speed (mph) and capacity (packages) can be overridden for what-if runs
+        # a RouteCache (see lib/route_cache.py) lets the trucks reuse routes
+        #   planned before, i.e. by an earlier run on the same distance table
+        self.route_cache = route_cache
+        for truck in self.trucks.values():
+            truck.stats = self.stats
+            truck.route_cache = route_cache
+            if truck_speed is not None:
+                truck.speed = truck_speed
+            if truck_capacity is not None:
+                truck.capacity = truck_capacity
+
+        # set the simulation start time -- trucks leave the hub no earlier than 8:00 AM
+        # departure offsets delay a truck's first trip, in minutes by truck id;
+        #   by default the second truck leaves 26 minutes after the first
+        if start_time is None:
+            start_time = "8:00 AM"
+        self.simulation_start_time = self._parse_time_of_day(start_time, datetime.today())
+        if departure_offsets is None:
+            departure_offsets = {2: 26}
+        self.departure_offsets = departure_offsets
+
+        # address corrections known ahead of time -- package id: (time known,
+        #   correct address); the load planner holds these packages until the
+        #   correct address is known, and the correction is queued as a change below
+        # by default only the sample package file has any (see
+        #   address_corrections_for)
+        if address_corrections is None:
+            address_corrections = self.address_corrections_for(packages_path)
+        self.address_corrections = {
+            package_id: (parse_time(known_at), address)
+            for package_id, (known_at, address) in address_corrections.items()
+        }
+
+        # package load order -- a list of Trip tuples built by the load planner
+        #   from each package's deadline and special notes; each trip names the
+        #   truck that takes it and the earliest time it may leave the hub
+        # a fixed load order of (truck id, departure minute, package ids) trips
+        #   may be given instead
+        # the minute each truck is expected back from the trip it is on is
+        #   kept, so a streamed run's replanned trips follow on from it
+        self._truck_free = {}
+        with phase(self.stats, "plan"):
+            if load_order is None:
+                self.package_load_order = self._plan_loads()
+            else:
+                self.package_load_order = [Trip(*trip) for trip in load_order]
 
         self.trip_number = 0
 
-        # a priority queue will hold the simulation events; i.e. truck leaves HUB or truck delivers package
-        # priority queue will be ordered by the simulation time, or how many minutes since the start of the day
-        self.events = queue.PriorityQueue()
+        # trip number -> (truck id, earliest time in seconds the trip could leave the hub)
+        self.trip_departures = {}
+
+        # one TripReport per plotted trip -- planned vs. improved miles
+        # like the event log, neither is kept by a streamed run with a result sink
+        self.trip_reports = []
+        self.improve_routes = improve_routes
+
+        # a heap will hold the simulation events; i.e. truck leaves HUB or truck delivers package
+        # entries are (time, sequence number, event) -- ordered by the simulation time in
+        #   seconds since midnight, ties broken by the order events were queued
+        self.events = []
+        self._event_sequence = itertools.count()
+
+        # truck id -> the truck's current Truck.deliver_packages() coroutine;
+        #   trucks with no entry are idle at the hub
+        self.active_deliveries = {}
+
+        # a second heap holds the queued changes to the plan -- entries are
+        #   (time, sequence number, RouteChange), see lib/route_repair.py
+        self.route_changes = []
+        for package_id, (known_at, address) in self.address_corrections.items():
+            self._queue_change(RouteChange(known_at * 60, "address", package_id, address))
 
-        # set the simulation start and end times
-        self.simulation_start_time = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
-        self.simulation_end_time = self._prompt_for_end_time()
+        # set the simulation end time -- None runs the day to completion
+        self.simulation_end_time = None
+        if end_time is not None:
+            self.simulation_end_time = self._parse_time_of_day(end_time, self.simulation_start_time)
+            if self.simulation_end_time < self.simulation_start_time:
+                raise ValueError("The simulation end time must be after the start time")
 
+        # every processed event, in order -- part of the run's result
+        self.event_log = []
 
-    def _load_distance_matrix(self, filepath):
-        """Read the given file for a matrix of distances between delivery
-        locations. Return a two-dimensional array of distances.
+        # the event loop's state -- the clock (seconds since midnight) and the
+        #   miles driven so far; set when the day starts (see _begin)
+        self.started = False
+        self.clock = None
+        self.total_distance = 0
+        self.truck_miles = {}
+
+        # optionally, the events and package status changes are also streamed
+        #   to a file as the run goes, for replaying later; see lib/event_log.py
+        self.event_log_path = event_log_path
+        self.event_writer = None
+
+        # called with the PackageResult of each finished package of a streamed
+        #   run, which is then released; see the class docstring
+        self.result_sink = result_sink
+
+        # each package's status changes over the day, for "status at time T" queries
+        self.history = StatusHistory(self.simulation_start_time)
+        for truck in self.trucks.values():
+            truck.status_history = self.history
+
+    @staticmethod
+    def read_package_rows(filepath):
+        """Read the given file for a list of packages to be delivered. Return
+        a list of Package constructor argument tuples, one per package.
+        """
+
+        return [row for chunk in Simulation.read_package_chunks(filepath) for row in chunk]
+
+    @staticmethod
+    def read_address_corrections(filepath):
+        """Read an address corrections CSV (Package ID, Known At, Address).
+        Return a dictionary of package id: (time known, correct address).
         """
 
-        # distance matrix will be implemented as a list of lists, or a 2d array
-        distance_matrix = []
         with open(filepath, encoding="utf-8") as f:
             reader = csv.reader(f)
+            next(reader)  # header row
+            return {int(package_id): (known_at, address) for package_id, known_at, address in reader}
 
-            # package addresses are taken from the CSV's first row, ignoring the first field
-            self.addresses = next(reader)[1:]
-
-            # for every row after the header, append a list of values excluding the first value (address)
-            distance_matrix.extend(row[1:] for row in reader)
+    @staticmethod
+    def address_corrections_for(packages_path):
+        """Return the address corrections which go with a package file -- the
+        sample corrections for the sample package file, none for any other.
+        """
 
-        return distance_matrix
+        if packages_path is not None and os.path.exists(packages_path) \
+                and os.path.samefile(packages_path, SAMPLE_PACKAGES):
+            return Simulation.read_address_corrections(SAMPLE_ADDRESS_CORRECTIONS)
+        return {}
 
-    def _load_packages(self, filepath):
-        """Read the given file for a list of packages to be delivered, and
-        load each package into a hash table.
+    @staticmethod
+    def read_package_chunks(filepath, chunk_size=10000):
+        """Read the given package file chunk_size rows at a time. Yield lists
+        of Package constructor argument tuples.
         """
 
-        # package data will be stored in our custom hash table
-        package_hash = HashTable()
         with open(filepath, encoding="utf-8") as f:
-            reader = csv.DictReader(f)
+            reader = csv.reader(f)
 
+            # columns are found by name once, then picked out of each row by position
+            header = next(reader)
+            pick = operator.itemgetter(*(header.index(name) for name in PACKAGE_COLUMNS))
+
+            chunk = []
             for row in reader:
-                # create a Package instance to store in the hash table
-                package = Package(
-                    row["Package ID"],
-                    row["Address"],
-                    "UT",
-                    row["Zip"],
-                    row["Weight KILO"],
-                    row["Delivery Deadline"],
-                )
-
-                # the package ID serves as the hash table entry's key
-                package_hash.insert(package.id, package)
+                package_id, address, zip_code, weight, deadline, notes = pick(row)
+                chunk.append((package_id, address, "UT", zip_code, weight, deadline, notes))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    def _load_packages(self, package_rows, table_class):
+        """Create a Package instance for each package row, and load each
+        package into a hash table.
+        """
+
+        # package data will be stored in our custom hash table, wrapped with
+        #   secondary indexes (address, deadline, zip, weight, status, truck)
+        table = table_class()
+        table.stats = self.stats
+        package_hash = PackageTable(table)
+        packages = (Package(*row) for row in package_rows)
+
+        # the package ID serves as the hash table entry's key; packages are
+        #   inserted in one batch so the table can size itself once
+        package_hash.bulk_insert((package.id, package) for package in packages)
 
         return package_hash
     
+    @staticmethod
+    def _parse_time_of_day(value, day):
+        """Return a datetime for the given clock time ("10:35 AM") on the
+        given day. datetimes are returned unchanged.
+        """
+
+        if isinstance(value, datetime):
+            return value
+
+        clock_time = datetime.strptime(value.strip().upper(), "%I:%M %p")
+        return day.replace(hour=clock_time.hour, minute=clock_time.minute, second=0, microsecond=0)
+
     def _prompt_for_end_time(self):
         """Prompt the user for the time the simulation should end. 5:00pm by default."""
 
@@ -120,7 +374,7 @@ class Simulation:
                 print("\nInvalid format: please use the format '%I:%M %p', like 10:35 AM\n")
                 return self._prompt_for_end_time()
 
-        stop_datetime = datetime.today().replace(
+        stop_datetime = self.simulation_start_time.replace(
             hour=stop_time.hour,
             minute=stop_time.minute,
             second=0,
@@ -135,6 +389,129 @@ class Simulation:
         print("\n")
         return stop_datetime
 
+    def _plan_loads(self, packages=None, truck_start_times=None):
+        """Plan the delivery trips for the given packages (by default, every
+        package) with the load planner. truck_start_times maps each truck id
+        to the minute it can first leave the hub; by default, the start of
+        the day.
+        """
+
+        # the planner predicts stop times with the same route planner the trucks use
+        truck = self.trucks[1]
+        planner = LoadPlanner(
+            self.distance_matrix,
+            plan_route=truck.plan_route,
+            hub_index=self.distance_matrix.index(truck.hub_address),
+            capacity=truck.capacity,
+            speed=truck.speed,
+            address_corrections=self.address_corrections,
+        )
+
+        if truck_start_times is None:
+            start_minutes = self._to_seconds(self.simulation_start_time) / 60
+            truck_start_times = {
+                truck_id: start_minutes + self.departure_offsets.get(truck_id, 0)
+                for truck_id in self.trucks
+            }
+        if packages is None:
+            packages = self.packages.values()
+
+        # plan in package id order so the plan is the same on every run
+        packages = sorted(packages, key=lambda pkg: pkg.id)
+        return planner.plan(packages, truck_start_times)
+
+    def _read_ahead(self):
+        """Read chunks of a streamed manifest into the package table while
+        fewer than read_ahead chunks of packages are waiting at the hub, and
+        replan every trip not yet under way together with them. Return False
+        if nothing was read.
+        """
+
+        waiting = sum(len(trip.package_ids) for trip in self.package_load_order)
+        packages = []
+        while waiting + len(packages) < self._chunk_size * self._read_ahead_chunks:
+            rows = next(self._package_chunks, None)
+            if rows is None:
+                break
+            with phase(self.stats, "load"):
+                packages.extend(Package(*row) for row in rows)
+        if not packages:
+            return False
+
+        with phase(self.stats, "load"):
+            self.packages.bulk_insert((package.id, package) for package in packages)
+
+        for package in packages:
+            # an address correction which is already known applies right away
+            correction = self.address_corrections.get(package.id)
+            if correction is not None and correction[0] * 60 <= self.clock:
+                self.packages.set_fields(package.id, address=correction[1])
+            if self.event_writer is not None:
+                self.event_writer.write_package(package)
+            self.history.record(package.id, self.clock, AT_HUB, address=package.address)
+
+        # the packages still waiting for a trip are planned again with the
+        #   new ones -- a truck can take them once it is back from the trip
+        #   it is on or, before its first, at its start time
+        waiting_ids = {pkg_id for trip in self.package_load_order for pkg_id in trip.package_ids}
+        if waiting_ids:
+            packages.extend(self.packages.lookup(pkg_id) for pkg_id in waiting_ids)
+
+        start_minutes = self._to_seconds(self.simulation_start_time) / 60
+        truck_start_times = {
+            truck_id: max(
+                self.clock / 60,
+                self._truck_free.get(truck_id, start_minutes + self.departure_offsets.get(truck_id, 0)),
+            )
+            for truck_id in self.trucks
+        }
+        with phase(self.stats, "plan"):
+            self.package_load_order = self._plan_loads(packages, truck_start_times)
+        return True
+
+    def _refill(self):
+        """Read ahead in a streamed manifest (see _read_ahead). Idle trucks
+        given a trip set off.
+        """
+
+        if self._read_ahead():
+            for truck in self.trucks.values():
+                if truck.id not in self.active_deliveries:
+                    self._start_delivery(truck, self.clock)
+
+    def _release_packages(self, truck_id):
+        """Hand the packages the truck delivered, and any cancelled ones, to
+        the result sink and drop them from the package table and history.
+        """
+
+        if self.result_sink is None:
+            return
+
+        for package in self.packages.find(truck=truck_id, status=DELIVERED) + self.packages.find(status=CANCELLED):
+            self.result_sink(self._package_result(package))
+            self.packages.delete(package.id)
+            self.history.forget(package.id)
+
+    def _package_result(self, package):
+        """Return a package's PackageResult."""
+
+        return PackageResult(
+            package.id, package.address, package.deadline, package.status,
+            package.truck, package.trip_number,
+            None if package.delivery_time is None else self._to_datetime(package.delivery_time),
+        )
+
+    def _to_seconds(self, time):
+        """Convert a datetime to whole seconds since midnight."""
+
+        return time.hour * 3600 + time.minute * 60 + time.second
+
+    def _to_datetime(self, seconds):
+        """Convert seconds since midnight to a datetime on the simulation day."""
+
+        midnight = self.simulation_start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight + timedelta(seconds=seconds)
+
     def load_truck(self, truck, package_list):
         """Load the given truck with a group of packages."""
 
@@ -144,129 +521,725 @@ class Simulation:
         for package_id in package_list:
             truck.load_package(package_id, self.packages, self.trip_number)
 
-    def prep_delivery(self, truck):
+    def prep_delivery(self, truck, time):
         """Prepare a delivery trip by loading packages onto a truck and
-        plotting the delivery route.
+        plotting the delivery route. Times are seconds since midnight. Return
+        the time the truck leaves the hub, or None if no trips are left for
+        this truck.
         """
 
+        # find the next trip planned for this truck
+        for trip_index, trip in enumerate(self.package_load_order):
+            if trip.truck_id == truck.id:
+                break
+        else:
+            return None
+
+        # remove the trip from our load order
+        del self.package_load_order[trip_index]
+
+        # the truck can't leave before every package on the trip is at the hub
+        departure_time = max(time, round(trip.departure * 60))
+
         # clear out the previous route and list of loaded packages
         truck.route = []
         truck.packages = []
 
-        # load the first 16 packages from our package load order
-        # 16 = truck maximum capacity
-        self.load_truck(truck, self.package_load_order[:16])
-        # remove these packages from our load order
-        del self.package_load_order[:16]
+        # load the trip's packages onto the truck
+        self.load_truck(truck, trip.package_ids)
+        if self.result_sink is None:
+            self.trip_departures[self.trip_number] = (truck.id, round(trip.departure * 60))
+
+        # the packages are en route from the moment the truck leaves
+        for package_id in trip.package_ids:
+            package = self.packages.lookup(package_id)
+            self.history.record(package_id, departure_time, EN_ROUTE, truck.id, self.trip_number, package.address)
 
         # plot the route that should be taken to deliver all loaded packages
-        truck.plot_delivery_route(self.packages)
+        # and keep the predicted distance for the end-of-day report
+        predicted_distance = truck.plot_delivery_route(self.packages)
+        if self.result_sink is None:
+            self.trip_reports.append(
+                TripReport(self.trip_number, truck.id, truck.planned_distance, predicted_distance)
+            )
+        self._truck_free[truck.id] = departure_time / 60 + predicted_distance / truck.speed * 60
 
-    def run(self):
+        return departure_time
 
-        # prepare a new delivery for each of our available trucks
-        self.prep_delivery(self.truck1)
-        self.prep_delivery(self.truck2)
+    def print_trip_reports(self):
+        """Print the planned and improved distance of each trip."""
+
+        print("\nRoute improvement:")
+        total_saved = 0
+        for report in self.trip_reports:
+            saved = report.planned_miles - report.improved_miles
+            total_saved += saved
+            print(
+                f"  Trip {report.trip_number} (truck {report.truck_id}): "
+                f"{report.planned_miles:.2f} mi -> {report.improved_miles:.2f} mi "
+                f"(saved {saved:.2f} mi)"
+            )
+        print(f"  Total saved: {total_saved:.2f} mi")
+
+    def _start_delivery(self, truck, time):
+        """Prepare the truck's next trip and queue up its first event. Return
+        False if no trips are left for this truck.
+        """
+
+        departure_time = self.prep_delivery(truck, time)
+        if departure_time is None:
+            return False
 
         # an active delivery is a Truck.deliver_packages() coroutine
-        active_deliveries = []
+        delivery = truck.deliver_packages(self.packages, start_time=departure_time)
+        self.active_deliveries[truck.id] = delivery
+        self._push_event(next(delivery))
+        return True
+
+    def _push_event(self, event):
+        """Queue up an event. Events at the same time are processed in the
+        order they were queued.
+        """
+
+        heapq.heappush(self.events, (event.time, next(self._event_sequence), event))
+        if self.stats is not None:
+            self.stats.counters["events_pushed"] += 1
+
+    def change_address(self, package_id, address, at):
+        """Change a package's delivery address at the given time (a datetime
+        or a clock time like "10:20 AM").
+        """
+
+        self._queue_change(RouteChange(self._change_time(at), "address", package_id, address))
+
+    def add_package(self, package_row, at):
+        """Add a package, arriving at the hub at the given time. package_row
+        holds the Package constructor arguments, like read_package_rows().
+        """
+
+        self._queue_change(RouteChange(self._change_time(at), "add", int(package_row[0]), package_row=tuple(package_row)))
+
+    def cancel_package(self, package_id, at):
+        """Cancel a package's delivery at the given time."""
+
+        self._queue_change(RouteChange(self._change_time(at), "cancel", package_id))
+
+    def _change_time(self, at):
+
+        return self._to_seconds(self._parse_time_of_day(at, self.simulation_start_time))
+
+    def _queue_change(self, change):
 
-        # starting the day at 8:00 AM
-        start_time = self.simulation_start_time
+        heapq.heappush(self.route_changes, (change.time, next(self._event_sequence), change))
 
-        # append package delivery coroutines to our list of active deliveries
-        active_deliveries.append(
-            self.truck1.deliver_packages(
-                self.packages,
-                start_time=start_time,
+    def _apply_change(self, change, time):
+        """Apply a queued change to the plan. Return an Event describing what
+        was done, for the event log.
+        """
+
+        if change.kind == "add":
+            return self._apply_add(change.package_row, time)
+
+        package = self.packages.lookup(change.package_id)
+        if not package:
+            return Event(time, None, 0, f"Unknown package {change.package_id}", (change.package_id,))
+        if package.status in (DELIVERED, CANCELLED):
+            return Event(time, package.truck, 0,
+                         f"Package {package.id} is already {package.status.label.lower()}", (package.id,))
+
+        # the package is either on a truck, or at the hub waiting for a trip
+        truck = self.trucks.get(package.truck) if package.status == EN_ROUTE else None
+
+        if change.kind == "address":
+            self.packages.set_fields(package.id, address=change.address)
+            self.history.record(package.id, time, package.status, package.truck, package.trip_number, package.address)
+            if truck is not None:
+                truck.reroute_package(package.id, self.packages)
+                self._refresh_drop_off(truck)
+            return Event(time, package.truck, 0, f"Package {package.id} address changed to {package.address}",
+                         (package.id,))
+
+        # cancelled -- off the truck's route, or out of its planned trip
+        if truck is not None:
+            truck.remove_package(package.id, self.packages)
+            self._refresh_drop_off(truck)
+        else:
+            self._remove_from_trips(package.id)
+        self.packages.set_fields(package.id, status=CANCELLED)
+        self.history.record(package.id, time, CANCELLED, package.truck, package.trip_number, package.address)
+        return Event(time, package.truck, 0, f"Package {package.id} cancelled", (package.id,))
+
+    def _refresh_drop_off(self, truck):
+        """Rewrite the queued event of a truck on its way to a stop, after a
+        change to the packages it drops off there. The event keeps its place
+        in the queue.
+        """
+
+        if truck.delivery_phase != "driving" or truck.next_stop == 0:
+            return
+        for index, (time, sequence, event) in enumerate(self.events):
+            if event.truck_id == truck.id:
+                self.events[index] = (time, sequence, truck.drop_off_event(time))
+                return
+
+    def _apply_add(self, package_row, time):
+        """Add a package that arrived at the hub to the plan: onto a truck
+        still waiting to leave, into a planned trip with room or, failing
+        those, into a trip of its own.
+        """
+
+        package = Package(*package_row)
+        if self.packages.lookup(package.id):
+            return Event(time, None, 0, f"Package {package.id} already exists", (package.id,))
+
+        self.packages.insert(package.id, package)
+        if self.event_writer is not None:
+            self.event_writer.write_package(package)
+        self.history.record(package.id, time, AT_HUB, address=package.address)
+        address_index = self.distance_matrix.index(package.address)
+
+        # a loaded truck which has not left yet takes it along, on its current trip
+        for truck in self.trucks.values():
+            if not truck.packages:
+                continue
+            trip_number = self.packages.lookup(truck.packages[0]).trip_number
+            if truck.add_package(package.id, self.packages, trip_number):
+                self.history.record(package.id, time, EN_ROUTE, truck.id, trip_number, package.address)
+                return Event(time, truck.id, 0, f"Package {package.id} added to truck {truck.id}", (package.id,))
+
+        # the planned trip with room that goes closest to the package's address
+        d = self.distance_matrix.matrix
+        best = None
+        for trip_index, trip in enumerate(self.package_load_order):
+            if len(trip.package_ids) >= self.trucks[trip.truck_id].capacity:
+                continue
+            distance = min(
+                d[address_index][self.distance_matrix.index(self.packages.lookup(pkg_id).address)]
+                for pkg_id in trip.package_ids
             )
-        )
-        active_deliveries.append(
-            self.truck2.deliver_packages(
-                self.packages,
-                start_time=start_time + timedelta(minutes=26),
+            if best is None or distance < best[0]:
+                best = (distance, trip_index)
+
+        if best is not None:
+            trip = self.package_load_order[best[1]]
+            self.package_load_order[best[1]] = trip._replace(package_ids=(*trip.package_ids, package.id))
+            return Event(time, trip.truck_id, 0,
+                         f"Package {package.id} added to a planned trip of truck {trip.truck_id}", (package.id,))
+
+        # a trip of its own, for the truck with the fewest trips left -- an idle
+        #   truck leaves with it right away
+        pending = {truck_id: 0 for truck_id in self.trucks}
+        for trip in self.package_load_order:
+            pending[trip.truck_id] += 1
+        truck_id = min(pending, key=lambda truck_id: (truck_id in self.active_deliveries, pending[truck_id]))
+        self.package_load_order.append(Trip(truck_id, time / 60, (package.id,)))
+        if truck_id not in self.active_deliveries:
+            self._start_delivery(self.trucks[truck_id], time)
+        return Event(time, truck_id, 0, f"Package {package.id} added to a new trip of truck {truck_id}",
+                     (package.id,))
+
+    def _remove_from_trips(self, package_id):
+        """Take a package out of the planned trips, dropping a trip left empty."""
+
+        for trip_index, trip in enumerate(self.package_load_order):
+            if package_id in trip.package_ids:
+                package_ids = tuple(pkg_id for pkg_id in trip.package_ids if pkg_id != package_id)
+                if package_ids:
+                    self.package_load_order[trip_index] = trip._replace(package_ids=package_ids)
+                else:
+                    del self.package_load_order[trip_index]
+                return
+
+    def run(self):
+        """Run the simulation (the rest of it, after advance_to() or on a
+        fork). Return a SimulationResult.
+        """
+
+        with phase(self.stats, "simulate"):
+            try:
+                if not self.started:
+                    self._begin()
+                self._advance()
+                self.result = self._finish()
+            finally:
+                self._close_event_log()
+                if self._package_chunks is not None:
+                    self._package_chunks.close()
+        return self.result
+
+    def advance_to(self, time):
+        """Run the simulation up to the given time (a datetime or a clock time
+        like "11:00 AM") -- every change and event before it is processed, and
+        none at or after it. From there the run can be checkpointed or forked,
+        and finished with run().
+        """
+
+        with phase(self.stats, "simulate"):
+            if not self.started:
+                self._begin()
+            self._advance(until=self._change_time(time))
+
+    def checkpoint(self):
+        """Return a SimulationCheckpoint of the run's current state. It holds
+        copies, not coroutines, so it can be restored any number of times and
+        pickled.
+        """
+
+        # the unread part of a streamed manifest would have to be copied too
+        if self._package_chunks is not None:
+            raise ValueError("A streamed run cannot be checkpointed")
+
+        # the event log file is not part of the state
+        log, self.history.log = self.history.log, None
+        try:
+            return SimulationCheckpoint(
+                started=self.started,
+                clock=self.clock,
+                total_distance=self.total_distance,
+                truck_miles=dict(self.truck_miles),
+                events=list(self.events),
+                route_changes=list(self.route_changes),
+                next_sequence=next(self._event_sequence),
+                trucks={truck_id: truck.save_state() for truck_id, truck in self.trucks.items()},
+                packages=copy.deepcopy(self.packages),
+                package_load_order=list(self.package_load_order),
+                trip_number=self.trip_number,
+                trip_departures=dict(self.trip_departures),
+                trip_reports=list(self.trip_reports),
+                event_log=list(self.event_log),
+                history=copy.deepcopy(self.history),
             )
-        )
+        finally:
+            self.history.log = log
+
+    def restore(self, checkpoint):
+        """Put the simulation back in a checkpointed state. Trucks out on a
+        delivery get their deliver_packages() coroutines rebuilt from the
+        saved state.
+        """
+
+        self.started = checkpoint.started
+        self.clock = checkpoint.clock
+        self.total_distance = checkpoint.total_distance
+        self.truck_miles = dict(checkpoint.truck_miles)
+        self.events = list(checkpoint.events)
+        self.route_changes = list(checkpoint.route_changes)
+        self._event_sequence = itertools.count(checkpoint.next_sequence)
+        self.packages = copy.deepcopy(checkpoint.packages)
+        self.package_load_order = list(checkpoint.package_load_order)
+        self.trip_number = checkpoint.trip_number
+        self.trip_departures = dict(checkpoint.trip_departures)
+        self.trip_reports = list(checkpoint.trip_reports)
+        self.event_log = list(checkpoint.event_log)
+        self.history = copy.deepcopy(checkpoint.history)
+
+        self.active_deliveries = {}
+        for truck_id, state in checkpoint.trucks.items():
+            truck = self.trucks[truck_id]
+            truck.restore_state(state)
+            truck.status_history = self.history
+            if truck.delivery_phase is not None:
+                delivery = truck.deliver_packages(self.packages, resume=True)
+                next(delivery)
+                self.active_deliveries[truck_id] = delivery
+
+    def fork(self, checkpoint=None):
+        """Return a new Simulation that continues from a checkpoint (by
+        default, from here) independently of this one -- i.e. to try a
+        what-if change on the rest of the day. The fork shares the distance
+        matrix and route cache, and does not profile or write an event log.
+        """
+
+        if checkpoint is None:
+            checkpoint = self.checkpoint()
+
+        branch = copy.copy(self)
+        branch.trucks = {truck_id: copy.copy(truck) for truck_id, truck in self.trucks.items()}
+        branch.stats = None
+        branch.event_log_path = None
+        branch.event_writer = None
+        branch.result = None
+        for truck in branch.trucks.values():
+            truck.stats = None
+        branch.restore(checkpoint)
+        branch.packages.table.stats = None
+        return branch
+
+    def _log_event(self, event):
+        """Add a processed event to the event log, and the event log file. A
+        streamed run with a result sink only writes the file.
+        """
+
+        if self.result_sink is None:
+            self.event_log.append(event)
+        if self.event_writer is not None:
+            self.event_writer.write_event(event)
+
+    def _close_event_log(self):
+
+        if self.event_writer is not None:
+            self.event_writer.close()
+            self.event_writer = self.history.log = None
+
+    def _begin(self):
+        """Start the day -- every package at the hub and each truck's first
+        delivery under way.
+        """
+
+        # the simulation clock counts whole seconds since midnight; datetimes
+        #   are only used for the results
+        start_time = self._to_seconds(self.simulation_start_time)
+        self.started = True
+        self.clock = start_time
+        self.total_distance = 0
+        self.truck_miles = {truck_id: 0 for truck_id in self.trucks}
 
-        # queue up the first event in each of our active delivery coroutines
-        for delivery_proc in active_deliveries:
-            self.events.put(next(delivery_proc))
+        if self.event_log_path is not None:
+            self.event_writer = self.history.log = EventLogWriter(self.event_log_path)
+            self.event_writer.write_header(self)
 
-        # simulation event loop -- processes events queued up in our events priority queue
-        total_distance_traveled = 0
-        simulation_time = start_time
-        while simulation_time < self.simulation_end_time:
+        # every package starts the day at the hub
+        for package in self.packages.values():
+            self.history.record(package.id, start_time, AT_HUB, address=package.address)
+        if self._package_chunks is not None:
+            self._read_ahead()
 
-            # no more events; simulation finished before EOD (5:00 PM)
-            if self.events.empty():
+        # prepare a new delivery for each truck in the fleet; trucks after the
+        #   first may leave later (see departure_offsets)
+        for truck in self.trucks.values():
+            self._start_delivery(truck, start_time + self.departure_offsets.get(truck.id, 0) * 60)
+
+    def _advance(self, until=None):
+        """Process queued changes and events in time order until the end time
+        (or the last event), stopping early before the first one at or after
+        until (seconds since midnight), if given.
+        """
+
+        end_time = None
+        if self.simulation_end_time is not None:
+            end_time = self._to_seconds(self.simulation_end_time)
+
+        # simulation event loop -- processes events queued up in our events heap
+        while end_time is None or self.clock < end_time:
+
+            # changes to the plan are applied before events due at the same time
+            change_first = self.route_changes and (
+                not self.events or self.route_changes[0][0] <= self.events[0][0])
+
+            # no more events; simulation finished before the end time
+            if not change_first and not self.events:
                 break
 
-            # pop an event from our events priority queue to be processed
-            current_event = self.events.get()
-            
+            # stop at a checkpoint boundary
+            if until is not None and (self.route_changes if change_first else self.events)[0][0] >= until:
+                break
+
+            # apply the changes to the plan which are due before the next event
+            if change_first:
+                change_time, _, change = heapq.heappop(self.route_changes)
+                if end_time is not None and change_time >= end_time:
+                    break
+                self.clock = max(self.clock, change_time)
+                self._log_event(self._apply_change(change, self.clock))
+                continue
+
+            # pop the earliest event from our events heap to be processed
+            _, _, current_event = heapq.heappop(self.events)
+            if self.stats is not None:
+                self.stats.counters["events_popped"] += 1
+
             # add the distance traveled in this event to our running total
-            simulation_time, truck_id, distance, previous_action = current_event
-            total_distance_traveled += distance
+            self.clock, truck_id, distance, previous_action, _ = current_event
+            self.total_distance += distance
+            self.truck_miles[truck_id] += distance
+            self._log_event(current_event)
 
-            # determine which truck this delivery event belongs to
-            if truck_id == 1:
-                active_truck = self.truck1
-                active_delivery = active_deliveries[0]
-            elif truck_id == 2:
-                active_truck = self.truck2
-                active_delivery = active_deliveries[1]
+            # the truck and delivery coroutine this event belongs to
+            active_truck = self.trucks[truck_id]
+
+            # a streamed run hands off the trip's packages, and reads on in
+            #   the manifest once few enough are waiting at the hub
+            if previous_action == "Returned to the HUB" and self._package_chunks is not None:
+                self._release_packages(truck_id)
+                self._refill()
 
             # if a truck has returned to the HUB and there are still packages
             #   which need to be delivered, load up the packages and start a
             #   new delivery
             if (previous_action == "Returned to the HUB"
                 and not len(active_truck.packages)
-                and len(self.package_load_order)):
-
-                # prepare a new delivery with our active truck
-                self.prep_delivery(active_truck)
-
-                # create a new active delivery coroutine
-                new_delivery = active_truck.deliver_packages(
-                    self.packages,
-                    start_time=simulation_time,
-                )
-
-                if truck_id == 1:
-                    delivery_index = 0
-                elif truck_id == 2:
-                    delivery_index = 1
-
-                # queue up the new delivery coroutine's first event
-                active_deliveries[delivery_index] = new_delivery
-                self.events.put(next(new_delivery))
+                and len(self.package_load_order)
+                and self._start_delivery(active_truck, self.clock)):
+                continue
 
             # try to get a new event from our active delivery and queue it up
             # also, send the current simulation time to the delivery coroutine
             try:
-                next_event = active_delivery.send(simulation_time)
+                next_event = self.active_deliveries[truck_id].send(self.clock)
             except StopIteration:
-                pass
+                # the truck is back at the hub with no trips left
+                del self.active_deliveries[truck_id]
             else:
-                self.events.put(next_event)
+                self._push_event(next_event)
+
+    def _finish(self):
+        """End the day and return the run's SimulationResult."""
 
-        # print the total milage traveled by all trucks
-        end_time = max([simulation_time, self.simulation_end_time]).strftime("%I:%M %p")
+        # the day ends at the requested end time, or when the last event is processed
+        end_time = self.clock
+        if self.simulation_end_time is not None:
+            end_time = max(end_time, self._to_seconds(self.simulation_end_time))
+        if self.event_writer is not None:
+            self.event_writer.write_end(end_time, self.total_distance)
 
-        print("Simulation ended at:", end_time)
-        print(f"Distance travelled: {total_distance_traveled:.2f} mi")
+        # times are converted to datetimes only here, for the results
+        return SimulationResult(
+            start_time=self.simulation_start_time,
+            end_time=self._to_datetime(end_time),
+            total_distance=self.total_distance,
+            truck_miles=dict(self.truck_miles),
+            packages={
+                package.id: self._package_result(package)
+                for package in sorted(self.packages.values(), key=lambda pkg: pkg.id)
+            },
+            events=[event._replace(time=self._to_datetime(event.time)) for event in self.event_log],
+            trip_reports=self.trip_reports,
+            stats=self.stats,
+        )
 
-        # print the status of all packages
-        print("\nAll packages:")
-        self.packages.print_all()
+    def print_report(self):
+        """Print the results of the last run to the console."""
 
+        with phase(self.stats, "report"):
+            # print the total milage traveled by all trucks
+            print("Simulation ended at:", self.result.end_time.strftime("%I:%M %p"))
+            print(f"Distance travelled: {self.result.total_distance:.2f} mi")
+
+            # print the miles saved on each trip by the route improvement pass
+            if self.improve_routes and self.result_sink is None:
+                self.print_trip_reports()
+
+            # print the status of all packages
+            print("\nAll packages:")
+            self.packages.print_all()
+
+
+def parse_args(argv=None):
+    """Parse the command line arguments."""
+
+    parser = argparse.ArgumentParser(description="WGUPS package delivery simulation")
+    parser.add_argument("--packages", default=os.path.join(DATA_DIR, "packages.csv"),
+                        help="package file (CSV)")
+    parser.add_argument("--distances", default=os.path.join(DATA_DIR, "distances.csv"),
+                        help="distance table (CSV)")
+    parser.add_argument("--address-corrections", metavar="FILE",
+                        help="address corrections known ahead of time (CSV: Package ID, Known At, Address); "
+                             "by default the sample corrections are used with the sample package file only")
+    parser.add_argument("--no-address-corrections", action="store_true",
+                        help="do not apply any address corrections")
+    parser.add_argument("--road-graph", metavar="EDGES",
+                        help="use a road network edge list (CSV: from,to,distance) instead of the "
+                             "distance table; distances are found with Dijkstra's algorithm as needed")
+    parser.add_argument("--road-graph-cache", type=float, default=DEFAULT_CACHE_BYTES / 2**20, metavar="MB",
+                        help="memory limit of the road graph's cached shortest path rows "
+                             "(default: %(default)g MB)")
+    parser.add_argument("--stream", type=int, metavar="N",
+                        help="read the package file N packages at a time, planning each chunk with the "
+                             "trips not yet under way, and print each package as its truck gets back "
+                             "instead of keeping it (for very large files). Trips are only planned "
+                             "from the packages read so far, so the smaller N is, the further the "
+                             "trucks drive and the later the day ends: on a 20,000-package, "
+                             "300-address day, N=5000 drove 13%% more miles than an unstreamed run, "
+                             "N=2000 71%% more and N=500 160%% more")
+    parser.add_argument("--start-time", default="8:00 AM",
+                        help="time the day starts, like 8:00 AM")
+    parser.add_argument("--end-time",
+                        help="time the simulation stops, like 10:35 AM; prompts when omitted "
+                             "in interactive use, otherwise runs until every package is delivered")
+    parser.add_argument("--planner", default="nearest_neighbor",
+                        help="route planner: nearest_neighbor, candidate_nearest_neighbor, "
+                             "vectorized or held_karp")
+    parser.add_argument("--improve-routes", action="store_true",
+                        help="improve each route with 2-opt / Or-opt local search")
+    parser.add_argument("--improvement-time-limit", type=float, default=0.05,
+                        help="local search time limit per trip, in seconds")
+    parser.add_argument("--improvement-candidates", type=int, metavar="K",
+                        help="only try local search moves towards each address's K nearest neighbors")
+    parser.add_argument("--status-at", action="append", default=[], metavar="TIME",
+                        help="also show the status of every package at this time, like 10:15 AM; "
+                             "may be given more than once")
+    parser.add_argument("--trucks", type=int, default=2, metavar="N",
+                        help="number of trucks in service (default: %(default)s)")
+    parser.add_argument("--hash-table", default="chaining", choices=sorted(HASH_TABLES),
+                        help="package table implementation")
+    parser.add_argument("--distance-cache", action="store_true",
+                        help="memory-map the distance table from a compiled cache next to the CSV, "
+                             "which is written on the first run and rebuilt when the CSV changes")
+    parser.add_argument("--route-cache", metavar="FILE",
+                        help="reuse routes planned by earlier runs on the same distance table, "
+                             "kept in this file (created when missing)")
+    parser.add_argument("--route-cache-size", type=float, default=DEFAULT_MAX_BYTES / 2**20, metavar="MB",
+                        help="memory limit of the route cache (default: %(default)g MB)")
+    parser.add_argument("--event-log", metavar="FILE",
+                        help="stream every event and package status change to this file "
+                             "(JSON Lines); read it back with replay.py")
+    parser.add_argument("--on-time-trials", type=int, default=0, metavar="N",
+                        help="estimate each package's on-time probability over N trials "
+                             "with random travel and service times (needs numpy)")
+    parser.add_argument("--speed-sd", type=float, default=3.0, metavar="MPH",
+                        help="standard deviation of a truck's speed on each leg (default: %(default)g)")
+    parser.add_argument("--service-time", type=float, default=1.0, metavar="MIN",
+                        help="mean time spent at each stop, in minutes (default: %(default)g)")
+    parser.add_argument("--profile", action="store_true",
+                        help="record phase times and hot path counters and print them to stderr "
+                             "(or include them in the --json output)")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="write a cProfile dump of the run to this file (read it with pstats)")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON instead of the package table")
+
+    return parser.parse_args(argv)
 
-# !---------------------------------------------------------------------------
-if __name__ == "__main__":
 
-    # ascii art from https://ascii-generator.site/t/
-    # font: "slant"
-    title = """
+def main(argv=None):
+    """Run the simulation from the command line."""
+
+    args = parse_args(argv)
+    interactive = not args.json and args.end_time is None and sys.stdin.isatty()
+
+    # a streamed run does not keep the packages it is done with, so there is
+    #   no history to query or driven day to replay afterwards
+    result_sink = None
+    if args.stream:
+        if args.status_at or args.on_time_trials:
+            sys.exit("--status-at and --on-time-trials cannot be used with --stream")
+        if args.json:
+            result_sink = lambda package: print(json.dumps(package_to_dict(package)))
+        else:
+            result_sink = lambda package: print(format_package(package))
+
+    if interactive:
+        print(TITLE)
+
+    # a cProfile of the whole run, for a closer look with pstats
+    profiler = None
+    if args.profile_output:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    # a road network replaces the distance table, see lib/road_graph.py
+    distance_matrix = route_cache = None
+    if args.road_graph:
+        distance_matrix = RoadGraph.from_csv(args.road_graph, cache_bytes=int(args.road_graph_cache * 2**20))
+
+    # the route cache file only holds routes for the distance table it was saved with
+    if args.route_cache:
+        if distance_matrix is None:
+            distance_matrix = DistanceMatrix.from_csv(args.distances, cache=args.distance_cache)
+        route_cache = RouteCache.load(
+            args.route_cache, max_bytes=int(args.route_cache_size * 2**20),
+            fingerprint=matrix_fingerprint(distance_matrix),
+        )
+
+    # None picks the corrections which go with the package file
+    address_corrections = None
+    if args.no_address_corrections:
+        address_corrections = {}
+    elif args.address_corrections:
+        address_corrections = Simulation.read_address_corrections(args.address_corrections)
+
+    try:
+        program = Simulation(
+            distance_matrix=distance_matrix,
+            distances_path=args.distances,
+            packages_path=args.packages,
+            address_corrections=address_corrections,
+            planner=args.planner,
+            improve_routes=args.improve_routes,
+            improvement_time_limit=args.improvement_time_limit,
+            improvement_candidates=args.improvement_candidates,
+            start_time=args.start_time,
+            end_time=args.end_time,
+            hash_table=args.hash_table,
+            fleet_size=args.trucks,
+            profile=args.profile,
+            distance_cache=args.distance_cache,
+            route_cache=route_cache,
+            event_log_path=args.event_log,
+            chunk_size=args.stream,
+            result_sink=result_sink,
+        )
+    except ValueError as e:
+        # i.e. a package with a wrong address and no correction
+        sys.exit(f"main: {e}")
+
+    # ask for the stop time when a person is running the program
+    if interactive:
+        program.simulation_end_time = program._prompt_for_end_time()
+
+    if args.stream and not args.json:
+        print("Delivered packages:")
+    result = program.run()
+    if route_cache is not None:
+        route_cache.save(args.route_cache)
+
+    # replay the driven routes with random travel times, see lib/monte_carlo.py
+    odds = None
+    if args.on_time_trials:
+        from lib.monte_carlo import print_on_time_report, simulate_on_time
+        with phase(program.stats, "monte_carlo"):
+            odds = simulate_on_time(
+                program, trials=args.on_time_trials, speed_sd=args.speed_sd,
+                service_minutes=args.service_time,
+            )
+
+    if args.json:
+        with phase(program.stats, "report"):
+            output = result_to_dict(result)
+            output["snapshots"] = {
+                time: snapshot_to_dict(program.history.snapshot(time)) for time in args.status_at
+            }
+        if odds is not None:
+            output["on_time"] = [
+                {
+                    "package_id": package_odds.package_id,
+                    "probability": package_odds.on_time_probability,
+                    "arrival_percentiles": {
+                        f"p{percentile}": program._to_datetime(round(seconds)).isoformat(timespec="seconds")
+                        for percentile, seconds in package_odds.arrival_percentiles.items()
+                    },
+                }
+                for package_odds in odds.values()
+            ]
+        if program.stats is not None:
+            output["stats"] = program.stats.as_dict()
+
+        # streamed packages were printed as JSON lines -- the summary is one more
+        json.dump(output, sys.stdout, indent=None if args.stream else 2)
+        print()
+    else:
+        program.print_report()
+
+        if odds is not None:
+            print_on_time_report(odds)
+
+        # answer each "status at" query from the recorded history
+        for time in args.status_at:
+            print(f"\nPackage status at {time}:")
+            program.history.print_snapshot(time)
+
+        # the profile goes to stderr so the report can still be redirected on its own
+        if program.stats is not None:
+            program.stats.print_report(file=sys.stderr)
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile_output)
+
+
+# ascii art from https://ascii-generator.site/t/
+# font: "slant"
+TITLE = r"""
  _       __   ______   __  __    ____    _____
 | |     / /  / ____/  / / / /   / __ \  / ___/
 | | /| / /  / / __   / / / /   / /_/ /  \__ \ 
@@ -275,20 +1248,18 @@ if __name__ == "__main__":
                                               
     """
 
-    print(title)
 
-    program = Simulation(
-        distances_path="./data/distances.csv",
-        packages_path="./data/packages.csv",
-    )
+# !---------------------------------------------------------------------------
+if __name__ == "__main__":
 
-    program.run()
+    main()
 
     # program flow:
     #   Simulation-related data is loaded/initialized
     #   Each of the two trucks are prepped to make a delivery
     #     (packages loaded onto truck, route plotted, etc.)
-    #   First events from each delivery added to an "events" priority queue
+    #   First events from each delivery added to an "events" heap
     #   Events are consumed and processed in an event loop
     #     (each event may add a subsequent event to the event loop, continuing the simulation)
-    #   End-of-simulation data is printed (package statuses, miles traveled)
+    #   End-of-simulation data is printed (package statuses, miles traveled),
+    #     or written as JSON with --json
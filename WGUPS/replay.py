@@ -0,0 +1,85 @@
+"""Replay a simulation run from its event log (see lib/event_log.py), without
+planning or simulating the day again. Shows the end-of-day summary, each
+truck's miles and every package's final state, and optionally a truck's
+timeline and the status of every package at given times.
+
+    python main.py --event-log day.jsonl --end-time "5:00 PM"
+    python replay.py day.jsonl --timeline 1 --status-at "10:15 AM"
+"""
+
+
+import argparse
+import json
+import sys
+
+from lib.event_log import replay, timelines
+from lib.results import format_package, result_to_dict, snapshot_to_dict
+
+
+def print_summary(replayed):
+    """Print the end-of-day summary and every package's final state."""
+
+    result = replayed.result
+    print("Simulation ended at:", result.end_time.strftime("%I:%M %p"))
+    if not replayed.complete:
+        print("(the log ends before the run did)")
+    print(f"Distance travelled: {result.total_distance:.2f} mi")
+    for truck_id, miles in sorted(result.truck_miles.items()):
+        print(f"    Truck {truck_id}: {miles:.2f} mi")
+
+    print("\nAll packages:")
+    for package in result.packages.values():
+        print(format_package(package))
+
+
+def print_timeline(result, truck_id):
+    """Print every event of one truck, in order."""
+
+    print(f"\nTruck {truck_id} timeline:")
+    for event in timelines(result).get(truck_id, []):
+        print(f"    {event.time.strftime('%I:%M:%S %p')} {event.dist_travelled:>6.1f} mi  {event.action}")
+
+
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Replay a WGUPS simulation run from its event log.")
+    parser.add_argument("log", help="event log written by main.py --event-log")
+    parser.add_argument("--timeline", type=int, action="append", default=[], metavar="TRUCK",
+                        help="also show this truck's events; may be given more than once")
+    parser.add_argument("--status-at", action="append", default=[], metavar="TIME",
+                        help="also show the status of every package at this time, like 10:15 AM; "
+                             "may be given more than once")
+    parser.add_argument("--json", action="store_true",
+                        help="print the replayed results as JSON, with the --status-at snapshots")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Replay an event log from the command line."""
+
+    args = parse_args(argv)
+    try:
+        replayed = replay(args.log)
+    except (OSError, ValueError) as e:
+        sys.exit(f"replay: {e}")
+
+    if args.json:
+        output = result_to_dict(replayed.result)
+        output["complete"] = replayed.complete
+        output["snapshots"] = {
+            time: snapshot_to_dict(replayed.history.snapshot(time)) for time in args.status_at
+        }
+        json.dump(output, sys.stdout, indent=2)
+        print()
+        return
+
+    print_summary(replayed)
+    for truck_id in args.timeline:
+        print_timeline(replayed.result, truck_id)
+    for time in args.status_at:
+        print(f"\nPackage status at {time}:")
+        replayed.history.print_snapshot(time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Scenario sweep runner. Runs many what-if configurations of the simulation
+(truck speed, capacity, fleet size, departure offsets and load orders) over a
+process pool and prints one comparison table as the results come back.
+
+The distance matrix and the package data are parsed once and placed in
+shared memory; each worker process attaches to them a single time when it
+starts, so a scenario task only carries its own few settings. Workers read
+the matrix in place, and read the package rows out of their block for each
+scenario rather than keeping a copy of their own. With a route cache, each
+worker also keeps the routes it has planned for the scenarios that follow
+(see lib/route_cache.py).
+
+    python sweep.py --speeds 15,18,25 --capacities 12,16 --fleet-sizes 2,3
+"""
+
+
+import argparse
+import collections
+import itertools
+import os
+import pickle
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from lib.distance_matrix import DistanceMatrix
+from lib.clock import format_seconds
+from lib.route_cache import RouteCache
+from main import DATA_DIR, Simulation
+
+
+# a what-if configuration -- None keeps the simulation's default
+# departure_offsets: {truck id: minutes after the start time}
+# load_order: a list of (truck id, departure minute, package ids) trips
+Scenario = collections.namedtuple(
+    "Scenario", "name speed capacity fleet_size departure_offsets load_order",
+    defaults=(None, None, None, None, None),
+)
+
+# one row of the comparison table -- finish_time in seconds since midnight;
+#   error is set (and the rest empty) when the scenario could not be run
+ScenarioResult = collections.namedtuple(
+    "ScenarioResult", "name total_distance truck_miles delivered late_packages finish_time error",
+    defaults=(None,),
+)
+
+
+class SharedInputs:
+    """The parsed distance matrix and package data, held in shared memory.
+    Use as a context manager; the shared blocks are freed on exit.
+    """
+
+    def __init__(self, packages_path, distances_path, distance_cache=False):
+
+        distance_matrix = DistanceMatrix.from_csv(distances_path, cache=distance_cache)
+        array = distance_matrix.as_array()
+
+        # the matrix as a flat block of float64s
+        self.matrix_block = SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared_array = np.ndarray(array.shape, dtype=np.float64, buffer=self.matrix_block.buf)
+        shared_array[:] = array
+        self.shape = array.shape
+
+        # the package rows are pickled once into a block; the address names
+        #   are few and go to each worker as they are
+        self.addresses = distance_matrix.addresses
+        data = pickle.dumps(Simulation.read_package_rows(packages_path))
+        self.data_block = SharedMemory(create=True, size=len(data))
+        self.data_block.buf[:len(data)] = data
+        self.data_size = len(data)
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+    def worker_arguments(self):
+        """Everything a worker needs to attach to the shared blocks."""
+
+        return (self.matrix_block.name, self.shape, self.addresses, self.data_block.name, self.data_size)
+
+    def close(self):
+
+        for block in (self.matrix_block, self.data_block):
+            block.close()
+            block.unlink()
+
+
+# per-process state, set up once by _attach_worker()
+_worker = {}
+
+
+def _attach_worker(matrix_name, shape, addresses, data_name, data_size, simulation_options,
+                   route_cache_bytes=None):
+    """Pool initializer -- attach to the shared inputs once per worker process."""
+
+    matrix_block = SharedMemory(name=matrix_name)
+    data_block = SharedMemory(name=data_name)
+
+    array = np.ndarray(shape, dtype=np.float64, buffer=matrix_block.buf)
+
+    # keep the blocks referenced for as long as the worker lives
+    _worker.update(
+        blocks=(matrix_block, data_block),
+        distance_matrix=DistanceMatrix.from_array(addresses, array),
+        package_data=data_block.buf[:data_size],
+        simulation_options=simulation_options,
+        route_cache=None if route_cache_bytes is None else RouteCache(max_bytes=route_cache_bytes),
+    )
+
+
+def run_scenario(scenario):
+    """Run one scenario in a worker and summarize it as a ScenarioResult."""
+
+    options = dict(_worker["simulation_options"])
+    options.update(
+        distance_matrix=_worker["distance_matrix"],
+        package_rows=pickle.loads(_worker["package_data"]),
+        route_cache=_worker["route_cache"],
+        truck_speed=scenario.speed,
+        truck_capacity=scenario.capacity,
+        departure_offsets=scenario.departure_offsets,
+        load_order=scenario.load_order,
+    )
+    if scenario.fleet_size is not None:
+        options["fleet_size"] = scenario.fleet_size
+
+    try:
+        simulation = Simulation(**options)
+        result = simulation.run()
+    except ValueError as e:
+        # i.e. the load planner cannot fit a group of packages on a truck
+        return ScenarioResult(scenario.name, None, {}, 0, [], None, error=str(e))
+
+    # a package is late if it was not delivered by its deadline (or at all)
+    late_packages = []
+    delivered = 0
+    for package in simulation.packages.values():
+        if package.delivery_time is None:
+            late_packages.append(package.id)
+            continue
+        delivered += 1
+        if package.deadline is not None and package.delivery_time > package.deadline * 60:
+            late_packages.append(package.id)
+
+    finish_time = max((event.time for event in simulation.event_log), default=None)
+
+    return ScenarioResult(
+        scenario.name,
+        result.total_distance,
+        result.truck_miles,
+        delivered,
+        sorted(late_packages),
+        finish_time,
+    )
+
+
+def run_sweep(scenarios, packages_path, distances_path, workers=None, route_cache_bytes=None,
+              distance_cache=False, **simulation_options):
+    """Run every scenario over a process pool. Yield ScenarioResults as they
+    finish, which is not necessarily the order the scenarios were given.
+    With route_cache_bytes, each worker caches planned routes up to that many
+    bytes. With distance_cache, the distance table is read through its
+    compiled cache (see lib/matrix_cache.py). Extra keyword options are
+    passed to every Simulation.
+    """
+
+    # package rows reach the workers without their file name -- the
+    #   corrections which go with the file are passed along instead
+    simulation_options.setdefault("address_corrections", Simulation.address_corrections_for(packages_path))
+
+    with SharedInputs(packages_path, distances_path, distance_cache) as inputs:
+        initargs = inputs.worker_arguments() + (simulation_options, route_cache_bytes)
+        with Pool(workers, initializer=_attach_worker, initargs=initargs) as pool:
+            yield from pool.imap_unordered(run_scenario, scenarios)
+
+
+def scenario_grid(speeds=(None,), capacities=(None,), fleet_sizes=(None,), departure_offsets=(None,)):
+    """Return a Scenario for every combination of the given settings."""
+
+    scenarios = []
+    for speed, capacity, fleet_size, offsets in itertools.product(
+            speeds, capacities, fleet_sizes, departure_offsets):
+        name = " ".join(
+            f"{label}={value}"
+            for label, value in (("speed", speed), ("cap", capacity), ("trucks", fleet_size),
+                                 ("offsets", offsets))
+            if value is not None
+        ) or "default"
+        scenarios.append(Scenario(name, speed, capacity, fleet_size, offsets))
+
+    return scenarios
+
+
+def print_comparison(results):
+    """Print a comparison table row for each result as it arrives. Return
+    the results, sorted by total distance.
+    """
+
+    # print header row
+    print()
+    print(f"{'SCENARIO':<45} {'MILES':>8} {'DELIVERED':>10} {'LATE':>5} {'FINISHED':>9}  TRUCK MILES")
+    print("=" * 105)
+
+    collected = []
+    for result in results:
+        collected.append(result)
+        if result.error is not None:
+            print(f"{result.name:<45} {'failed':>8}  {result.error}")
+            continue
+
+        truck_miles = ", ".join(f"{truck_id}: {miles:.1f}" for truck_id, miles in result.truck_miles.items())
+        finished = "N/A" if result.finish_time is None else format_seconds(result.finish_time)
+        print(f"{result.name:<45} {result.total_distance:>8.2f} {result.delivered:>10} "
+              f"{len(result.late_packages):>5} {finished:>9}  {truck_miles}")
+
+    return sorted(collected, key=lambda result: (result.error is not None, result.total_distance or 0))
+
+
+def _parse_list(text, convert):
+
+    return [convert(value) for value in text.split(",") if value.strip()]
+
+
+def _parse_offsets(text):
+    """Parse departure offsets like "2:26" or "2:26/3:60" (truck:minutes)."""
+
+    offsets = {}
+    for entry in text.split("/"):
+        truck_id, minutes = entry.split(":")
+        offsets[int(truck_id)] = int(minutes)
+    return offsets
+
+
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Compare simulation scenarios in parallel.")
+    parser.add_argument("--packages", default=os.path.join(DATA_DIR, "packages.csv"),
+                        help="packages CSV file")
+    parser.add_argument("--distances", default=os.path.join(DATA_DIR, "distances.csv"),
+                        help="distance table CSV file")
+    parser.add_argument("--speeds", type=lambda text: _parse_list(text, float), default=[None],
+                        help="comma separated truck speeds (mph)")
+    parser.add_argument("--capacities", type=lambda text: _parse_list(text, int), default=[None],
+                        help="comma separated truck capacities")
+    parser.add_argument("--fleet-sizes", type=lambda text: _parse_list(text, int), default=[None],
+                        help="comma separated numbers of trucks")
+    parser.add_argument("--departure-offsets", type=_parse_offsets, action="append", metavar="TRUCK:MIN[/...]",
+                        help="departure offsets to try, i.e. 2:26 (repeatable)")
+    parser.add_argument("--planner", default="nearest_neighbor",
+                        help="route planner used by every scenario")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--route-cache-size", type=float, default=None, metavar="MB",
+                        help="cache planned routes in each worker, up to this many MB")
+    parser.add_argument("--distance-cache", action="store_true",
+                        help="read the distance table through a compiled cache next to the CSV "
+                             "(see main.py --distance-cache)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run a scenario sweep from the command line."""
+
+    args = parse_args(argv)
+    scenarios = scenario_grid(
+        speeds=args.speeds,
+        capacities=args.capacities,
+        fleet_sizes=args.fleet_sizes,
+        departure_offsets=args.departure_offsets or [None],
+    )
+
+    results = run_sweep(
+        scenarios, args.packages, args.distances,
+        workers=args.workers, planner=args.planner, end_time=None,
+        route_cache_bytes=None if args.route_cache_size is None else int(args.route_cache_size * 2**20),
+        distance_cache=args.distance_cache,
+    )
+    ranked = print_comparison(results)
+
+    if ranked and ranked[0].error is None:
+        print(f"\nShortest: {ranked[0].name} ({ranked[0].total_distance:.2f} mi)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Shared fixtures for the WGUPS test suite. The tests import the program the
+way its scripts do (from lib..., from main import ...), so the WGUPS
+directory goes on the import path; synthetic workloads come from
+lib/workload.py.
+"""
+
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+WGUPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, WGUPS_DIR)
+
+from lib.workload import generate  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def workload(tmp_path_factory):
+    """A generated manifest -- 30 addresses, 200 packages. Return the paths of
+    the (packages, distances) files.
+    """
+
+    return generate(str(tmp_path_factory.mktemp("workload")), 30, 200, seed=1)
+
+
+@pytest.fixture(scope="session")
+def road_workload(tmp_path_factory):
+    """A generated manifest on a sparse road graph. Return the paths of the
+    (packages, roads) files.
+    """
+
+    return generate(str(tmp_path_factory.mktemp("road_workload")), 60, 200, seed=1, road_graph=True)
+
+
+@pytest.fixture
+def run_script():
+    """Return a function which runs one of the WGUPS scripts with the given
+    arguments, from the WGUPS directory and with no terminal attached, and
+    returns its standard output.
+    """
+
+    def run(script, *args):
+        completed = subprocess.run(
+            [sys.executable, script, *args], cwd=WGUPS_DIR, stdin=subprocess.DEVNULL,
+            capture_output=True, text=True, timeout=300,
+        )
+        assert completed.returncode == 0, completed.stderr
+        return completed.stdout
+
+    return run
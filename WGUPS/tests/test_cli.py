@@ -0,0 +1,109 @@
+"""End-to-end runs of the command line scripts on the bundled day and on
+generated manifests.
+"""
+
+
+import json
+import os
+import shutil
+
+from main import DATA_DIR
+
+
+def _delivered(packages):
+
+    return [package for package in packages if package["status"] == "DELIVERED"]
+
+
+def test_sample_day(run_script):
+
+    output = json.loads(run_script("main.py", "--json"))
+
+    assert output["total_distance"] == 122.6
+    assert len(_delivered(output["packages"])) == 40
+
+
+def test_generated_manifest(run_script, workload):
+
+    packages_path, distances_path = workload
+    output = json.loads(run_script("main.py", "--packages", packages_path, "--distances", distances_path, "--json"))
+
+    assert len(output["packages"]) == 200
+    assert len(_delivered(output["packages"])) == 200
+    assert output["total_distance"] == round(sum(output["truck_miles"].values()), 2)
+
+
+def test_generated_road_graph(run_script, road_workload):
+
+    packages_path, roads_path = road_workload
+    output = json.loads(run_script("main.py", "--packages", packages_path, "--road-graph", roads_path, "--json"))
+
+    assert len(_delivered(output["packages"])) == 200
+
+
+def test_streamed_manifest(run_script, workload):
+
+    packages_path, distances_path = workload
+    lines = run_script("main.py", "--packages", packages_path, "--distances", distances_path,
+                       "--stream", "50", "--json").splitlines()
+
+    # one line per package as its truck gets back, then the result
+    packages, result = [json.loads(line) for line in lines[:-1]], json.loads(lines[-1])
+    assert sorted(package["package_id"] for package in _delivered(packages)) == list(range(1, 201))
+    assert result["packages"] == []
+
+
+def test_distance_cache_is_opt_in(run_script, tmp_path):
+
+    distances_path = str(tmp_path / "distances.csv")
+    shutil.copy(os.path.join(DATA_DIR, "distances.csv"), distances_path)
+    arguments = ("--packages", os.path.join(DATA_DIR, "packages.csv"), "--distances", distances_path, "--json")
+
+    uncached = run_script("main.py", *arguments)
+    assert os.listdir(tmp_path) == ["distances.csv"]
+
+    assert run_script("main.py", *arguments, "--distance-cache") == uncached
+    assert sorted(os.listdir(tmp_path)) == ["distances.csv", "distances.csv.cache"]
+
+
+def test_route_cache_does_not_change_output(run_script, workload, tmp_path):
+
+    packages_path, distances_path = workload
+    arguments = ("--packages", packages_path, "--distances", distances_path, "--json")
+    uncached = run_script("main.py", *arguments)
+
+    cache_path = str(tmp_path / "routes.json")
+    assert run_script("main.py", *arguments, "--route-cache", cache_path) == uncached
+    assert run_script("main.py", *arguments, "--route-cache", cache_path) == uncached
+
+
+def test_replay_matches_live_run(run_script, workload, tmp_path):
+
+    packages_path, distances_path = workload
+    log_path = str(tmp_path / "day.jsonl")
+    live = json.loads(run_script("main.py", "--packages", packages_path, "--distances", distances_path,
+                                 "--event-log", log_path, "--status-at", "10:00 AM", "--json"))
+    replayed = json.loads(run_script("replay.py", log_path, "--status-at", "10:00 AM", "--json"))
+
+    assert replayed["complete"]
+    for key in ("end_time", "total_distance", "truck_miles", "packages", "events", "snapshots"):
+        assert replayed[key] == live[key], key
+
+
+def test_sweep(run_script, workload):
+
+    packages_path, distances_path = workload
+    output = run_script("sweep.py", "--packages", packages_path, "--distances", distances_path,
+                        "--speeds", "18,25", "--workers", "2")
+
+    assert "speed=18.0" in output and "speed=25.0" in output
+    assert "Shortest:" in output
+
+
+def test_benchmark(run_script, tmp_path):
+
+    output_path = tmp_path / "bench.json"
+    run_script("benchmark.py", "--sizes", "27x40", "--repeat", "1", "--output", str(output_path))
+
+    runs = json.loads(output_path.read_text())["runs"]
+    assert [(run["addresses"], run["packages"]) for run in runs] == [(27, 40)]
@@ -0,0 +1,74 @@
+"""The distance backends agree with each other, and the compiled cache
+follows its CSV.
+"""
+
+
+import os
+import shutil
+import time
+
+import numpy as np
+
+from lib import matrix_cache
+from lib.distance_matrix import DistanceMatrix
+from lib.road_graph import RoadGraph
+from main import DATA_DIR
+
+SAMPLE_DISTANCES = os.path.join(DATA_DIR, "distances.csv")
+
+
+def test_from_array_matches_csv():
+
+    parsed = DistanceMatrix.from_csv(SAMPLE_DISTANCES)
+    array = np.array(parsed.matrix)
+    from_array = DistanceMatrix.from_array(parsed.addresses, array)
+
+    assert [list(row) for row in from_array.matrix] == parsed.matrix
+    assert from_array.as_array() is array
+    assert isinstance(from_array.matrix[3][5], float)
+
+
+def test_cache_matches_csv(tmp_path):
+
+    csv_path = str(tmp_path / "distances.csv")
+    shutil.copy(SAMPLE_DISTANCES, csv_path)
+    parsed = DistanceMatrix.from_csv(csv_path)
+
+    for _ in range(2):  # built, then read back
+        cached = DistanceMatrix.from_csv(csv_path, cache=True)
+        assert cached.addresses == parsed.addresses
+        assert [list(row) for row in cached.matrix] == parsed.matrix
+
+
+def test_touched_csv_is_hashed_once(tmp_path, monkeypatch):
+
+    csv_path = str(tmp_path / "distances.csv")
+    shutil.copy(SAMPLE_DISTANCES, csv_path)
+    DistanceMatrix.from_csv(csv_path, cache=True)
+    later = time.time() + 60
+    os.utime(csv_path, (later, later))
+
+    hashed = []
+    file_hash = matrix_cache._file_hash
+    monkeypatch.setattr(matrix_cache, "_file_hash", lambda path: hashed.append(path) or file_hash(path))
+    DistanceMatrix.from_csv(csv_path, cache=True)
+    DistanceMatrix.from_csv(csv_path, cache=True)
+
+    assert hashed == [csv_path]
+
+
+def test_road_graph_matches_full_table(tmp_path):
+
+    # every pair of addresses joined by a direct road -- shortest paths are
+    #   never longer than the table's distances
+    table = DistanceMatrix.from_csv(SAMPLE_DISTANCES)
+    edges = [
+        (table.addresses[i], table.addresses[j], table.matrix[i][j])
+        for i in range(table.size) for j in range(i)
+    ]
+    graph = RoadGraph(table.addresses, edges)
+
+    for i in range(table.size):
+        row = graph.shortest_paths(i)
+        assert all(row[j] <= table.matrix[i][j] + 1e-9 for j in range(table.size))
+        assert [graph.matrix[i][j] for j in range(table.size)] == list(row)
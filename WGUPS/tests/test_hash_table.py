@@ -0,0 +1,99 @@
+"""Both hash table implementations behave the same through the API the
+package table uses.
+"""
+
+
+import collections
+import copy
+import pickle
+
+import pytest
+
+from lib.hash_table import HASH_TABLES, OpenAddressingHashTable
+from lib.profiling import RunStats
+
+# the tables hold packages -- anything with an id will do
+Item = collections.namedtuple("Item", "id value")
+
+
+@pytest.fixture(params=sorted(HASH_TABLES))
+def table(request):
+
+    return HASH_TABLES[request.param]()
+
+
+def test_insert_and_lookup(table):
+
+    for key in range(1000):
+        table.insert(key, Item(key, key * 2))
+
+    assert all(table.lookup(key).value == key * 2 for key in range(1000))
+    assert table.lookup(1000) is False
+
+
+def test_delete_and_reinsert(table):
+
+    for key in range(300):
+        table.insert(key, Item(key, key))
+    for key in range(0, 300, 3):
+        assert table.delete(key)
+    assert not table.delete(0)
+
+    assert table.lookup(3) is False
+    assert table.lookup(4) == Item(4, 4)
+
+    for key in range(0, 300, 3):
+        table.insert(key, Item(key, -key))
+    assert sorted(table.values()) == [Item(key, -key if key % 3 == 0 else key) for key in range(300)]
+
+
+def test_bulk_insert(table):
+
+    table.bulk_insert((key, Item(key, str(key))) for key in range(500))
+
+    assert sorted(table.values()) == [Item(key, str(key)) for key in range(500)]
+
+
+def test_open_addressing_insert_replaces_existing_key():
+
+    table = OpenAddressingHashTable()
+    table.insert(7, "old")
+    table.insert(7, "new")
+
+    assert table.lookup(7) == "new"
+    assert list(table.items()) == [(7, "new")]
+    assert table.update(7, "newer")
+    assert not table.update(8, "missing")
+    assert table.lookup(7) == "newer"
+
+
+@pytest.mark.parametrize("clone", [copy.deepcopy, lambda table: pickle.loads(pickle.dumps(table))])
+def test_open_addressing_copies_after_delete(clone):
+
+    table = OpenAddressingHashTable()
+    for key in range(100):
+        table.insert(key, key)
+    for key in range(0, 100, 2):
+        table.delete(key)
+
+    copied = clone(table)
+    assert sorted(copied) == list(range(1, 100, 2))
+    assert copied.lookup(0) is False and copied.lookup(99) == 99
+
+    # deleted slots are reused rather than taken for live keys
+    for key in range(0, 100, 2):
+        copied.insert(key, -key)
+    assert len(copied) == 100
+    assert sorted(copied.items()) == [(key, -key if key % 2 == 0 else key) for key in range(100)]
+
+
+def test_open_addressing_spreads_strided_ids():
+
+    # ids sharing their low bits all start probing at one slot -- a few
+    #   probes each to get clear of it, not a run of thousands
+    table = OpenAddressingHashTable()
+    table.bulk_insert((key << 16, key) for key in range(5000))
+    table.stats = RunStats()
+
+    assert all(table.lookup(key << 16) == key for key in range(5000))
+    assert table.stats.counters["hash_probes"] < 8 * table.stats.counters["hash_lookups"]
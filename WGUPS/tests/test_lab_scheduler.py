@@ -0,0 +1,80 @@
+"""The scheduling lab's heap engine (labs/2-7 Improving an Application) gives
+the same statistics and output as its original list engine.
+"""
+
+
+import contextlib
+import importlib.util
+import io
+import os
+import random
+import sys
+
+import pytest
+
+from conftest import WGUPS_DIR
+
+LAB_DIR = os.path.join(os.path.dirname(WGUPS_DIR), "labs", "2-7 Improving an Application")
+
+
+@pytest.fixture(scope="module")
+def lab():
+    """The lab's main.py -- loaded under its own name, since WGUPS has a main
+    module too; it imports simulation.py from the lab directory.
+    """
+
+    sys.path.insert(0, LAB_DIR)
+    try:
+        spec = importlib.util.spec_from_file_location("lab_main", os.path.join(LAB_DIR, "main.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        yield module
+    finally:
+        sys.path.remove(LAB_DIR)
+
+
+def _both_engines(lab, num_processors, processes, scheduler, policy):
+    """Run the list and heap engines from the same random state. Return each
+    one's (statistics, printed output).
+    """
+
+    random.seed(1)
+    printed = io.StringIO()
+    with contextlib.redirect_stdout(printed):
+        expected = lab.simulation(num_processors, list(processes), scheduler)
+
+    random.seed(1)
+    output = io.StringIO()
+    actual = lab.heap_simulation(num_processors, processes, policy(), output=output)
+
+    return (expected, printed.getvalue()), (actual, output.getvalue())
+
+
+@pytest.mark.parametrize("name", ["processes_input1.txt", "processes_input2.txt", "processes_input3.txt"])
+def test_heap_engine_matches_on_the_lab_inputs(lab, name):
+
+    num_processors, processes = lab.load_data(os.path.join(LAB_DIR, "data", name))
+    for _, scheduler, policy in lab.SIMULATIONS:
+        expected, actual = _both_engines(lab, num_processors, processes, scheduler, policy)
+        assert actual == expected
+
+
+def test_heap_engine_matches_on_random_inputs(lab):
+
+    # small runtimes, so heap ties between processes and processors are common
+    rng = random.Random(4)
+    for _ in range(50):
+        num_processors = rng.randint(1, 6)
+        processes = [rng.randint(1, 5) for _ in range(rng.randint(0, 60))]
+        for _, scheduler, policy in lab.SIMULATIONS:
+            expected, actual = _both_engines(lab, num_processors, processes, scheduler, policy)
+            assert actual == expected
+
+
+def test_heap_engine_leaves_the_processes_alone(lab):
+
+    processes = [5, 3, 8, 1]
+    statistics = lab.heap_simulation(2, processes, lab.ShortestProcessFirstPolicy(), output=None)
+
+    assert processes == [5, 3, 8, 1]
+    assert statistics == lab.simulation(2, list(processes), lab.shortest_process_first_scheduler, quiet=True)
@@ -0,0 +1,75 @@
+"""The load planner keeps to the special notes and truck capacity."""
+
+
+import collections
+import os
+
+from lib.load_planner import parse_special_note
+from lib.package import Status
+from main import DATA_DIR, Simulation
+
+
+def _planned(**options):
+
+    simulation = Simulation(
+        packages_path=options.pop("packages_path", os.path.join(DATA_DIR, "packages.csv")),
+        distances_path=options.pop("distances_path", os.path.join(DATA_DIR, "distances.csv")),
+        **options,
+    )
+    return simulation, list(simulation.package_load_order)
+
+
+def test_parse_special_note():
+
+    assert parse_special_note("Can only be on truck 2").truck_id == 2
+    assert parse_special_note("Delayed on flight---will not arrive to depot until 9:05 am").available_at == 545
+    assert parse_special_note("Must be delivered with 15, 19").delivered_with == (15, 19)
+    assert parse_special_note("Wrong address listed").wrong_address
+    assert parse_special_note(None) == parse_special_note("")
+
+
+def test_sample_trips_follow_the_notes():
+
+    simulation, trips = _planned()
+    trip_of = {pkg_id: trip for trip in trips for pkg_id in trip.package_ids}
+
+    # every package is planned exactly once, and no trip is over capacity
+    assert sorted(trip_of) == list(range(1, 41))
+    assert sum(len(trip.package_ids) for trip in trips) == 40
+    assert all(len(trip.package_ids) <= simulation.trucks[1].capacity for trip in trips)
+
+    for package in simulation.packages.values():
+        notes = parse_special_note(package.notes)
+        trip = trip_of[package.id]
+        if notes.truck_id is not None:
+            assert trip.truck_id == notes.truck_id
+        if notes.available_at is not None:
+            assert trip.departure >= notes.available_at
+        for other_id in notes.delivered_with:
+            assert trip_of[other_id] is trip
+
+
+def test_generated_trips_cover_every_package(workload):
+
+    packages_path, distances_path = workload
+    simulation, trips = _planned(packages_path=packages_path, distances_path=distances_path, truck_capacity=12)
+
+    counts = collections.Counter(pkg_id for trip in trips for pkg_id in trip.package_ids)
+    assert sorted(counts) == list(range(1, 201))
+    assert set(counts.values()) == {1}
+    assert all(len(trip.package_ids) <= 12 for trip in trips)
+
+
+def test_delayed_packages_leave_only_after_reaching_the_hub():
+
+    # the old hardcoded load order sent package 6 out on truck 1 at 8:00,
+    #   though it only reaches the hub at 9:05
+    simulation, _ = _planned()
+    simulation.run()
+
+    for package in simulation.packages.values():
+        available_at = parse_special_note(package.notes).available_at
+        if available_at is None:
+            continue
+        status = simulation.history.status_at(package.id, available_at * 60 - 1)
+        assert status is None or status.status == Status.AT_HUB, package.id
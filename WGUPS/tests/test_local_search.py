@@ -0,0 +1,84 @@
+"""The 2-opt / Or-opt pass returns a valid, shorter route, and keeps to its
+time limit.
+"""
+
+
+import time
+
+import numpy as np
+import pytest
+
+from lib.distance_matrix import DistanceMatrix
+from lib.local_search import improve_route, route_distance
+from lib.route_planners import nearest_neighbor_route
+
+
+def _random_matrix(size, seed):
+    """Straight-line distances between random points; address 0 is the hub."""
+
+    points = np.random.default_rng(seed).random((size, 2)) * 20
+    array = np.sqrt(((points[:, None] - points[None]) ** 2).sum(axis=-1))
+    return DistanceMatrix.from_array([f"Address {i}" for i in range(size)], array)
+
+
+def _path(stops, order):
+
+    return [0] + [stops[position] for position in order] + [0]
+
+
+@pytest.mark.parametrize("candidates", [None, 8])
+def test_improved_route_is_a_shorter_tour(candidates):
+
+    matrix = _random_matrix(60, seed=1)
+    # a few addresses get two stops
+    stops = list(range(1, 60)) + [5, 17, 42]
+    order, distance = nearest_neighbor_route(matrix, 0, stops, 0)
+
+    improved, improved_distance = improve_route(matrix, 0, stops, 0, order, candidates=candidates)
+
+    assert sorted(improved) == list(range(len(stops)))
+    assert improved_distance == pytest.approx(route_distance(matrix, _path(stops, improved)))
+    assert improved_distance < distance
+
+
+def test_no_improving_2opt_move_is_left():
+
+    matrix = _random_matrix(30, seed=2)
+    stops = list(range(1, 30))
+    order, _ = nearest_neighbor_route(matrix, 0, stops, 0)
+    improved, distance = improve_route(matrix, 0, stops, 0, order)
+
+    path = _path(stops, improved)
+    for i in range(1, len(path) - 2):
+        for j in range(i + 1, len(path) - 1):
+            reversed_path = path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+            assert route_distance(matrix, reversed_path) >= distance - 1e-9
+
+
+def test_time_limit_stops_the_pass():
+
+    # unlimited, this pass takes seconds
+    matrix = _random_matrix(600, seed=3)
+    stops = list(range(1, 600))
+    order, distance = nearest_neighbor_route(matrix, 0, stops, 0)
+
+    start = time.perf_counter()
+    improved, improved_distance = improve_route(matrix, 0, stops, 0, order, time_limit=0.05)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5
+    assert sorted(improved) == list(range(len(stops)))
+    assert improved_distance == pytest.approx(route_distance(matrix, _path(stops, improved)))
+    assert improved_distance <= distance
+
+
+def test_max_iterations_limits_the_moves():
+
+    matrix = _random_matrix(60, seed=4)
+    stops = list(range(1, 60))
+    order, distance = nearest_neighbor_route(matrix, 0, stops, 0)
+
+    _, one_move = improve_route(matrix, 0, stops, 0, order, max_iterations=1)
+    _, unlimited = improve_route(matrix, 0, stops, 0, order)
+
+    assert unlimited < one_move < distance
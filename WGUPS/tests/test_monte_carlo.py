@@ -0,0 +1,67 @@
+"""The Monte Carlo replay matches the simulated timeline when nothing varies,
+and gives steady odds when it does.
+"""
+
+
+import os
+
+import pytest
+
+from lib.monte_carlo import driven_trips, simulate_on_time
+from main import DATA_DIR, Simulation
+
+SAMPLE_PATHS = dict(
+    packages_path=os.path.join(DATA_DIR, "packages.csv"),
+    distances_path=os.path.join(DATA_DIR, "distances.csv"),
+)
+
+
+@pytest.fixture(scope="module")
+def sample_day():
+
+    simulation = Simulation(**SAMPLE_PATHS)
+    return simulation, simulation.run()
+
+
+def test_driven_trips_cover_the_day(sample_day):
+
+    simulation, result = sample_day
+    trips = driven_trips(simulation)
+
+    assert sum(sum(trip.distances) for truck_trips in trips.values() for trip in truck_trips) == \
+        pytest.approx(result.total_distance)
+    assert sorted(
+        package_id
+        for truck_trips in trips.values() for trip in truck_trips
+        for package_ids in trip.package_ids for package_id in package_ids
+    ) == list(range(1, 41))
+
+
+def test_no_spread_replays_the_timeline(sample_day):
+
+    simulation, result = sample_day
+    odds = simulate_on_time(simulation, trials=50, speed_sd=0, service_minutes=0)
+
+    assert sorted(odds) == list(range(1, 41))
+    for package_id, package_odds in odds.items():
+        delivered = (result.packages[package_id].delivery_time - simulation.history.midnight).total_seconds()
+        assert set(package_odds.arrival_percentiles.values()) == {delivered}
+        assert package_odds.on_time_probability == 1.0
+
+
+def test_odds_with_spread(sample_day):
+
+    simulation, _ = sample_day
+    odds = simulate_on_time(simulation, trials=2000, seed=3)
+
+    assert odds == simulate_on_time(simulation, trials=2000, seed=3)
+    for package_odds in odds.values():
+        assert 0.0 <= package_odds.on_time_probability <= 1.0
+        p50, p90, p95 = (package_odds.arrival_percentiles[p] for p in (50, 90, 95))
+        assert p50 <= p90 <= p95
+        if package_odds.deadline is None:
+            assert package_odds.on_time_probability == 1.0
+
+    # service time only ever makes the trucks later
+    slower = simulate_on_time(simulation, trials=2000, service_minutes=5.0, seed=3)
+    assert sum(o.on_time_probability for o in slower.values()) <= sum(o.on_time_probability for o in odds.values())
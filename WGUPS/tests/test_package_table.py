@@ -0,0 +1,76 @@
+"""The package table's secondary indexes stay in step with the packages as
+their fields change.
+"""
+
+
+import random
+
+import pytest
+
+from lib.package import Status
+from lib.package_table import INDEXED_FIELDS
+from main import Simulation
+
+
+def _assert_indexes_match_a_scan(table):
+
+    packages = table.values()
+    for field in INDEXED_FIELDS:
+        for value in {getattr(package, field) for package in packages}:
+            expected = sorted(package.id for package in packages if getattr(package, field) == value)
+            assert sorted(package.id for package in table.find(**{field: value})) == expected, (field, value)
+
+    for minutes in (0, 9 * 60, 10 * 60 + 30, 24 * 60):
+        expected = sorted(package.id for package in packages
+                          if package.deadline is not None and package.deadline <= minutes)
+        due = table.due_by(minutes)
+        assert sorted(package.id for package in due) == expected
+        assert [package.deadline for package in due] == sorted(package.deadline for package in due)
+
+
+@pytest.fixture
+def simulation(workload):
+
+    packages_path, distances_path = workload
+    return Simulation(packages_path=packages_path, distances_path=distances_path)
+
+
+def test_indexes_follow_set_fields(simulation):
+
+    table = simulation.packages
+    packages = table.values()
+    addresses = sorted({package.address for package in packages})
+    rng = random.Random(5)
+    for _ in range(500):
+        package = rng.choice(packages)
+        table.set_fields(
+            package.id,
+            status=rng.choice(list(Status)),
+            truck=rng.choice([None, 1, 2, 3]),
+            address=rng.choice(addresses),
+            deadline=rng.choice([None, 9 * 60, 10 * 60 + 30, package.deadline]),
+        )
+
+    _assert_indexes_match_a_scan(table)
+    assert table.find(status="DELIVERED") == table.find(status=Status.DELIVERED)
+
+
+def test_indexes_follow_a_run(simulation):
+
+    simulation.advance_to("10:00 AM")
+    _assert_indexes_match_a_scan(simulation.packages)
+    assert simulation.packages.find(status=Status.EN_ROUTE)
+
+    simulation.run()
+    _assert_indexes_match_a_scan(simulation.packages)
+    assert len(simulation.packages.find(status=Status.DELIVERED)) == 200
+
+
+def test_delete_drops_the_package_from_every_index(simulation):
+
+    table = simulation.packages
+    for package_id in range(1, 201, 4):
+        table.delete(package_id)
+
+    _assert_indexes_match_a_scan(table)
+    assert all(package.id % 4 != 1 for package in table.find(status=Status.AT_HUB))
@@ -0,0 +1,41 @@
+"""Phase times are exclusive, so they add up to the run's wall time."""
+
+
+import itertools
+import time
+
+from lib import profiling
+from lib.profiling import RunStats
+from main import Simulation
+
+
+def test_nested_phase_pauses_the_outer_one(monkeypatch):
+
+    # every reading of the clock is one second after the last
+    clock = itertools.count()
+    monkeypatch.setattr(profiling.time, "perf_counter", lambda: next(clock))
+
+    stats = RunStats()
+    with stats.phase("simulate"):       # 0
+        with stats.phase("load"):       # 1 .. 2
+            pass
+        with stats.phase("plan"):       # 3 .. 4
+            with stats.phase("load"):   # 5 .. 6
+                pass
+    # 7
+
+    assert stats.phases == {"simulate": 3, "load": 2, "plan": 2}
+    assert sum(stats.phases.values()) == 7
+
+
+def test_streamed_run_phases_add_up(workload):
+
+    packages_path, distances_path = workload
+    start = time.perf_counter()
+    simulation = Simulation(packages_path=packages_path, distances_path=distances_path, chunk_size=40, profile=True)
+    simulation.run()
+    wall_time = time.perf_counter() - start
+
+    # the read-ahead loads and plans while the run simulates
+    assert {"load", "plan", "simulate"} <= set(simulation.stats.phases)
+    assert sum(simulation.stats.phases.values()) <= wall_time
@@ -0,0 +1,117 @@
+"""Mid-day changes -- a new address, a late package, a cancellation -- repair
+the rest of the plan, and every package still ends up delivered once.
+"""
+
+
+import itertools
+import os
+
+import numpy as np
+import pytest
+
+from lib.distance_matrix import DistanceMatrix
+from lib.monte_carlo import driven_trips
+from lib.package import Status
+from lib.route_repair import cheapest_insertion, repair_route
+from main import DATA_DIR, Simulation
+
+SAMPLE_PATHS = dict(
+    packages_path=os.path.join(DATA_DIR, "packages.csv"),
+    distances_path=os.path.join(DATA_DIR, "distances.csv"),
+)
+
+
+@pytest.fixture(scope="module")
+def matrix():
+
+    points = np.random.default_rng(6).random((20, 2)) * 20
+    array = np.sqrt(((points[:, None] - points[None]) ** 2).sum(axis=-1))
+    return DistanceMatrix.from_array([f"Address {i}" for i in range(20)], array)
+
+
+def _length(matrix, path):
+
+    return sum(matrix.matrix[a][b] for a, b in zip(path, path[1:]))
+
+
+def test_cheapest_insertion_adds_the_fewest_miles(matrix):
+
+    stops = list(range(1, 12))
+    position, added = cheapest_insertion(matrix, 0, stops, 0, 15)
+
+    lengths = [_length(matrix, [0, *stops[:at], 15, *stops[at:], 0]) for at in range(len(stops) + 1)]
+    assert lengths[position] == min(lengths)
+    assert added == pytest.approx(min(lengths) - _length(matrix, [0, *stops, 0]))
+
+
+def test_repair_only_reorders_the_window(matrix):
+
+    stops = list(range(1, 20))
+    repaired = repair_route(matrix, 0, stops, 0, 9, window=3)
+
+    assert repaired[:6] == stops[:6] and repaired[13:] == stops[13:]
+    assert sorted(repaired[6:13]) == stops[6:13]
+    assert _length(matrix, [0, *repaired, 0]) <= _length(matrix, [0, *stops, 0]) + 1e-9
+
+
+def _delivered_once(result):
+
+    drops = list(itertools.chain.from_iterable(
+        event.package_ids for event in result.events if event.action.startswith("Dropped off")
+    ))
+    assert len(drops) == len(set(drops))
+    return set(drops)
+
+
+def test_changes_on_a_truck_and_at_the_hub():
+
+    simulation = Simulation(**SAMPLE_PATHS)
+    simulation.change_address(4, "410 S State St", "9:30 AM")    # on truck 2
+    simulation.cancel_package(29, "9:30 AM")                     # on truck 1
+    simulation.change_address(22, "2010 W 500 S", "9:30 AM")     # in a trip not yet loaded
+    simulation.cancel_package(24, "9:30 AM")                     # in a trip not yet loaded
+    result = simulation.run()
+
+    assert _delivered_once(result) == set(range(1, 41)) - {24, 29}
+    assert result.packages[4].address == "410 S State St"
+    assert result.packages[22].address == "2010 W 500 S"
+    assert result.packages[24].status == result.packages[29].status == Status.CANCELLED
+    # the new addresses are where the trucks went
+    for package_id in (4, 22):
+        drop = next(event for event in result.events
+                    if event.action.startswith("Dropped off") and package_id in event.package_ids)
+        assert drop.action.endswith(result.packages[package_id].address)
+
+
+def test_package_added_during_the_day_is_delivered():
+
+    row = ("41", "1060 Dalton Ave S", "Salt Lake City", "84104", "5", "EOD", "")
+    simulation = Simulation(**SAMPLE_PATHS)
+    simulation.add_package(row, "10:00 AM")
+    result = simulation.run()
+
+    assert _delivered_once(result) == set(range(1, 42))
+    assert result.packages[41].delivery_time.hour >= 10
+
+
+def test_change_after_delivery_is_rejected():
+
+    simulation = Simulation(**SAMPLE_PATHS)
+    simulation.cancel_package(15, "11:00 AM")
+    result = simulation.run()
+
+    assert result.packages[15].status == Status.DELIVERED
+    assert any(event.action == "Package 15 is already delivered" for event in result.events)
+
+
+def test_driven_trips_keep_a_stop_emptied_on_the_way():
+
+    # truck 2 is on its way to package 18's stop at 11:40
+    simulation = Simulation(**SAMPLE_PATHS)
+    simulation.cancel_package(18, "11:40 AM")
+    result = simulation.run()
+
+    trips = driven_trips(simulation)
+    assert any(event.action.startswith("Arrived at") for event in result.events)
+    assert sum(sum(trip.distances) for truck_trips in trips.values() for trip in truck_trips) == \
+        pytest.approx(result.total_distance)
@@ -0,0 +1,92 @@
+"""The route planners agree with the nearest neighbor planner they speed up."""
+
+
+import itertools
+import random
+
+import pytest
+
+from lib.distance_matrix import DistanceMatrix
+from lib.route_planners import (candidate_nearest_neighbor_route, held_karp_route, nearest_neighbor_route,
+                                 vectorized_nearest_neighbor_route)
+from main import Simulation
+
+
+@pytest.fixture(scope="module")
+def matrix(workload):
+
+    _, distances_path = workload
+    return DistanceMatrix.from_csv(distances_path)
+
+
+def _batches(matrix, count=20, seed=7):
+    """Random stop lists, some with several stops at one address. The
+    generated distances are rounded to a tenth of a mile, so there are ties
+    to break.
+    """
+
+    rng = random.Random(seed)
+    for _ in range(count):
+        size = rng.randint(1, 2 * matrix.size)
+        yield [rng.randrange(1, matrix.size) for _ in range(size)]
+
+
+def test_vectorized_matches_nearest_neighbor(matrix):
+
+    for stops in _batches(matrix):
+        order, distance = vectorized_nearest_neighbor_route(matrix, 0, stops, 0)
+        expected_order, expected_distance = nearest_neighbor_route(matrix, 0, stops, 0)
+
+        assert order == expected_order
+        assert distance == pytest.approx(expected_distance)
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_candidate_lists_match_nearest_neighbor(matrix, k):
+
+    # a short list often runs out, or ends on a tie, and falls back to a scan
+    for stops in _batches(matrix):
+        order, distance = candidate_nearest_neighbor_route(matrix, 0, stops, 0, k=k)
+        expected_order, expected_distance = nearest_neighbor_route(matrix, 0, stops, 0)
+
+        assert order == expected_order
+        assert distance == pytest.approx(expected_distance)
+
+
+def test_candidate_planner_runs_the_same_day(workload):
+
+    packages_path, distances_path = workload
+    results = [
+        Simulation(packages_path=packages_path, distances_path=distances_path, planner=planner).run()
+        for planner in ("nearest_neighbor", "candidate_nearest_neighbor")
+    ]
+
+    assert results[0].events == results[1].events
+
+
+def test_held_karp_is_optimal(matrix):
+
+    rng = random.Random(11)
+    for _ in range(5):
+        addresses = rng.sample(range(1, matrix.size), 7)
+        stops = addresses + addresses[:2]  # two addresses get a second stop
+
+        order, distance = held_karp_route(matrix, 0, stops, 0)
+        best = min(
+            sum(matrix.matrix[a][b] for a, b in zip((0, *tour), (*tour, 0)))
+            for tour in itertools.permutations(addresses)
+        )
+
+        assert sorted(order) == list(range(len(stops)))
+        assert distance == pytest.approx(best)
+        # stops at the same address are visited back to back
+        visited = [stops[position] for position in order]
+        assert len([a for a, b in zip(visited, visited[1:]) if a != b]) == len(addresses) - 1
+
+
+def test_held_karp_falls_back_past_max_stops(matrix):
+
+    stops = list(range(1, 10))
+
+    assert held_karp_route(matrix, 0, stops, 0, max_stops=5) == nearest_neighbor_route(matrix, 0, stops, 0)
+    assert held_karp_route(matrix, 0, stops, 0, time_limit=0) == nearest_neighbor_route(matrix, 0, stops, 0)
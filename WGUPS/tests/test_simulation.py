@@ -0,0 +1,138 @@
+"""Simulation runs through the Python API: deadlines on the bundled day,
+checkpoints and forks, streamed manifests and the route cache.
+"""
+
+
+import os
+
+import pytest
+
+from lib.package import Status
+from lib.results import result_to_dict
+from lib.route_cache import RouteCache
+from main import DATA_DIR, Simulation
+
+SAMPLE_PATHS = dict(
+    packages_path=os.path.join(DATA_DIR, "packages.csv"),
+    distances_path=os.path.join(DATA_DIR, "distances.csv"),
+)
+
+
+def _summary(result):
+    """The parts of a result that must match between equivalent runs."""
+
+    output = result_to_dict(result)
+    del output["stats"]
+    return output
+
+
+def _late(simulation):
+
+    return [
+        package.id for package in simulation.packages.values()
+        if package.delivery_time is None
+        or (package.deadline is not None and package.delivery_time > package.deadline * 60)
+    ]
+
+
+@pytest.fixture
+def generated(workload):
+
+    packages_path, distances_path = workload
+    return dict(packages_path=packages_path, distances_path=distances_path)
+
+
+def test_sample_day_meets_every_deadline():
+
+    simulation = Simulation(**SAMPLE_PATHS)
+    result = simulation.run()
+
+    assert round(result.total_distance, 2) == 122.6
+    assert _late(simulation) == []
+
+
+def test_fork_matches_uninterrupted_run(generated):
+
+    uninterrupted = Simulation(**generated).run()
+
+    simulation = Simulation(**generated)
+    simulation.advance_to("11:00 AM")
+    branch = simulation.fork()
+
+    assert _summary(branch.run()) == _summary(uninterrupted)
+    assert _summary(simulation.run()) == _summary(uninterrupted)
+
+
+def test_checkpoint_restores_any_number_of_times(generated):
+
+    simulation = Simulation(**generated)
+    simulation.advance_to("10:00 AM")
+    checkpoint = simulation.checkpoint()
+    first = _summary(simulation.run())
+
+    simulation.restore(checkpoint)
+    simulation.result = None
+    assert _summary(simulation.run()) == first
+
+
+def test_streamed_run_hands_off_every_package(generated):
+
+    results = []
+    simulation = Simulation(chunk_size=40, result_sink=results.append, improve_routes=True, **generated)
+    simulation.run()
+
+    assert sorted(result.package_id for result in results) == list(range(1, 201))
+    assert all(result.delivery_time is not None for result in results)
+
+    # nothing is kept per package or per trip
+    assert simulation.packages.values() == []
+    assert simulation.event_log == []
+    assert simulation.trip_reports == [] and simulation.trip_departures == {}
+    assert len(simulation._truck_free) <= len(simulation.trucks)
+
+
+def test_streamed_sample_day_reads_ahead():
+
+    simulation = Simulation(chunk_size=20, **SAMPLE_PATHS)
+    simulation.run()
+
+    assert _late(simulation) == []
+
+
+def test_streamed_run_cannot_be_checkpointed(generated):
+
+    simulation = Simulation(chunk_size=40, **generated)
+    simulation.advance_to("9:00 AM")
+    with pytest.raises(ValueError):
+        simulation.checkpoint()
+
+
+def test_route_cache_does_not_change_result(generated):
+
+    expected = _summary(Simulation(**generated).run())
+    route_cache = RouteCache()
+
+    assert _summary(Simulation(route_cache=route_cache, **generated).run()) == expected
+    assert _summary(Simulation(route_cache=route_cache, **generated).run()) == expected
+    assert route_cache.hits > 0
+
+
+@pytest.mark.parametrize("kind", ["address", "cancel"])
+def test_change_while_driving_to_the_stop(kind):
+
+    # truck 2 sets off for package 18's stop at 11:35 and gets there at 11:48
+    simulation = Simulation(**SAMPLE_PATHS)
+    if kind == "address":
+        simulation.change_address(18, "410 S State St", "11:40 AM")
+    else:
+        simulation.cancel_package(18, "11:40 AM")
+    simulation.advance_to("11:45 AM")
+    branch = simulation.fork()
+    result = simulation.run()
+
+    package = simulation.packages.lookup(18)
+    assert package.status == (Status.DELIVERED if kind == "address" else Status.CANCELLED)
+    assert package.address == ("410 S State St" if kind == "address" else "1488 4800 S")
+    assert (package.delivery_time is None) == (kind == "cancel")
+    assert not any(event.action.startswith("Package 18 is already") for event in result.events)
+    assert _summary(branch.run()) == _summary(result)
@@ -0,0 +1,63 @@
+"""Status-at-time queries answer from the recorded timelines, the same as
+running the day up to that time.
+"""
+
+
+import os
+from datetime import datetime
+
+import pytest
+
+from lib.package import Status
+from lib.status_history import StatusHistory
+from main import DATA_DIR, Simulation
+
+SAMPLE_PATHS = dict(
+    packages_path=os.path.join(DATA_DIR, "packages.csv"),
+    distances_path=os.path.join(DATA_DIR, "distances.csv"),
+)
+
+
+def test_status_at_takes_the_last_change_by_then():
+
+    history = StatusHistory(datetime(2024, 1, 2, 8))
+    history.record(1, "8:00 AM", Status.AT_HUB, address="A")
+    history.record(1, "9:30 AM", Status.DELIVERED, 2, 1, "A")
+    history.record(1, "9:00 AM", Status.EN_ROUTE, 2, 1, "A")  # recorded out of order
+
+    assert history.status_at(1, "7:59 AM") is None
+    assert history.status_at(2, "9:00 AM") is None
+    assert history.status_at(1, "8:59 AM").status == Status.AT_HUB
+    assert history.status_at(1, "9:00 AM").status == Status.EN_ROUTE  # takes effect at its time
+    delivered = history.status_at(1, 10 * 3600)
+    assert delivered.status == Status.DELIVERED and delivered.truck_id == 2
+    assert delivered.time == datetime(2024, 1, 2, 9, 30)
+
+
+@pytest.fixture(scope="module")
+def sample_day():
+
+    simulation = Simulation(**SAMPLE_PATHS)
+    return simulation, simulation.run()
+
+
+def test_delivery_is_recorded_at_the_delivery_time(sample_day):
+
+    simulation, result = sample_day
+    for package in result.packages.values():
+        seconds = (package.delivery_time - simulation.history.midnight).total_seconds()
+        assert simulation.history.status_at(package.package_id, seconds - 1).status == Status.EN_ROUTE
+        assert simulation.history.status_at(package.package_id, seconds).status == Status.DELIVERED
+
+
+@pytest.mark.parametrize("time", ["9:35 AM", "10:25 AM", "11:00 AM", "12:03 PM"])
+def test_snapshot_matches_a_run_up_to_then(sample_day, time):
+
+    simulation, _ = sample_day
+    snapshot = simulation.history.snapshot(time)
+
+    partial = Simulation(**SAMPLE_PATHS)
+    partial.advance_to(time)
+    assert {package.id: package.status for package in partial.packages.values()} == {
+        package_id: status.status for package_id, status in snapshot.items()
+    }
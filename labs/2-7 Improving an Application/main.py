@@ -1,4 +1,6 @@
-from simulation import simulation, random_scheduler
+from simulation import (simulation, heap_simulation, random_scheduler,
+                        FirstComeFirstServedPolicy, ShortestProcessFirstPolicy, RandomPolicy)
+import argparse
 import sys
 
 # Loads the number of processors and the list of
@@ -6,7 +8,7 @@ import sys
 # filename.
 def load_data(filename):
     with open(filename) as f:
-        lines = [int(line) for line in f.readlines()]
+        lines = [int(line) for line in f]
 
     return lines[0], lines[1:]
 
@@ -22,35 +24,45 @@ def first_come_first_served_scheduler(processes, processors):
 
     return 0, processors.index(min(processors))
 
-# A program that runs the simulation using three different
-# schedulers, and displays the wait time statistics for
-# each one.
-if __name__ == "__main__":
-
-    num_processors, processes = load_data(sys.argv[1])
-                
-    print("SIM 1: random scheduler")            
-    processes_copy = [ x for x in processes ]
-    final_time, total_wait_time, max_wait_time = simulation(num_processors, processes_copy, random_scheduler)
+# Displays the wait time statistics of one simulation.
+def print_statistics(num_processors, final_time, total_wait_time, max_wait_time):
     print('%20s: %d' % ('Final Time', final_time))
     print('%20s: %d' % ('Total Wait Time', total_wait_time))
     print('%20s: %d' % ('Max Wait time', max_wait_time))
     print('%20s: %0.2f' % ('Average Wait Time', total_wait_time / num_processors))
 
-    print()
-    print("SIM 2: first-come-first-served scheduler")            
-    processes_copy = [ x for x in processes ]
-    final_time, total_wait_time, max_wait_time = simulation(num_processors, processes_copy, first_come_first_served_scheduler)
-    print('%20s: %d' % ('Final Time', final_time))
-    print('%20s: %d' % ('Total Wait Time', total_wait_time))
-    print('%20s: %d' % ('Max Wait time', max_wait_time))
-    print('%20s: %0.2f' % ('Average Wait Time', total_wait_time / num_processors))
+# The three simulations -- the scheduler for simulation() and the
+# matching policy for heap_simulation().
+SIMULATIONS = [
+    ("random scheduler", random_scheduler, RandomPolicy),
+    ("first-come-first-served scheduler", first_come_first_served_scheduler, FirstComeFirstServedPolicy),
+    ("shortest-process-first scheduler", shortest_process_first_scheduler, ShortestProcessFirstPolicy),
+]
 
-    print()
-    print("SIM 3: shortest-process-first scheduler")            
-    processes_copy = [ x for x in processes ]
-    final_time, total_wait_time, max_wait_time = simulation(num_processors, processes_copy, shortest_process_first_scheduler)
-    print('%20s: %d' % ('Final Time', final_time))
-    print('%20s: %d' % ('Total Wait Time', total_wait_time))
-    print('%20s: %d' % ('Max Wait time', max_wait_time))
-    print('%20s: %0.2f' % ('Average Wait Time', total_wait_time / num_processors))
+# A program that runs the simulation using three different
+# schedulers, and displays the wait time statistics for
+# each one. With --heap the simulations run on heap_simulation(),
+# which gives the same results in O(log n) time per process, for
+# inputs with millions of processes; --quiet leaves out the line
+# printed for each process.
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Process scheduling simulation")
+    parser.add_argument("filename", help="number of processors, then one process runtime per line")
+    parser.add_argument("--heap", action="store_true", help="use the heap-based simulation")
+    parser.add_argument("--quiet", action="store_true", help="do not print a line for each process")
+    args = parser.parse_args()
+
+    num_processors, processes = load_data(args.filename)
+
+    for number, (name, scheduler, policy) in enumerate(SIMULATIONS, start=1):
+        if number > 1:
+            print()
+        print("SIM %d: %s" % (number, name))
+        if args.heap:
+            output = None if args.quiet else sys.stdout
+            statistics = heap_simulation(num_processors, processes, policy(), output=output)
+        else:
+            processes_copy = [ x for x in processes ]
+            statistics = simulation(num_processors, processes_copy, scheduler, quiet=args.quiet)
+        print_statistics(num_processors, *statistics)